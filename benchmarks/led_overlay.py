@@ -0,0 +1,94 @@
+"""Time frames of the LED overlay with every light changing.
+
+Each frame sets a new color on every light, renders the overlay and
+paints the scene into an image. Run it from the repository root:
+
+    python benchmarks/led_overlay.py [lights] [frames]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+
+from mpfmonitor.core.devices import DeviceNode
+from mpfmonitor.core.led_overlay import LedOverlay
+from mpfmonitor.core.playfield import PfWidget
+
+
+class BenchmarkScheduler(object):
+    """Collects the frame's work like FrameScheduler, run() is one frame."""
+
+    def __init__(self):
+        self.pending = dict()
+
+    def mark_dirty(self, window, key, callback):
+        self.pending[key] = callback
+
+    def run(self):
+        pending, self.pending = self.pending, dict()
+        for callback in pending.values():
+            callback()
+
+
+class BenchmarkMonitor(object):
+    """The parts of MpfMon the overlay and its widgets touch."""
+
+    def __init__(self):
+        self.scene = QGraphicsScene()
+        self.pf = QGraphicsPixmapItem(QPixmap(1000, 2000))
+        self.scene.addItem(self.pf)
+        self.config = dict()
+        self.pf_device_size = .01
+        self.frame_scheduler = BenchmarkScheduler()
+        self.view = None
+        self.led_overlay = LedOverlay(self, self.pf)
+
+    def save_config(self):
+        pass
+
+
+def main(lights=1000, frames=200):
+    app = QApplication(sys.argv)
+    mpfmon = BenchmarkMonitor()
+
+    rng = random.Random(1)
+    widgets = []
+    for index in range(lights):
+        node = DeviceNode()
+        node.setData({'color': [0, 0, 0]})
+        widget = PfWidget(mpfmon, node, 'light', 'l_{}'.format(index),
+                          rng.uniform(20, 980), rng.uniform(20, 1980), save=False)
+        mpfmon.scene.addItem(widget)
+        widgets.append(widget)
+    mpfmon.frame_scheduler.run()
+
+    image = QImage(500, 1000, QImage.Format_ARGB32_Premultiplied)
+
+    elapsed = 0.0
+    for frame in range(frames):
+        start = time.perf_counter()
+        for widget in widgets:
+            widget.widget._data = {'color': [rng.randrange(256), 0, 255]}
+            widget.notify()
+        mpfmon.frame_scheduler.run()
+
+        image.fill(Qt.black)
+        painter = QPainter(image)
+        mpfmon.scene.render(painter)
+        painter.end()
+        elapsed += time.perf_counter() - start
+
+    print("{} lights, {} frames: {:.2f} ms per frame".format(
+        lights, frames, elapsed / frames * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
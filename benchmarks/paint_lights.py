@@ -0,0 +1,79 @@
+"""Time repaints of a playfield with 500 lights.
+
+Every frame gives some lights new colors and paints the whole scene into
+an image. By default all of them change, the worst case of a light show
+touching every LED. Run it from the repository root:
+
+    python benchmarks/paint_lights.py [lights] [frames] [changing]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+
+from mpfmonitor.core.devices import DeviceNode
+from mpfmonitor.core.playfield import PfWidget
+
+
+class BenchmarkMonitor(object):
+    """The parts of MpfMon a PfWidget touches."""
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.config = dict()
+        self.pf_device_size = .02
+
+    def save_config(self):
+        pass
+
+
+def main(lights=500, frames=200, changing=None):
+    app = QApplication(sys.argv)
+
+    scene = QGraphicsScene(0, 0, 1000, 2000)
+    mpfmon = BenchmarkMonitor(scene)
+
+    rng = random.Random(1)
+    widgets = []
+    for index in range(lights):
+        node = DeviceNode()
+        node.setData({'color': [0, 0, 0]})
+        widget = PfWidget(mpfmon, node, 'light', 'l_{}'.format(index),
+                          rng.uniform(20, 980), rng.uniform(20, 1980), save=False)
+        scene.addItem(widget)
+        widgets.append(widget)
+
+    image = QImage(500, 1000, QImage.Format_ARGB32_Premultiplied)
+
+    # A light show cycles through a limited palette
+    palette = [[rng.randrange(256) for _ in range(3)] for _ in range(64)]
+
+    elapsed = 0.0
+    for frame in range(frames):
+        # What the frame scheduler does for every light that changed
+        for widget in widgets if changing is None else rng.sample(widgets, changing):
+            widget.widget._data = {'color': rng.choice(palette)}
+            widget.update()
+
+        image.fill(Qt.black)
+        painter = QPainter(image)
+        start = time.perf_counter()
+        scene.render(painter)
+        elapsed += time.perf_counter() - start
+        painter.end()
+
+    print("{} lights, {} changing, {} frames: {:.2f} ms per frame".format(
+        lights, lights if changing is None else changing, frames,
+        elapsed / frames * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:4]])
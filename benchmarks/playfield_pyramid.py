@@ -0,0 +1,87 @@
+"""Time startup and resizing with a 20 MP playfield image.
+
+Compares the full image in a QGraphicsPixmapItem with PfPixmapItem drawing
+from the ImagePyramid levels. Every frame renders the scene at a new window
+size, like dragging the corner of the playfield window. Run it from the
+repository root:
+
+    python benchmarks/playfield_pyramid.py [frames]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+
+from mpfmonitor.core.playfield import PfPixmapItem
+from mpfmonitor.core.pyramid import ImagePyramid
+
+
+def make_image(file_name, width=5472, height=3648):
+    image = QImage(width, height, QImage.Format_RGB32)
+    image.fill(QColor(20, 90, 40))
+    painter = QPainter(image)
+    painter.setPen(QPen(Qt.white, 20))
+    for i in range(20):
+        painter.drawEllipse(i * 200, i * 100, width // 3, height // 3)
+    painter.end()
+    image.save(file_name, "JPG", 90)
+
+
+def time_resizes(scene, frames):
+    elapsed = 0.0
+    for frame in range(frames):
+        image = QImage(400 + frame * 10, 600 + frame * 15, QImage.Format_RGB32)
+        painter = QPainter(image)
+        start = time.perf_counter()
+        scene.render(painter, QRectF(image.rect()), scene.sceneRect(), Qt.KeepAspectRatio)
+        elapsed += time.perf_counter() - start
+        painter.end()
+    return elapsed / frames * 1000
+
+
+def main(frames=20):
+    app = QApplication(sys.argv)
+    path = tempfile.mkdtemp()
+    image_file = os.path.join(path, "playfield.jpg")
+    make_image(image_file)
+
+    start = time.perf_counter()
+    pixmap = QPixmap(image_file)
+    print("Full image: {:.0f} ms blocking startup".format((time.perf_counter() - start) * 1000))
+
+    scene = QGraphicsScene()
+    scene.addItem(QGraphicsPixmapItem(pixmap))
+    print("  {:.2f} ms per resize".format(time_resizes(scene, frames)))
+
+    for run in ("Pyramid, first run", "Pyramid, cached"):
+        start = time.perf_counter()
+        pyramid = ImagePyramid(image_file)
+        pyramid.start()
+        blocking = time.perf_counter() - start
+
+        while not pyramid.take():
+            time.sleep(.001)
+        first_level = time.perf_counter() - start
+        pyramid.thread.join()
+        pyramid.take()
+
+        scene = QGraphicsScene()
+        scene.addItem(PfPixmapItem(pyramid, None))
+        print("{}: {:.0f} ms blocking startup, first level after {:.0f} ms".format(
+            run, blocking * 1000, first_level * 1000))
+        print("  {:.2f} ms per resize".format(time_resizes(scene, frames)))
+
+    shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
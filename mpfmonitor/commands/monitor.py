@@ -54,6 +54,13 @@ class Command(object):
                             help="Enables verbose logging to the console. Do NOT on "
                                  "Windows platforms")
 
+        parser.add_argument("-r",
+                            action="store_true", dest="capture",
+                            help="Record the BCP messages from MPF to "
+                                 "monitor/cache.txt, for example for the "
+                                 "offline heatmap (python -m "
+                                 "mpfmonitor.core.heatmap)")
+
         parser.add_argument("-C",
                             action="store", dest="mpfmonconfigfile",
                             default="mpfmonitor.yaml",
@@ -103,7 +110,8 @@ class Command(object):
         thread_stopper = threading.Event()
 
         try:
-            run(machine_path=machine_path, thread_stopper=thread_stopper)
+            run(machine_path=machine_path, thread_stopper=thread_stopper,
+                capture=args.capture)
             logging.info("MPF Monitor run loop ended.")
         except Exception as e:
             logging.exception(str(e))
@@ -7,13 +7,15 @@ import threading
 import os
 
 import select
+import time
 
 from datetime import datetime
-import math
 
 import mpf.core.bcp.bcp_socket_client as bcp
 from PyQt5.QtCore import QTimer
 
+from mpfmonitor.core.event_filters import peek_event_name
+
 
 class BCPClient(object):
 
@@ -173,8 +175,9 @@ class BCPClient(object):
         except (OSError, AttributeError):
             pass
 
-        if self.caching_enabled:
-            self.cache_file.close()
+        if self.caching_enabled and not self.simulate:
+            # Keep recording into the same capture after a reconnect
+            self.cache_file.flush()
 
         self.socket = None
         self.connected = False
@@ -207,16 +210,28 @@ class BCPClient(object):
             message: The incoming BCP message
 
         """
+        received = time.perf_counter()
+
         self.log.debug('Received "%s"', message)
         if self.caching_enabled and not self.simulate:
-            time = datetime.now() - self.last_time
-            message_tmr = math.floor(time.microseconds / 1000)
+            elapsed = datetime.now() - self.last_time
+            message_tmr = int(elapsed.total_seconds() * 1000)
             self.last_time = datetime.now()
             self.cache_file.write(str(message_tmr) + "," + message + "\n")
 
+        event_filter = self.mpfmon.event_filter
+        if event_filter:
+            # Drop suppressed events before paying for decoding them
+            event_name = peek_event_name(message)
+            if event_name is not None and not event_filter.allow(event_name):
+                return
+
         try:
             cmd, kwargs = bcp.decode_command_string(message)
-            self.receive_queue.put((cmd, kwargs))
+            if event_filter and cmd == 'monitored_event' and event_name is None and \
+                    not event_filter.allow(kwargs.get('event_name')):
+                return
+            self.receive_queue.put((cmd, kwargs, received))
         except ValueError:
             self.log.error("DECODE BCP ERROR. Message: %s", message)
             raise
@@ -0,0 +1,126 @@
+"""Writes monitor.yaml in the background."""
+
+import copy
+import logging
+import os
+import queue
+import tempfile
+import threading
+
+# will change these to specific imports once code is more final
+from PyQt5.QtCore import *
+
+import ruamel.yaml as yaml
+
+
+class ConfigWriter(object):
+    """Saves the config at most once per delay ms, off the GUI thread.
+
+    Every save() within delay ms of the first one ends up in the same write.
+    When the delay is over the config is copied on the GUI thread, which is
+    cheap, and the slow part, dumping it to YAML and writing it, happens in
+    the writer thread. The file is replaced in one rename, a crash while
+    writing never leaves a truncated monitor.yaml behind.
+    """
+
+    def __init__(self, config_file, thread_stopper, delay=500):
+        self.log = logging.getLogger('ConfigWriter')
+        self.config_file = config_file
+        self.thread_stopper = thread_stopper
+
+        self.config = None
+        self.writes = 0
+        self.queue = queue.Queue()
+        self.writer_thread = None
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.commit)
+
+    def save(self, config):
+        """Write config once the delay is over."""
+        self.config = config
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def commit(self):
+        self.timer.stop()
+        if self.config is None:
+            return
+
+        if self.writer_thread is None or not self.writer_thread.is_alive():
+            self.writer_thread = threading.Thread(target=self.write_loop)
+            self.writer_thread.start()
+
+        self.queue.put(copy.deepcopy(self.config))
+        self.config = None
+
+    def flush(self):
+        """Write pending changes now and wait until they are on disk."""
+        self.commit()
+        if self.writer_thread is not None:
+            self.queue.put(None)
+            self.writer_thread.join()
+            self.writer_thread = None
+
+    def write_loop(self):
+        while True:
+            try:
+                config = self.queue.get(block=True, timeout=1)
+            except queue.Empty:
+                if self.thread_stopper.is_set():
+                    break
+                continue
+
+            # Only the newest of the configs that piled up matters
+            done = config is None
+            while True:
+                try:
+                    newer = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if newer is None:
+                    done = True
+                else:
+                    config = newer
+
+            if config is not None:
+                self.write(config)
+
+            if done:
+                break
+
+    def dump(self, config):
+        return yaml.dump(config, default_flow_style=False)
+
+    def write(self, config):
+        self.log.debug("Saving config to disk")
+        directory = os.path.dirname(self.config_file)
+        try:
+            fd, temp_file = tempfile.mkstemp(prefix=".monitor-", suffix=".yaml",
+                                             dir=directory)
+        except OSError as e:
+            self.log.error("Could not save %s: %s", self.config_file, e)
+            return
+
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.dump(config))
+                f.flush()
+                os.fsync(f.fileno())
+
+            # mkstemp makes the file private, keep the mode monitor.yaml had
+            try:
+                mode = os.stat(self.config_file).st_mode & 0o777
+            except FileNotFoundError:
+                mode = 0o644
+            os.chmod(temp_file, mode)
+            os.replace(temp_file, self.config_file)
+            self.writes += 1
+        except OSError as e:
+            self.log.error("Could not save %s: %s", self.config_file, e)
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
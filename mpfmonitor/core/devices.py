@@ -8,45 +8,63 @@ from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 from PyQt5 import uic
 
+from collections import namedtuple
 from enum import Enum
 
+from mpfmonitor.core.history import DeviceHistory, HistoryWidget
+
 
 class DeviceNode(object):
 
-    def __init__(self):
+    # Custom role under which the state item exposes its node to the delegate
+    NodeRole = Qt.UserRole + 1
+    # Typed sort key (perf_counter float) of the name column for "Received"
+    ReceivedRole = Qt.UserRole + 2
+
+    def __init__(self, scheduler=None, window=None):
         self._callback = None
+        self._scheduler = scheduler
+        self._window = window
         self._name = ""
         self._data = {}
         self._type = ""
+        self._version = 0
+        self._descriptor = None
+        self._descriptor_version = -1
+        self.stale = False
 
         self.q_name = QStandardItem()
+        self.q_name.setData(time.perf_counter(), self.ReceivedRole)
+        self.q_name.setDragEnabled(True)
         self.q_state = QStandardItem()
+        self.q_state.setData(self, self.NodeRole)
         self.sub_properties = {}
         self.sub_properties_appended = False
 
-        self.q_time_added = QStandardItem()
-        self.q_time_added.setData(time.perf_counter(), Qt.DisplayRole)
-
     def setName(self, name):
         self._name = name
+        # Set once, rewriting the sort column would make the proxy re-sort
+        self.q_name.setData(str(self._name), Qt.DisplayRole)
 
     def setData(self, data):
+        self._data = data
+        self._version += 1
         if self._callback:
             self._callback()
-        self._data = data
-        self.get_row()
+
+        if self._scheduler is None:
+            self.get_row()
+        else:
+            # Update the tree once per frame, not once per message
+            self._scheduler.mark_dirty(self._window, self, self.get_row)
 
 
     def setType(self, type):
         self._type = type
 
     def get_row(self):
-        self.q_name.setData(str(self._name), Qt.DisplayRole)
-
         self.q_state.setData("", Qt.DisplayRole)
 
-        self.q_name.setDragEnabled(True)
-
         if isinstance(self._data, dict):
             state_str = str(list(self._data.values())[0])
             if len(self._data) > 1:
@@ -67,17 +85,43 @@ class DeviceNode(object):
 
             self.sub_properties_appended = True
 
-        self.row_data = [self.q_name, self.q_state, self.q_time_added]
+        self.row_data = [self.q_name, self.q_state]
 
         return self.row_data
 
     def data(self):
-        self.q_state.emitDataChanged()
         return self._data
 
     def type(self):
         return self._type
 
+    def set_stale(self, stale):
+        """Mark the state as restored from a snapshot (True) or live (False)."""
+        if stale == self.stale:
+            return
+
+        self.stale = stale
+
+        font = self.q_name.font()
+        font.setItalic(stale)
+        self.q_name.setFont(font)
+
+        if stale:
+            self.q_name.setForeground(QBrush(Qt.gray))
+            self.q_name.setToolTip("Last known state, not confirmed by MPF yet")
+        else:
+            self.q_name.setData(None, Qt.ForegroundRole)
+            self.q_name.setToolTip("")
+
+        self.q_state.emitDataChanged()
+
+    def descriptor(self):
+        """Return the render descriptor, rebuilt only when the state changed."""
+        if self._descriptor_version != self._version:
+            self._descriptor = describe_state(self._data)
+            self._descriptor_version = self._version
+        return self._descriptor
+
     def set_change_callback(self, callback):
         if self._callback:
             # raise AssertionError("Can only have one callback")
@@ -91,144 +135,194 @@ class DeviceNode(object):
 
 
 
-class DeviceDelegate(QStyledItemDelegate):
-    def __init__(self):
-        self.size = None
-        super().__init__()
+StateDescriptor = namedtuple('StateDescriptor', 'color state balls text')
 
-    def paint(self, painter, view, index):
-        super().paint(painter, view, index)
-        color = None
-        state = None
-        balls = None
-        found = False
-        text = ''
-
-        # src_index = index.model().mapToSource(index)
-        # src_index_model = src_index.model()
-        # print(index.data())
-        # print(src_index_model.data())
-        data = []
-        try:
-            data = index.model().itemFromIndex(index).data()
-            # src_index = index.model().mapToSource(index)
-            # data = index.model().data(src_index)
-        except:
-            pass
-
-
-        num_circles = 1
-        # return
-
-        if index.column() == 0:
-            return
 
-        try:
-            if 'color' in data:
-                color = data['color']
-                found = True
-        except TypeError:
-            return
+def describe_state(data):
+    """Work out once how a device state should be drawn.
 
-        try:
-            if 'brightness' in data:
-                color = [data['brightness']]*3
-                found = True
-        except TypeError:
-            return
+    Returns None for states the delegate does not know how to draw, those
+    fall back to the plain text of the model.
+    """
+    if not isinstance(data, dict):
+        return None
 
-        try:
-            if 'state' in data:
-                text = str(data['state'])
-                found = True
-        except TypeError:
-            return
+    color = None
+    state = None
+    balls = None
+    text = ''
+    found = False
 
-        try:
-            if 'complete' in data:
-                state = not data['complete']
-                found = True
-        except TypeError:
-            return
+    try:
+        if 'color' in data:
+            color = tuple(int(c) for c in data['color'])
+            found = True
 
-        try:
-            if 'enabled' in data:
-                state = data['enabled']
-                found = True
-        except TypeError:
-            return
+        if 'brightness' in data:
+            color = (int(data['brightness']),) * 3
+            found = True
 
-        try:
-            if 'balls' in data:
-                balls = data['balls']
-                found = True
-        except TypeError:
-            return
+        if 'state' in data:
+            text = str(data['state'])
+            if isinstance(data['state'], int):
+                state = bool(data['state'])
+            found = True
 
-        try:
-            if 'balls_locked' in data:
-                balls = data['balls_locked']
-                found = True
-        except TypeError:
-            return
+        if 'complete' in data:
+            state = not data['complete']
+            found = True
 
-        try:
-            if 'num_balls_requested' in data:
-                text += 'Requested: {} '.format(
-                    data['num_balls_requested'])
-                found = True
-        except TypeError:
-            return
+        if 'enabled' in data:
+            state = bool(data['enabled'])
+            found = True
 
-        try:
-            if 'unexpected_balls' in data:
-                text += 'Unexpected: {} '.format(
-                    data['unexpected_balls'])
-                found = True
-        except TypeError:
-            return
+        if 'balls' in data:
+            balls = data['balls']
+            found = True
 
-        if not found:
-            return
+        if 'balls_locked' in data:
+            balls = data['balls_locked']
+            found = True
+
+        if 'num_balls_requested' in data:
+            text += ' Requested: {}'.format(data['num_balls_requested'])
+            found = True
+
+        if 'unexpected_balls' in data:
+            text += ' Unexpected: {}'.format(data['unexpected_balls'])
+            found = True
 
-        text += " " + str(data)
+    except (TypeError, ValueError):
+        return None
+
+    if not found:
+        return None
+
+    if not isinstance(balls, int) or isinstance(balls, bool):
+        balls = None
 
-        painter.save()
+    return StateDescriptor(color, state, balls, text.strip())
 
+
+class DeviceDelegate(QStyledItemDelegate):
+    """Draws device states as color swatches, on/off indicators and ball
+    counts instead of plain text."""
+
+    circle_size = 14
+    circle_spacing = 20
+    max_circles = 10
+    max_cached_pixmaps = 512
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pixmaps = dict()
+
+    @staticmethod
+    def descriptor(index):
+        node = index.data(DeviceNode.NodeRole)
+        if node is None:
+            return None
+        return node.descriptor()
+
+    @staticmethod
+    def is_stale(index):
+        node = index.data(DeviceNode.NodeRole)
+        return node is not None and node.stale
+
+    def indicator_count(self, descriptor):
+        if descriptor.color is None and descriptor.state is None \
+                and descriptor.balls is not None:
+            return min(descriptor.balls, self.max_circles)
+        return 1
+
+    def indicator_pixmap(self, descriptor, ratio):
+        """Return the swatch pixmap for a descriptor, drawn once and reused
+        by every row that looks the same."""
+        count = self.indicator_count(descriptor)
+        key = (descriptor.color, descriptor.state, count, ratio)
+
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            return pixmap
+
+        if len(self._pixmaps) >= self.max_cached_pixmaps:
+            self._pixmaps.clear()
+
+        width = max(1, count * self.circle_spacing)
+        pixmap = QPixmap(int(width * ratio), int(self.circle_size * ratio) + 2)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+
+        painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.Antialiasing, True)
         painter.setPen(QPen(QColor(100, 100, 100), 1, Qt.SolidLine))
 
-        if color:
-            painter.setBrush(QBrush(QColor(*color), Qt.SolidPattern))
-        elif state is True:
+        if descriptor.color is not None:
+            painter.setBrush(QBrush(QColor(*descriptor.color), Qt.SolidPattern))
+        elif descriptor.state is True:
             painter.setBrush(QBrush(QColor(0, 255, 0), Qt.SolidPattern))
-        elif state is False:
+        elif descriptor.state is False:
             painter.setBrush(QBrush(QColor(255, 255, 255), Qt.SolidPattern))
-        elif isinstance(balls, int):
+        elif descriptor.balls is not None:
             painter.setBrush(QBrush(QColor(0, 255, 0), Qt.SolidPattern))
-            num_circles = balls
 
         x_offset = 0
-        for _ in range(num_circles):
-            painter.drawEllipse(
-                view.rect.x() + x_offset, view.rect.y(), 14, 14)
+        for _ in range(count):
+            painter.drawEllipse(QRectF(x_offset + .5, .5, self.circle_size,
+                                       self.circle_size))
+            x_offset += self.circle_spacing
 
-            x_offset += 20
+        painter.end()
 
-        if text:
-            painter.drawText(view.rect.x() + x_offset, view.rect.y() + 12,
-                             str(text))
-            self.size = QSize(len(text) * 10, 20)
+        self._pixmaps[key] = pixmap
+        return pixmap
 
-        painter.restore()
+    def paint(self, painter, option, index):
+        descriptor = self.descriptor(index)
 
-    def sizeHint(self, QStyleOptionViewItem, QModelIndex):
-        if self.size:
-            return self.size
-        else:
-            # Calling super() here seems to result in a segfault on close sometimes.
-            # return super().sizeHint(QStyleOptionViewItem, QModelIndex)
-            return QSize(80, 20)
+        if descriptor is None:
+            super().paint(painter, option, index)
+            return
+
+        # Let the style draw the background and selection, but no text.
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        opt.text = ''
+        style = opt.widget.style() if opt.widget else QApplication.style()
+        style.drawControl(QStyle.CE_ItemViewItem, opt, painter, opt.widget)
+
+        stale = self.is_stale(index)
+        if stale:
+            painter.save()
+            painter.setOpacity(.4)
+
+        pixmap = self.indicator_pixmap(descriptor, painter.device().devicePixelRatioF())
+        rect = option.rect
+        top = rect.y() + (rect.height() - self.circle_size) // 2
+        painter.drawPixmap(rect.x(), top, pixmap)
+
+        if descriptor.text:
+            text_rect = rect.adjusted(self.indicator_count(descriptor) * self.circle_spacing, 0, 0, 0)
+            if option.state & QStyle.State_Selected:
+                painter.setPen(option.palette.color(QPalette.HighlightedText))
+            else:
+                painter.setPen(option.palette.color(QPalette.Text))
+            painter.drawText(text_rect, Qt.AlignVCenter | Qt.AlignLeft, descriptor.text)
+
+        if stale:
+            painter.restore()
+
+    def sizeHint(self, option, index):
+        descriptor = self.descriptor(index)
+
+        if descriptor is None:
+            return super().sizeHint(option, index)
+
+        width = self.indicator_count(descriptor) * self.circle_spacing
+        if descriptor.text:
+            width += option.fontMetrics.horizontalAdvance(descriptor.text) + 4
+
+        return QSize(width, max(20, option.fontMetrics.height()))
 
 
 class DeviceWindow(QWidget):
@@ -238,6 +332,10 @@ class DeviceWindow(QWidget):
         super().__init__()
         self.ui = None
         self.model = None
+        self.paused = False
+        self.history = DeviceHistory(
+            max_samples=self.mpfmon.config.get("history_max_samples", 500000),
+            per_device=self.mpfmon.config.get("history_per_device", 10000))
         self.draw_ui()
         self.attach_model()
         self.attach_signals()
@@ -268,6 +366,24 @@ class DeviceWindow(QWidget):
         self.ui.sortComboBox.model().item(0).setEnabled(False)
         self.ui.sortComboBox.setCurrentIndex(1)
         self.ui.treeView.setAlternatingRowColors(True)
+        self.ui.treeView.setContextMenuPolicy(Qt.CustomContextMenu)
+
+        # Recent history of the selected device, below the tree
+        self.ui.history_widget = HistoryWidget(self.history, self)
+        self.ui.gridLayout.addWidget(self.ui.history_widget, 2, 0, 1, 2)
+
+        pause_layout = QHBoxLayout()
+
+        self.ui.pauseCheckBox = QCheckBox("Pause", self)
+        self.ui.pauseCheckBox.setToolTip("Stop updating the tree, states are "
+                                         "kept and shown on resume")
+        pause_layout.addWidget(self.ui.pauseCheckBox)
+
+        self.ui.timingLabel = QLabel(self)
+        pause_layout.addWidget(self.ui.timingLabel)
+        pause_layout.addStretch()
+
+        self.ui.gridLayout.addLayout(pause_layout, 3, 0, 1, 2)
 
     def attach_signals(self):
         assert (self.ui is not None)
@@ -275,6 +391,10 @@ class DeviceWindow(QWidget):
         self.ui.treeView.collapsed.connect(self.resize_columns_to_content)
         self.ui.filterLineEdit.textChanged.connect(self.filter_text)
         self.ui.sortComboBox.currentIndexChanged.connect(self.change_sort)
+        self.ui.treeView.selectionModel().currentChanged.connect(self.show_device_history)
+        self.ui.treeView.customContextMenuRequested.connect(self.show_context_menu)
+        self.ui.pauseCheckBox.toggled.connect(self.pause)
+        self.mpfmon.frame_scheduler.timings_updated.connect(self.show_timings)
 
     def attach_model(self):
         assert (self.ui is not None)
@@ -284,7 +404,9 @@ class DeviceWindow(QWidget):
         self.model.setHorizontalHeaderLabels(["Device", "Data"])
 
         self.treeview.setDragDropMode(QAbstractItemView.DragOnly)
-        # self.treeview.setItemDelegateForColumn(1, DeviceDelegate())
+        # Keep a reference, the view does not take ownership of the delegate
+        self.state_delegate = DeviceDelegate()
+        self.treeview.setItemDelegateForColumn(1, self.state_delegate)
         self.treeview.header().setSectionResizeMode(QHeaderView.ResizeToContents)
 
         self.filtered_model = QSortFilterProxyModel(self)
@@ -292,36 +414,120 @@ class DeviceWindow(QWidget):
         self.filtered_model.setRecursiveFilteringEnabled(True)
         self.filtered_model.setFilterCaseSensitivity(False)
 
+        self.change_sort()  # Default sort
+
         self.treeview.setModel(self.filtered_model)
 
     def resize_columns_to_content(self):
         self.ui.treeView.resizeColumnToContents(0)
         self.ui.treeView.resizeColumnToContents(1)
 
-    def process_device_update(self, name, state, changes, type):
+    def process_device_update(self, name, state, changes, type, stale=False):
         self.log.debug("Device Update: {}.{}: {}".format(type, name, state))
 
         if type not in self.device_states:
             self.device_states[type] = dict()
 
-            item = QStandardItem(type)
-            self.device_type_widgets[type] = item
-
-            self.model.appendRow([item, QStandardItem(), QStandardItem(str(time.perf_counter()))])
-
         if name not in self.device_states[type]:
-            node = DeviceNode()
+            node = DeviceNode(self.mpfmon.frame_scheduler, self)
             node.setName(name)
             node.setData(state)
             node.setType(type)
 
             self.device_states[type][name] = node
-            self.device_type_widgets[type].appendRow(node.get_row())
+            if self.paused:
+                # Added to the tree on resume, before the held back updates
+                self.mpfmon.frame_scheduler.mark_dirty(
+                    self, ('add', type, name), lambda: self.add_device_row(type, node))
+            else:
+                self.add_device_row(type, node)
 
             self.mpfmon.pf.create_widget_from_config(node, type, name)
 
-        self.device_states[type][name].setData(state)
-        self.ui.treeView.setColumnHidden(2, True)
+        node = self.device_states[type][name]
+        node.setData(state)
+        node.set_stale(stale)
+
+        if stale:
+            return
+
+        self.history.record(type, name, state)
+        if self.ui.history_widget.is_showing(type, name):
+            self.mpfmon.frame_scheduler.mark_dirty(self, self.ui.history_widget,
+                                                   self.ui.history_widget.update)
+
+    def add_device_row(self, type, node):
+        if type not in self.device_type_widgets:
+            item = QStandardItem(type)
+            item.setData(time.perf_counter(), DeviceNode.ReceivedRole)
+            self.device_type_widgets[type] = item
+
+            self.model.appendRow([item, QStandardItem()])
+
+        self.device_type_widgets[type].appendRow(node.get_row())
+
+    def pause(self, paused):
+        """While paused the frame scheduler holds back new rows, row and
+        history updates, they are applied in one batch on resume."""
+        self.paused = paused
+
+    def show_timings(self, ingest_ms, render_ms):
+        if self.isVisible():
+            self.ui.timingLabel.setText(
+                "Ingest {:.1f} ms/s, render {:.1f} ms/s".format(ingest_ms, render_ms))
+
+    def load_snapshot(self, devices):
+        """Fill the tree (and playfield) with last-known states, shown as
+        stale until MPF confirms them."""
+        for device_type, name, state in devices:
+            self.process_device_update(name, state, False, device_type, stale=True)
+
+    def snapshot(self):
+        """Return the current inventory as a list of (type, name, state).
+
+        Devices of the last snapshot that MPF did not confirm are left out,
+        so removed devices go away. Unless MPF confirmed nothing at all, a
+        session that never connected keeps the last inventory.
+        """
+        nodes = [(device_type, name, node)
+                 for device_type, nodes in self.device_states.items()
+                 for name, node in nodes.items()]
+
+        if any(not node.stale for device_type, name, node in nodes):
+            nodes = [entry for entry in nodes if not entry[2].stale]
+
+        return [(device_type, name, node.data()) for device_type, name, node in nodes]
+
+    @staticmethod
+    def device_at(index):
+        """Return (type, name) of the device (or device property) at index,
+        (None, None) for a type row."""
+        index = index.sibling(index.row(), 0)
+
+        # Walk up from a property row to its device row
+        while index.parent().isValid() and index.parent().parent().isValid():
+            index = index.parent()
+
+        if not index.parent().isValid():
+            return None, None
+
+        return index.parent().data(), index.data()
+
+    def show_device_history(self, index):
+        """Show the history of the device (or device property) at index."""
+        self.ui.history_widget.set_device(*self.device_at(index))
+
+    def show_context_menu(self, position):
+        device_type, name = self.device_at(self.ui.treeView.indexAt(position))
+        if name is None:
+            return
+
+        menu = QMenu(self)
+        locate_action = menu.addAction("Locate on Playfield")
+        locate_action.setEnabled(
+            self.mpfmon.widget_registry.get(device_type, name) is not None)
+        if menu.exec_(self.ui.treeView.viewport().mapToGlobal(position)) == locate_action:
+            self.mpfmon.locate_device(device_type, name)
 
     def filter_text(self, string):
         wc_string = "*" + str(string) + "*"
@@ -330,22 +536,24 @@ class DeviceWindow(QWidget):
         self.ui.treeView.resizeColumnToContents(1)
 
     def change_sort(self, index=1):
-        self.model.layoutAboutToBeChanged.emit()
-        self.filtered_model.beginResetModel()
-
-        # This is a bit sloppy and probably should be reworked.
-        if index == 1:  # Received up
-            self.filtered_model.sort(2, Qt.AscendingOrder)
-        elif index == 2:  # Received down
-            self.filtered_model.sort(2, Qt.DescendingOrder)
-        elif index == 3:  # Name up
+        """Sort on the typed keys of the name column.
+
+        QSortFilterProxyModel.sort() is a layout change, so expansion and
+        selection survive it. With dynamic sorting the proxy places rows
+        inserted later with a binary search instead of sorting again.
+        """
+        if index in (1, 2):  # Received
+            self.filtered_model.setSortRole(DeviceNode.ReceivedRole)
+        elif index in (3, 4):  # Name
+            self.filtered_model.setSortRole(Qt.DisplayRole)
+        else:
+            return
+
+        if index in (1, 3):
             self.filtered_model.sort(0, Qt.AscendingOrder)
-        elif index == 4:  # Name down
+        else:
             self.filtered_model.sort(0, Qt.DescendingOrder)
 
-        self.filtered_model.endResetModel()
-        self.model.layoutChanged.emit()
-
     def closeEvent(self, event):
         super().closeEvent(event)
         self.mpfmon.write_local_settings()
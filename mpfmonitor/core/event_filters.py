@@ -0,0 +1,149 @@
+"""Suppression rules for noisy events, applied as BCP messages come in.
+
+Rules are listed under event_filters in monitor.yaml, first match wins:
+
+    event_filters:
+      - events: timer_*_tick
+        action: drop
+      - events: "*_hit"
+        action: sample
+        every: 10
+      - events: switch_*
+        action: rate_limit
+        per_second: 5
+"""
+
+import fnmatch
+import logging
+import re
+import time
+
+from collections import Counter
+from urllib.parse import unquote
+
+log = logging.getLogger('Event Filters')
+
+# The event name can be read from the raw message without decoding it. Both
+# the JSON and the query string encoding of BCP are handled.
+EVENT_NAME = re.compile(r'monitored_event\?(?:json=.*?"event_name":\s*"([^"\\]*)"'
+                        r'|(?:.*&)?event_name=([^&]*))')
+
+
+def peek_event_name(message):
+    """Return the event name of a monitored_event message, or None if it
+    can't be read without decoding the message."""
+    match = EVENT_NAME.match(message)
+    if match is None:
+        return None
+    if match.group(1) is not None:
+        return match.group(1)
+    return unquote(match.group(2))
+
+
+class EventFilterRule(object):
+
+    actions = ('drop', 'sample', 'rate_limit')
+
+    def __init__(self, pattern, action, every=1, per_second=1):
+        self.pattern = pattern
+        self.action = action
+        self.every = every
+        self.per_second = per_second
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a rule from its monitor.yaml entry, None if it is invalid."""
+        if not isinstance(config, dict) or not isinstance(config.get('events'), str):
+            log.warning("Ignoring event filter without events: %s", config)
+            return None
+
+        action = config.get('action', 'drop')
+        if action not in cls.actions:
+            log.warning("Ignoring event filter with unknown action: %s", config)
+            return None
+
+        every = config.get('every', 1)
+        per_second = config.get('per_second', 1)
+        if not isinstance(every, int) or every <= 0 or \
+                not isinstance(per_second, int) or per_second <= 0:
+            log.warning("Ignoring event filter with invalid limits: %s", config)
+            return None
+
+        return cls(config['events'], action, every, per_second)
+
+
+class EventFilter(object):
+    """Decides which events to keep and counts the ones that were not.
+
+    Patterns are only matched the first time an event name is seen, after
+    that the rule is looked up by name.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = [(re.compile(fnmatch.translate(rule.pattern)), rule)
+                      for rule in rules or []]
+        self.rule_by_name = dict()
+        self.seen = Counter()
+        self.windows = dict()
+        self.suppressed = Counter()
+
+    @classmethod
+    def from_config(cls, config):
+        if config is None:
+            return cls()
+
+        if not isinstance(config, list):  # Protect against corrupted rules
+            log.warning("Ignoring event_filters, it should be a list of rules")
+            return cls()
+
+        rules = [EventFilterRule.from_config(entry) for entry in config]
+        return cls([rule for rule in rules if rule is not None])
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def rule_for(self, name):
+        try:
+            return self.rule_by_name[name]
+        except KeyError:
+            pass
+
+        rule = None
+        for regex, candidate in self.rules:
+            if regex.match(name):
+                rule = candidate
+                break
+
+        self.rule_by_name[name] = rule
+        return rule
+
+    def allow(self, name, now=None):
+        """Return whether the event should be shown."""
+        rule = self.rule_for(name)
+        if rule is None:
+            return True
+
+        if rule.action == 'drop':
+            allowed = False
+
+        elif rule.action == 'sample':
+            allowed = self.seen[name] % rule.every == 0
+            self.seen[name] += 1
+
+        else:  # rate_limit
+            second = int(time.monotonic() if now is None else now)
+            window_second, count = self.windows.get(name, (second, 0))
+            if window_second != second:
+                count = 0
+            allowed = count < rule.per_second
+            self.windows[name] = (second, count + 1)
+
+        if not allowed:
+            self.suppressed[name] += 1
+
+        return allowed
+
+    def clear(self):
+        self.seen.clear()
+        self.windows.clear()
+        self.suppressed.clear()
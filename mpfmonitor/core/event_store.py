@@ -0,0 +1,265 @@
+"""Append-only on-disk history of events that left the in-memory window."""
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+
+from collections import OrderedDict
+
+
+def kwarg_text(kwargs, key):
+    """Return str() of the kwarg key in JSON encoded kwargs, None if there
+    is no such kwarg. It is the text EventMatcher matches in memory, so a
+    filter finds True and None on disk as well."""
+    try:
+        return str(json.loads(kwargs)[key])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class EventStore(object):
+    """SQLite store of evicted events, written by a background thread.
+
+    Records are addressed by their sequence number. Reads page them in from
+    disk in blocks of page_size and keep the most recent pages cached, so a
+    view scrolling through millions of rows only loads what it shows.
+    Records handed to append() are readable right away, before the writer
+    got to them. Kwargs are stored as JSON so they can be searched.
+    """
+
+    def __init__(self, db_file, thread_stopper, record_class, page_size=256,
+                 cached_pages=64):
+        self.log = logging.getLogger('EventStore')
+        self.db_file = db_file
+        self.thread_stopper = thread_stopper
+        self.record_class = record_class
+        self.page_size = page_size
+        self.cached_pages = cached_pages
+
+        self.first_seq = 0
+        self.next_seq = 0
+        self.committed_seq = 0
+
+        self.lock = threading.Lock()
+        self.unwritten = dict()
+        self.pages = OrderedDict()
+        self.queue = queue.Queue()
+
+        # Every session starts a new history
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(db_file + suffix)
+            except FileNotFoundError:
+                pass
+
+        self.db = self.connect()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE events (seq INTEGER PRIMARY KEY, "
+                        "name TEXT NOT NULL, kwargs TEXT, count INTEGER, "
+                        "first_time REAL, last_time REAL)")
+        # Covering indexes, name and time searches never touch the table
+        self.db.execute("CREATE INDEX events_name ON events (name, seq)")
+        self.db.execute("CREATE INDEX events_time ON events (first_time, seq)")
+        self.db.commit()
+
+        self.writer_thread = threading.Thread(target=self.write_loop)
+        self.writer_thread.start()
+
+    def __len__(self):
+        return self.next_seq - self.first_seq
+
+    def connect(self):
+        """Open a connection that can run search queries."""
+        db = sqlite3.connect(self.db_file)
+        db.create_function("kwarg_text", 2, kwarg_text, deterministic=True)
+        return db
+
+    def append(self, records):
+        """Queue records (in sequence order) for writing."""
+        if not records:
+            return
+
+        rows = [(record.seq, record.name, json.dumps(record.kwargs, default=str),
+                 record.count, record.first_time, record.last_time)
+                for record in records]
+
+        with self.lock:
+            for record in records:
+                self.unwritten[record.seq] = record
+
+        self.next_seq = records[-1].seq + 1
+        self.queue.put(rows)
+
+    def get(self, seq):
+        if not self.first_seq <= seq < self.next_seq:
+            return None
+
+        page_number = seq // self.page_size
+        page = self.pages.get(page_number)
+
+        if page is None:
+            with self.lock:
+                record = self.unwritten.get(seq)
+            if record is not None:
+                return record
+
+            page = self.load_page(page_number)
+        else:
+            self.pages.move_to_end(page_number)
+
+        return page.get(seq)
+
+    def load_page(self, page_number):
+        first = page_number * self.page_size
+        last = first + self.page_size
+
+        # Take both before the query. The writer may commit while it runs,
+        # the records it takes out of unwritten then are in the query.
+        with self.lock:
+            committed = self.committed_seq
+            unwritten = [self.unwritten[seq] for seq in range(first, last)
+                         if seq in self.unwritten]
+
+        page = dict()
+        for seq, name, kwargs, count, first_time, last_time in self.db.execute(
+                "SELECT seq, name, kwargs, count, first_time, last_time FROM events "
+                "WHERE seq >= ? AND seq < ?", (max(first, self.first_seq), last)):
+            page[seq] = self.record_class(name, json.loads(kwargs), seq,
+                                          first_time, last_time, count)
+
+        # Only keep pages that were complete on disk when the query ran
+        if last <= committed:
+            self.pages[page_number] = page
+            if len(self.pages) > self.cached_pages:
+                self.pages.popitem(last=False)
+        else:
+            for record in unwritten:
+                page.setdefault(record.seq, record)
+
+        return page
+
+    def seq_at_time(self, timestamp):
+        """Return the first stored sequence number received at or after
+        timestamp, next_seq if there is none."""
+        found = self.db.execute(
+            "SELECT seq FROM events WHERE first_time >= ? AND seq >= ? "
+            "ORDER BY first_time, seq LIMIT 1", (timestamp, self.first_seq)).fetchone()
+
+        seqs = [self.next_seq] if found is None else [found[0]]
+        with self.lock:
+            seqs += [seq for seq, record in self.unwritten.items()
+                     if record.first_time >= timestamp]
+
+        return min(seqs)
+
+    def search(self, pattern, kwarg_filters, accepts, first_seq=None, end_seq=None):
+        """Return the sequence numbers of stored events whose name matches the
+        wildcard pattern (None for all) and whose kwargs match kwarg_filters,
+        optionally limited to the range first_seq to end_seq.
+
+        accepts is the same test in Python, for records not written yet.
+        """
+        seqs = []
+        for chunk in self.search_chunks(pattern, kwarg_filters, accepts,
+                                        first_seq, end_seq):
+            seqs += chunk
+        return seqs
+
+    def search_chunks(self, pattern, kwarg_filters, accepts, first_seq=None,
+                      end_seq=None, db=None, chunk_size=1024):
+        """Like search(), but yields the results in ascending chunks as they
+        are read. Other threads have to pass their own connect() as db."""
+        first_seq = self.first_seq if first_seq is None else max(first_seq, self.first_seq)
+        end_seq = self.next_seq if end_seq is None else end_seq
+
+        # Look at the unwritten records first. Anything written after this
+        # is still in the query below.
+        with self.lock:
+            unwritten = sorted(seq for seq, record in self.unwritten.items()
+                               if first_seq <= seq < end_seq and accepts(record))
+
+        query = "SELECT seq FROM events WHERE seq >= ? AND seq < ?"
+        args = [first_seq, end_seq]
+
+        if pattern is not None:
+            query += " AND name GLOB ?"
+            args.append(pattern)
+
+        for kwarg_filter in kwarg_filters:
+            query += " AND kwarg_text(kwargs, ?) GLOB ?"
+            args += [kwarg_filter.key, kwarg_filter.pattern]
+
+        cursor = (db or self.db).execute(query + " ORDER BY seq", args)
+        last_seq = -1
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            last_seq = rows[-1][0]
+            yield [seq for seq, in rows]
+
+        # Records are written in order, those the query missed come last
+        unwritten = [seq for seq in unwritten if seq > last_seq]
+        if unwritten:
+            yield unwritten
+
+    def clear(self, next_seq):
+        """Forget everything stored so far, new records start at next_seq."""
+        self.queue.put('clear')
+        with self.lock:
+            self.unwritten.clear()
+        self.pages.clear()
+        self.first_seq = self.next_seq = next_seq
+
+    def write_loop(self):
+        db = sqlite3.connect(self.db_file)
+        db.execute("PRAGMA synchronous=OFF")
+
+        while True:
+            try:
+                batch = [self.queue.get(block=True, timeout=1)]
+            except queue.Empty:
+                if self.thread_stopper.is_set():
+                    break
+                continue
+
+            # Write everything that piled up in one transaction
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            done = False
+            written = []
+
+            with db:
+                for rows in batch:
+                    if rows is None:
+                        done = True
+                        break
+                    elif rows == 'clear':
+                        db.execute("DELETE FROM events")
+                    else:
+                        db.executemany("INSERT OR REPLACE INTO events "
+                                       "VALUES (?, ?, ?, ?, ?, ?)", rows)
+                        written += rows
+
+            with self.lock:
+                for row in written:
+                    self.unwritten.pop(row[0], None)
+                if written:
+                    self.committed_seq = max(self.committed_seq, written[-1][0] + 1)
+
+            if done or self.thread_stopper.is_set():
+                break
+
+        db.close()
+
+    def close(self):
+        self.queue.put(None)
+        self.writer_thread.join()
+        self.db.close()
@@ -3,9 +3,833 @@ from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 from PyQt5 import uic
 
+import fnmatch
+import logging
 import os
+import queue
+import re
+import sqlite3
+import threading
 import time
 
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from mpfmonitor.core.event_store import EventStore
+
+# Events are stamped with time.perf_counter() as they are received, this
+# turns those stamps into wall clock time for display.
+WALL_CLOCK_OFFSET = time.time() - time.perf_counter()
+
+
+class EventRecord(object):
+    """One received event, kept as small as possible.
+
+    When repeats are collapsed one record stands for count consecutive
+    events with the same name, received between first_time and last_time.
+    """
+
+    __slots__ = ('seq', 'name', 'kwargs', 'count', 'first_time', 'last_time')
+
+    def __init__(self, name, kwargs, seq=-1, first_time=0.0, last_time=None, count=1):
+        self.seq = seq
+        self.name = name
+        self.kwargs = kwargs
+        self.count = count
+        self.first_time = first_time
+        self.last_time = first_time if last_time is None else last_time
+
+
+KwargFilter = namedtuple('KwargFilter', ['key', 'pattern', 'regex'])
+
+
+def parse_filter(text):
+    """Split filter text into a wildcard pattern for the event name,
+    key=value filters on the kwargs and a time range.
+
+    "ball player=1" shows events with ball in their name whose player
+    kwarg is 1. Values may contain wildcards. ">12:01:05 <12:02" only shows
+    events received in between.
+    """
+    names = []
+    kwarg_filters = []
+    time_range = [None, None]
+    for token in str(text).split():
+        key, sep, value = token.partition('=')
+        if token[0] in '><' and parse_time(token[1:]) is not None:
+            time_range[token[0] == '<'] = parse_time(token[1:])
+        elif sep and key:
+            kwarg_filters.append(KwargFilter(key, value, re.compile(fnmatch.translate(value))))
+        else:
+            names.append(token)
+
+    if time_range == [None, None]:
+        time_range = None
+    else:
+        time_range = tuple(time_range)
+
+    return "*" + " ".join(names) + "*", kwarg_filters, time_range
+
+
+def parse_time(text):
+    """Turn a wall clock time of today (HH:MM[:SS[.fff]]) into an event
+    time stamp, None if text is no time."""
+    for time_format in ('%H:%M:%S.%f', '%H:%M:%S', '%H:%M'):
+        try:
+            parsed = datetime.strptime(text, time_format).time()
+        except ValueError:
+            continue
+        wall_time = datetime.combine(datetime.now().date(), parsed).timestamp()
+        return wall_time - WALL_CLOCK_OFFSET
+    return None
+
+
+def format_time(timestamp):
+    wall_time = timestamp + WALL_CLOCK_OFFSET
+    return time.strftime('%H:%M:%S', time.localtime(wall_time)) + \
+        '.{:03d}'.format(int(wall_time % 1 * 1000))
+
+
+class EventMatcher(object):
+    """The filter test for event records. It never changes once built, so
+    it can be handed to a filter thread."""
+
+    def __init__(self, regex=None, kwarg_filters=(), time_range=None):
+        self.regex = regex
+        self.kwarg_filters = tuple(kwarg_filters)
+        self.time_range = time_range
+
+    def __bool__(self):
+        return self.regex is not None or bool(self.kwarg_filters) or \
+            self.time_range is not None
+
+    def __call__(self, record):
+        if self.regex is not None and not self.regex.match(record.name):
+            return False
+
+        if self.time_range is not None:
+            start, end = self.time_range
+            if start is not None and record.first_time < start:
+                return False
+            if end is not None and record.first_time >= end:
+                return False
+
+        return self.kwargs_match(record.kwargs)
+
+    def kwargs_match(self, kwargs):
+        for kwarg_filter in self.kwarg_filters:
+            try:
+                value = kwargs[kwarg_filter.key]
+            except (KeyError, TypeError):
+                return False
+            if not kwarg_filter.regex.match(str(value)):
+                return False
+
+        return True
+
+
+class FilterPass(object):
+    """One run of a filter over the event history in a worker thread.
+
+    Matching sequence numbers are put on the results queue in ascending
+    chunks, followed by None once the pass is complete. Setting cancelled
+    stops the pass at the next chunk.
+    """
+
+    chunk_size = 1024
+
+    def __init__(self, generation, matcher, records, store=None, store_search=None):
+        self.generation = generation
+        self.matcher = matcher
+        self.records = records
+        self.store = store
+        self.store_search = store_search
+        self.cancelled = threading.Event()
+        self.results = queue.Queue()
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        if self.store_search is not None:
+            db = self.store.connect()
+            try:
+                for chunk in self.store.search_chunks(*self.store_search, db=db,
+                                                      chunk_size=self.chunk_size):
+                    if self.cancelled.is_set():
+                        return
+                    self.results.put(chunk)
+            finally:
+                db.close()
+
+        for start in range(0, len(self.records), self.chunk_size):
+            if self.cancelled.is_set():
+                return
+            chunk = [record.seq for record in self.records[start:start + self.chunk_size]
+                     if self.matcher(record)]
+            if chunk:
+                self.results.put(chunk)
+
+        self.results.put(None)
+
+
+class EventRingBuffer(object):
+    """Fixed capacity store of the newest event records.
+
+    Records are numbered with an ever increasing sequence number and can be
+    looked up by it while they are still in the buffer.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.records = [None] * capacity
+        self.first_seq = 0
+        self.next_seq = 0
+
+    def __len__(self):
+        return self.next_seq - self.first_seq
+
+    def __iter__(self):
+        for seq in range(self.first_seq, self.next_seq):
+            yield self.records[seq % self.capacity]
+
+    def append(self, record):
+        """Store record, evicting the oldest one if the buffer is full."""
+        if len(self) == self.capacity:
+            self.discard_oldest(1)
+
+        record.seq = self.next_seq
+        self.records[self.next_seq % self.capacity] = record
+        self.next_seq += 1
+
+    def discard_oldest(self, count):
+        for seq in range(self.first_seq, self.first_seq + min(count, len(self))):
+            self.records[seq % self.capacity] = None
+        self.first_seq = min(self.first_seq + count, self.next_seq)
+
+    def get(self, seq):
+        if self.first_seq <= seq < self.next_seq:
+            return self.records[seq % self.capacity]
+        return None
+
+    def advance(self, count):
+        """Skip count sequence numbers handed out elsewhere. The buffer has
+        to be empty."""
+        self.next_seq += count
+        self.first_seq = self.next_seq
+
+    def skip(self, records):
+        """Number records without keeping them, for records that would be
+        evicted right away. The buffer has to be empty."""
+        for record in records:
+            record.seq = self.next_seq
+            self.next_seq += 1
+        self.first_seq = self.next_seq
+
+    def copy_range(self, first_seq, end_seq):
+        """Return the records from first_seq up to end_seq as a new list."""
+        first_seq = max(first_seq, self.first_seq)
+        count = min(end_seq, self.next_seq) - first_seq
+        if count <= 0:
+            return []
+
+        start = first_seq % self.capacity
+        if start + count <= self.capacity:
+            return self.records[start:start + count]
+        return self.records[start:] + self.records[:start + count - self.capacity]
+
+    def clear(self):
+        self.records = [None] * self.capacity
+        self.first_seq = self.next_seq
+
+
+class EventTableModel(QAbstractTableModel):
+    """Table model over a ring buffer of the most recent events.
+
+    New events are queued with add() and handed to the view in one batch by
+    flush(), so the view sees one insert (and at most one removal of evicted
+    rows) per frame, no matter how many events arrived.
+
+    Without a filter and sorted by time the rows map straight onto sequence
+    numbers. A filter or the name sort keep a list of the visible sequence
+    numbers in sort order instead.
+
+    With a store, events evicted from the ring are moved to disk and stay
+    in the time sorted views, which then only read the rows Qt asks for.
+    The name sort only covers the events still in the ring.
+
+    Nobody flushes a hidden or paused window. Once pending_limit events
+    are queued, the oldest half is numbered and written to the store
+    (spilled) without showing them yet, the next flush() adds their rows.
+    Without a store they are dropped.
+
+    Filtering more than sync_filter_limit records in time order runs in a
+    FilterPass thread. Its results are added to the view at each flush()
+    while it runs, a new filter cancels it.
+
+    With collapse on, an event with the same name as the newest one only
+    bumps that record's count, it updates the existing row instead of
+    adding one.
+
+    Records are received in time order, so sequence numbers double as a
+    time index: finding the events of a point or range in time is a binary
+    search.
+    """
+
+    headers = ["Event", "Data", "Repeats", "First", "Last", "Time", "Δ"]
+
+    kwargs_cache_size = 4096
+    sync_filter_limit = 20000
+
+    def __init__(self, capacity=10000, store=None, pending_limit=None, parent=None):
+        super().__init__(parent)
+        self.ring = EventRingBuffer(capacity)
+        self.store = store
+        self.pending = []
+        self.pending_limit = pending_limit or 2 * capacity
+        # Events already numbered and in the store, shown by the next flush
+        self.spilled = 0
+        self.changed = set()
+        self.collapse = False
+        self.kwargs_cache = OrderedDict()
+
+        self.by_name = False
+        self.descending = True
+        self.filter_pattern = None
+        self.filter_regex = None
+        self.kwarg_filters = []
+        self.time_range = None
+        self.matcher = EventMatcher()
+        self.delta_origin = None
+
+        self.filter_pass = None
+        self.generation = 0
+
+        self._order = None
+        self._keys = None
+
+    # Qt model interface
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._count()
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+
+        record = self.record(index.row())
+        if record is None:
+            return None
+
+        column = index.column()
+        if column == 0:
+            return record.name
+        elif column == 1:
+            return self.format_kwargs(record)
+        elif column == 2:
+            return str(record.count)
+        elif column in (3, 5):
+            return format_time(record.first_time)
+        elif column == 4:
+            return format_time(record.last_time)
+
+        # Time since the selected or else the previous event
+        if self.delta_origin is None:
+            origin = self._get(record.seq - 1)
+        else:
+            origin = self._get(self.delta_origin)
+        if origin is None:
+            return None
+        return '{:+.6f}'.format(record.first_time - origin.first_time)
+
+    def format_kwargs(self, record):
+        """Kwargs are only turned into text for the rows that are painted,
+        the most recent ones are cached."""
+        text = self.kwargs_cache.get(record.seq)
+        if text is None:
+            text = str(record.kwargs)
+            self.kwargs_cache[record.seq] = text
+            if len(self.kwargs_cache) > self.kwargs_cache_size:
+                self.kwargs_cache.popitem(last=False)
+        else:
+            self.kwargs_cache.move_to_end(record.seq)
+        return text
+
+    # Rows and sequence numbers
+
+    def _first_seq(self):
+        if self.store is None:
+            return self.ring.first_seq
+        return self.store.first_seq
+
+    def _get(self, seq):
+        record = self.ring.get(seq)
+        if record is None and self.store is not None:
+            record = self.store.get(seq)
+        return record
+
+    def _count(self):
+        if self._order is None:
+            return self.ring.next_seq - self._first_seq()
+        return len(self._order)
+
+    def _pos(self, row, count=None):
+        """Convert a row into a position in sort order and back."""
+        if count is None:
+            count = self._count()
+        return count - 1 - row if self.descending else row
+
+    def _key(self, record):
+        if self.by_name:
+            return record.name, record.seq
+        return record.seq
+
+    def _filtering(self):
+        return bool(self.matcher)
+
+    def _accepts(self, record):
+        return self.matcher(record)
+
+    def seq_at(self, row):
+        pos = self._pos(row)
+        if self._order is None:
+            return self._first_seq() + pos
+        return self._order[pos]
+
+    def record(self, row):
+        if not 0 <= row < self._count():
+            return None
+        return self._get(self.seq_at(row))
+
+    def row_of_seq(self, seq):
+        """Return the row showing seq, or -1 if it isn't shown."""
+        record = self._get(seq)
+        if record is None:
+            return -1
+
+        if self._order is None:
+            return self._pos(seq - self._first_seq())
+
+        keys = self._keys if self.by_name else self._order
+        key = self._key(record)
+        pos = bisect_left(keys, key)
+        if pos == len(keys) or keys[pos] != key:
+            return -1
+        return self._pos(pos)
+
+    # Time index
+
+    def seq_at_time(self, timestamp):
+        """Return the first sequence number received at or after timestamp,
+        the next sequence number if there is none."""
+        ring = self.ring
+        if self.store is not None and len(self.store):
+            if not len(ring) or ring.get(ring.first_seq).first_time >= timestamp:
+                # Spilled events are not shown yet
+                return min(self.store.seq_at_time(timestamp), ring.next_seq)
+
+        low, high = ring.first_seq, ring.next_seq
+        while low < high:
+            middle = (low + high) // 2
+            if ring.get(middle).first_time < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def seqs_between(self, start=None, end=None):
+        """Return the range of sequence numbers received from start up to
+        (not including) end. None leaves that side open."""
+        first = self._first_seq() if start is None else self.seq_at_time(start)
+        last = self.ring.next_seq if end is None else self.seq_at_time(end)
+        return range(first, max(first, last))
+
+    def row_at_time(self, timestamp):
+        """Return the row of the first shown event received at or after
+        timestamp (or the newest one), -1 if there is none."""
+        count = self._count()
+        if not count:
+            return -1
+
+        seq = self.seq_at_time(timestamp)
+        if self._order is None:
+            return self._pos(min(seq - self._first_seq(), count - 1))
+        if self.by_name:
+            return self.row_of_seq(seq)
+        return self._pos(min(bisect_left(self._order, seq), count - 1))
+
+    def set_delta_origin(self, seq):
+        """Show the Δ column relative to seq, or to the previous event for
+        None."""
+        self.delta_origin = seq
+        count = self._count()
+        if count:
+            column = self.headers.index("Δ")
+            self.dataChanged.emit(self.index(0, column), self.index(count - 1, column))
+
+    # Adding events
+
+    def add(self, name, kwargs, timestamp=None):
+        """Queue an event for the next flush()."""
+        if timestamp is None:
+            timestamp = time.perf_counter()
+
+        if self.collapse:
+            if self.pending:
+                newest = self.pending[-1]
+            else:
+                newest = self.ring.get(self.ring.next_seq - 1)
+
+            # A repeat takes over the kwargs of the record, which must not
+            # change whether a kwarg filter shows it
+            if newest is not None and newest.name == name and \
+                    self.matcher.kwargs_match(newest.kwargs) == \
+                    self.matcher.kwargs_match(kwargs):
+                newest.count += 1
+                newest.last_time = timestamp
+                newest.kwargs = kwargs
+                self.kwargs_cache.pop(newest.seq, None)
+                if newest.seq >= 0:  # Already shown
+                    self.changed.add(newest.seq)
+                return
+
+        self.pending.append(EventRecord(name, kwargs, first_time=timestamp))
+
+        # Nobody is flushing (e.g. hidden or paused window), don't grow
+        # without bound
+        if len(self.pending) >= self.pending_limit:
+            count = len(self.pending) - self.pending_limit // 2
+            if self.store is None:
+                del self.pending[:count]
+            else:
+                self._spill(count)
+
+    def _spill(self, count):
+        """Write the oldest count pending events to the store."""
+        # Everything in the ring is older, it goes first so the store is
+        # written in sequence order
+        if self.by_name:
+            self._relayout(lambda: self._evict_by_name(len(self.ring)))
+        else:
+            self._evict(len(self.ring))  # Rows stay, read from disk
+
+        records = self.pending[:count]
+        del self.pending[:count]
+
+        next_seq = self.ring.next_seq + self.spilled
+        for i, record in enumerate(records):
+            record.seq = next_seq + i
+        self.store.append(records)
+        self.spilled += count
+
+    def flush(self):
+        """Hand all queued events, updated rows and filter results to the
+        view in one batch."""
+        if self.filter_pass is not None:
+            self._take_filter_results()
+
+        if self.pending or self.spilled:
+            if self.store is None:
+                records = self.pending[-self.ring.capacity:]
+            else:
+                records = self.pending  # What doesn't fit goes to disk
+            self.pending = []
+
+            if self.by_name:
+                self._relayout(lambda: self._insert_by_name(records))
+            else:
+                self._insert_by_seq(records)
+
+        if self.changed:
+            last_column = len(self.headers) - 1
+            for seq in self.changed:
+                row = self.row_of_seq(seq)
+                if row >= 0:
+                    self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+            self.changed.clear()
+
+    def _take_filter_results(self):
+        filter_pass = self.filter_pass
+        while True:
+            try:
+                seqs = filter_pass.results.get_nowait()
+            except queue.Empty:
+                return
+
+            if seqs is None:  # Pass complete
+                self.filter_pass = None
+                return
+
+            if filter_pass.generation == self.generation:
+                self._insert_filtered(seqs)
+
+    def _insert_filtered(self, seqs):
+        """Add an ascending run of matching sequence numbers, all older than
+        the events added since the filter pass started."""
+        first_seq = self._first_seq()
+        if seqs[0] < first_seq:  # Evicted meanwhile
+            seqs = seqs[bisect_left(seqs, first_seq):]
+            if not seqs:
+                return
+
+        pos = bisect_left(self._order, seqs[0])
+        count = self._count()
+        first_row = count - pos if self.descending else pos
+
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(seqs) - 1)
+        self._order[pos:pos] = seqs
+        self.endInsertRows()
+
+    def is_filtering(self):
+        """Return whether a filter pass is still running."""
+        return self.filter_pass is not None
+
+    def cancel_filter(self):
+        if self.filter_pass is not None:
+            self.filter_pass.cancel()
+            self.filter_pass = None
+
+    def _evict(self, count):
+        """Drop the oldest count records from the ring, moving them to the
+        store if there is one."""
+        count = min(count, len(self.ring))
+        if self.store is not None and count:
+            first = self.ring.first_seq
+            self.store.append([self.ring.get(seq) for seq in range(first, first + count)])
+        self.ring.discard_oldest(count)
+
+    def _append_records(self, records):
+        """Number records and put them in the ring. With more records than
+        fit, the oldest go straight to the store."""
+        if self.spilled:
+            self.ring.advance(self.spilled)
+            self.spilled = 0
+
+        overflow = len(records) - self.ring.capacity
+        if overflow > 0:
+            self.ring.skip(records[:overflow])
+            self.store.append(records[:overflow])
+            records = records[overflow:]
+
+        for record in records:
+            self.ring.append(record)
+
+    def _insert_by_seq(self, records):
+        # Time order: evicted rows are the oldest block, new rows the newest
+        evict = max(0, len(self.ring) + len(records) - self.ring.capacity)
+        count = self._count()
+
+        if self.store is not None:
+            removed = 0  # Evicted rows stay visible, read from disk
+        elif self._order is None:
+            removed = evict
+        else:
+            removed = bisect_left(self._order, self.ring.first_seq + evict)
+
+        if removed:
+            if self.descending:
+                self.beginRemoveRows(QModelIndex(), count - removed, count - 1)
+            else:
+                self.beginRemoveRows(QModelIndex(), 0, removed - 1)
+
+        self._evict(evict)
+        if self._order is not None:
+            del self._order[:removed]
+
+        if removed:
+            self.endRemoveRows()
+
+        first_seq = self.ring.next_seq + self.spilled
+        if self._order is None:
+            added = None
+            added_count = self.spilled + len(records)
+        else:
+            added = [first_seq + i for i, record in enumerate(records)
+                     if self._accepts(record)]
+            if self.spilled:
+                added[:0] = self.store.search(self.filter_pattern, self.kwarg_filters,
+                                              self._accepts, self.ring.next_seq, first_seq)
+            added_count = len(added)
+
+        count = self._count()
+        if added_count:
+            if self.descending:
+                self.beginInsertRows(QModelIndex(), 0, added_count - 1)
+            else:
+                self.beginInsertRows(QModelIndex(), count, count + added_count - 1)
+
+        self._append_records(records)
+        if added:
+            self._order.extend(added)
+
+        if added_count:
+            self.endInsertRows()
+
+    def _insert_by_name(self, records):
+        evict = max(0, len(self.ring) + len(records) - self.ring.capacity)
+        self._evict_by_name(evict)
+        self._append_records(records)
+
+        # Only what is in memory is sorted by name
+        for record in records[-self.ring.capacity:]:
+            if self._accepts(record):
+                key = self._key(record)
+                pos = bisect_left(self._keys, key)
+                self._keys.insert(pos, key)
+                self._order.insert(pos, record.seq)
+
+    def _evict_by_name(self, evict):
+        evict = min(evict, len(self.ring))
+        for seq in range(self.ring.first_seq, self.ring.first_seq + evict):
+            key = self._key(self.ring.get(seq))
+            pos = bisect_left(self._keys, key)
+            if pos < len(self._keys) and self._keys[pos] == key:
+                del self._keys[pos]
+                del self._order[pos]
+
+        self._evict(evict)
+
+    # Sorting and filtering
+
+    def _relayout(self, change):
+        """Apply change as a layout change, keeping selection and current
+        row on the same events."""
+        self.layoutAboutToBeChanged.emit()
+
+        old_indexes = self.persistentIndexList()
+        seqs = [self.seq_at(index.row()) for index in old_indexes]
+
+        change()
+
+        new_indexes = []
+        for index, seq in zip(old_indexes, seqs):
+            row = self.row_of_seq(seq)
+            new_indexes.append(self.index(row, index.column()) if row >= 0 else QModelIndex())
+
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
+
+    def _rebuild_order(self):
+        self.cancel_filter()
+        self.generation += 1
+
+        if not self.by_name and not self._filtering():
+            self._order = None
+            self._keys = None
+            return
+
+        seqs = self.seqs_between(*(self.time_range or ()))
+
+        if not self.by_name and self.filter_regex is None and not self.kwarg_filters:
+            # Only a time range, no need to look at the records
+            self._keys = None
+            self._order = list(seqs)
+            return
+
+        ring_seqs = range(max(seqs.start, self.ring.first_seq), seqs.stop)
+
+        if not self.by_name and len(seqs) > self.sync_filter_limit:
+            self._start_filter_pass(seqs, ring_seqs)
+            return
+
+        records = [record for record in map(self.ring.get, ring_seqs)
+                   if self._accepts(record)]
+
+        if self.by_name:
+            self._keys = sorted(self._key(record) for record in records)
+            self._order = [seq for _, seq in self._keys]
+        else:
+            self._keys = None
+            self._order = [record.seq for record in records]
+            if self.store is not None and seqs.start < self.ring.first_seq:
+                self._order[:0] = self.store.search(self.filter_pattern,
+                                                    self.kwarg_filters,
+                                                    self._accepts,
+                                                    seqs.start, self.ring.first_seq)
+
+    def _start_filter_pass(self, seqs, ring_seqs):
+        # Rows are added as the pass finds them
+        self._keys = None
+        self._order = []
+
+        store_search = None
+        if self.store is not None and seqs.start < self.ring.first_seq:
+            store_search = (self.filter_pattern, self.kwarg_filters, self.matcher,
+                            seqs.start, self.ring.first_seq)
+
+        self.filter_pass = FilterPass(self.generation, self.matcher,
+                                      self.ring.copy_range(ring_seqs.start, ring_seqs.stop),
+                                      self.store, store_search)
+        self.filter_pass.start()
+
+    def set_collapse(self, collapse):
+        """Collapse repeats of the same event from now on, rows already
+        shown stay as they are."""
+        self.collapse = collapse
+
+    def set_sort(self, by_name=False, descending=True):
+        def change():
+            self.by_name = by_name
+            self.descending = descending
+            self._rebuild_order()
+
+        self.flush()
+        self._relayout(change)
+
+    def set_filter(self, pattern, kwarg_filters=(), time_range=None):
+        """Only show events whose name matches the wildcard pattern, whose
+        kwargs match all kwarg_filters and which were received in
+        time_range (see parse_filter)."""
+        self.flush()
+        self.beginResetModel()
+
+        self.kwarg_filters = list(kwarg_filters)
+        self.time_range = time_range
+
+        if pattern.strip('*'):
+            self.filter_pattern = pattern
+            self.filter_regex = re.compile(fnmatch.translate(pattern))
+        else:
+            self.filter_pattern = None
+            self.filter_regex = None
+
+        self.matcher = EventMatcher(self.filter_regex, self.kwarg_filters, time_range)
+        self._rebuild_order()
+
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self.ring.clear()
+        if self.store is not None:
+            self.store.clear(self.ring.next_seq)
+        self.pending = []
+        self.spilled = 0
+        self.changed.clear()
+        self.kwargs_cache.clear()
+        self.delta_origin = None
+        self._rebuild_order()
+        self.endResetModel()
+
+
 class EventWindow(QWidget):
 
     def __init__(self, mpfmon):
@@ -13,13 +837,12 @@ class EventWindow(QWidget):
         super().__init__()
         self.ui = None
         self.model = None
+        self.store = None
+        self.paused = False
         self.draw_ui()
         self.attach_model()
         self.attach_signals()
 
-        self.already_hidden = False
-        self.added_index = 0
-
     def draw_ui(self):
         # Load ui file from ./ui/
         ui_path = os.path.join(os.path.dirname(__file__), "ui", "searchable_table.ui")
@@ -37,65 +860,207 @@ class EventWindow(QWidget):
         self.ui.sortComboBox.model().item(0).setEnabled(False)
         self.ui.sortComboBox.setCurrentIndex(1)
 
+        options_layout = QHBoxLayout()
+
+        self.ui.collapseCheckBox = QCheckBox("Collapse repeats", self)
+        self.ui.collapseCheckBox.setToolTip("Show repeats of the same event as one row")
+        options_layout.addWidget(self.ui.collapseCheckBox)
+
+        self.ui.deltaCheckBox = QCheckBox("Δ to selected", self)
+        self.ui.deltaCheckBox.setToolTip("Show the time since the selected event "
+                                         "instead of since the previous one")
+        options_layout.addWidget(self.ui.deltaCheckBox)
+
+        options_layout.addStretch()
+
+        self.ui.timeLineEdit = QLineEdit(self)
+        self.ui.timeLineEdit.setPlaceholderText("Go to time")
+        self.ui.timeLineEdit.setToolTip("HH:MM:SS.fff, filter with >time and <time")
+        self.ui.timeLineEdit.setMaximumWidth(100)
+        options_layout.addWidget(self.ui.timeLineEdit)
+
+        self.ui.gridLayout.addLayout(options_layout, 2, 0, 1, 2)
+
+        # Kwargs of the selected event
+        self.ui.kwargsTree = QTreeWidget(self)
+        self.ui.kwargsTree.setHeaderLabels(["Key", "Value"])
+        self.ui.kwargsTree.setMaximumHeight(150)
+        self.ui.gridLayout.addWidget(self.ui.kwargsTree, 3, 0, 1, 2)
+
+        pause_layout = QHBoxLayout()
+
+        self.ui.pauseCheckBox = QCheckBox("Pause", self)
+        self.ui.pauseCheckBox.setToolTip("Stop updating the table, events are "
+                                         "kept (on disk past event_pause_buffer) "
+                                         "and shown on resume")
+        pause_layout.addWidget(self.ui.pauseCheckBox)
+
+        self.ui.timingLabel = QLabel(self)
+        pause_layout.addWidget(self.ui.timingLabel)
+        pause_layout.addStretch()
+
+        self.ui.gridLayout.addLayout(pause_layout, 4, 0, 1, 2)
+
 
     def attach_signals(self):
         assert (self.ui is not None)
         self.ui.filterLineEdit.textChanged.connect(self.filter_text)
         self.ui.sortComboBox.currentIndexChanged.connect(self.change_sort)
+        self.ui.collapseCheckBox.toggled.connect(self.collapse_repeats)
+        self.ui.deltaCheckBox.toggled.connect(self.update_delta_origin)
+        self.ui.timeLineEdit.returnPressed.connect(self.jump_to_time)
+        self.ui.pauseCheckBox.toggled.connect(self.pause)
+        self.mpfmon.frame_scheduler.timings_updated.connect(self.show_timings)
 
 
     def attach_model(self):
-        self.model = QStandardItemModel(0, 2)
+        capacity = self.mpfmon.config.get("event_history_size", 10000)
+        if not isinstance(capacity, int) or capacity <= 0:  # Protect against corrupted size
+            capacity = 10000
 
-        self.model.setHeaderData(0, Qt.Horizontal, "Event")
-        self.model.setHeaderData(1, Qt.Horizontal, "Data")
-        # self.model.setHeaderData(2, Qt.Horizontal, "Time")
+        self.close_store()
+        if self.mpfmon.config.get("event_history_disk", True):
+            try:
+                self.store = EventStore(self.mpfmon.event_history_file,
+                                        self.mpfmon.thread_stopper, EventRecord)
+            except (sqlite3.Error, OSError) as e:
+                logging.getLogger('Core').warning(
+                    "Keeping event history in memory only: %s", e)
 
-        self.filtered_model = QSortFilterProxyModel(self)
-        self.filtered_model.setSourceModel(self.model)
-        self.filtered_model.setFilterKeyColumn(0)
-        self.filtered_model.setDynamicSortFilter(True)
+        pending_limit = 2 * capacity
+        if self.store is not None:
+            # Events queued past this go to disk, so a paused or hidden
+            # window can keep more of them in memory
+            pause_buffer = self.mpfmon.config.get("event_pause_buffer", 100000)
+            if isinstance(pause_buffer, int) and pause_buffer > pending_limit:
+                pending_limit = pause_buffer
+
+        self.model = EventTableModel(capacity, self.store, pending_limit)
 
         self.change_sort()  # Default sort
 
-        self.ui.tableView.setModel(self.filtered_model)
-        self.ui.tableView.setColumnHidden(2, True)
-        self.rootNode = self.model.invisibleRootItem()
+        self.ui.tableView.setModel(self.model)
+        self.ui.tableView.selectionModel().currentChanged.connect(self.show_event_kwargs)
+        self.ui.tableView.selectionModel().currentChanged.connect(self.update_delta_origin)
+        self.collapse_repeats(self.ui.collapseCheckBox.isChecked())
+
+        # Time and Δ go first
+        header = self.ui.tableView.horizontalHeader()
+        header.moveSection(header.visualIndex(5), 0)
+        header.moveSection(header.visualIndex(6), 1)
+
+    def close_store(self):
+        if self.model is not None:
+            self.model.cancel_filter()
+        if self.store is not None:
+            self.store.close()
+            self.store = None
 
     def add_event_to_model(self, event_name, event_type, event_callback,
-                             event_kwargs, registered_handlers):
+                             event_kwargs, registered_handlers, received=None):
         assert(self.model is not None)
         from_bcp = event_kwargs.pop('_from_bcp', False)
 
-        name = QStandardItem(event_name)
-        kwargs = QStandardItem(str(event_kwargs))
-        time_added = QStandardItem(str(self.added_index).zfill(10))
-        self.added_index = self.added_index+1
-        self.model.insertRow(0, [name, kwargs, time_added])
+        self.mpfmon.event_stats.record(event_name, handlers=registered_handlers)
+        self.model.add(event_name, event_kwargs, received)
+
+        # Hand the new events to the view once per frame
+        self.mpfmon.frame_scheduler.mark_dirty(self, 'flush_events',
+                                               self.flush_events)
+
+    def flush_events(self):
+        self.model.flush()
+        self.resize_columns_to_content()
+
+        # Keep picking up results while a filter pass runs
+        if self.model.is_filtering():
+            self.mpfmon.frame_scheduler.mark_dirty(self, 'flush_events',
+                                                   self.flush_events)
 
+    def resize_columns_to_content(self):
         self.ui.tableView.resizeColumnToContents(0)
         self.ui.tableView.resizeColumnToContents(1)
 
-        if not self.already_hidden:
-            self.ui.tableView.setColumnHidden(2, True)
-            self.already_hidden = True
+    def pause(self, paused):
+        """While paused the frame scheduler holds back all updates, events
+        pile up in the model and are added in one batch on resume. Past
+        event_pause_buffer queued events, the oldest go to the store."""
+        self.paused = paused
+
+    def show_timings(self, ingest_ms, render_ms):
+        if self.isVisible():
+            self.ui.timingLabel.setText(
+                "Ingest {:.1f} ms/s, render {:.1f} ms/s".format(ingest_ms, render_ms))
+
+    def update_delta_origin(self, *args):
+        current = self.ui.tableView.currentIndex()
+        if self.ui.deltaCheckBox.isChecked() and current.isValid():
+            self.model.set_delta_origin(self.model.seq_at(current.row()))
+        elif self.model.delta_origin is not None:
+            self.model.set_delta_origin(None)
+
+    def jump_to_time(self):
+        timestamp = parse_time(self.ui.timeLineEdit.text().strip())
+        if timestamp is None:
+            return
+
+        row = self.model.row_at_time(timestamp)
+        if row >= 0:
+            index = self.model.index(row, 0)
+            self.ui.tableView.setCurrentIndex(index)
+            self.ui.tableView.scrollTo(index, QAbstractItemView.PositionAtCenter)
+
+    def show_event_kwargs(self, current, previous=None):
+        self.ui.kwargsTree.clear()
+
+        record = self.model.record(current.row()) if current.isValid() else None
+        if record is None:
+            return
+
+        self.add_kwargs_items(self.ui.kwargsTree.invisibleRootItem(), record.kwargs)
+        self.ui.kwargsTree.resizeColumnToContents(0)
+
+    def add_kwargs_items(self, parent, value):
+        if isinstance(value, dict):
+            children = value.items()
+        elif isinstance(value, (list, tuple)):
+            children = enumerate(value)
+        else:
+            return
+
+        for key, child in children:
+            item = QTreeWidgetItem(parent, [str(key)])
+            if isinstance(child, (dict, list, tuple)):
+                self.add_kwargs_items(item, child)
+            else:
+                item.setText(1, str(child))
 
     def filter_text(self, string):
-        wc_string = "*" + str(string) + "*"
-        self.filtered_model.setFilterWildcard(wc_string)
+        self.model.set_filter(*parse_filter(string))
+
+        if self.model.is_filtering():
+            self.mpfmon.frame_scheduler.mark_dirty(self, 'flush_events',
+                                                   self.flush_events)
         self.ui.tableView.resizeColumnToContents(0)
         self.ui.tableView.resizeColumnToContents(1)
 
+    def collapse_repeats(self, collapse):
+        self.model.set_collapse(collapse)
+
+        # Repeat count and times only mean something with collapse on
+        for column in (2, 3, 4):
+            self.ui.tableView.setColumnHidden(column, not collapse)
+        self.ui.tableView.setColumnHidden(5, collapse)
+
     def change_sort(self, index=1):
-        # This is a bit sloppy and probably should be reworked.
         if index == 1:  # Received up
-            self.filtered_model.sort(2, Qt.DescendingOrder)
+            self.model.set_sort(by_name=False, descending=True)
         elif index == 2:  # Received down
-            self.filtered_model.sort(2, Qt.AscendingOrder)
+            self.model.set_sort(by_name=False, descending=False)
         elif index == 3:  # Name up
-            self.filtered_model.sort(0, Qt.AscendingOrder)
+            self.model.set_sort(by_name=True, descending=False)
         elif index == 4:  # Name down
-            self.filtered_model.sort(0, Qt.DescendingOrder)
+            self.model.set_sort(by_name=True, descending=True)
 
 
     def closeEvent(self, event):
@@ -0,0 +1,362 @@
+"""Switch activity and light on-time heatmaps of the playfield.
+
+Shown live over the playfield from the View menu, or computed offline from
+a capture (monitor/cache.txt, recorded with "mpf monitor -r") with
+
+    python -m mpfmonitor.core.heatmap <machine_path> [--lights] [-o file.png]
+
+Needs numpy.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from collections import Counter
+
+# will change these to specific imports once code is more final
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def heat_colors():
+    """Return the 256 entry color map, transparent black through red and
+    yellow to white, as premultiplied ARGB."""
+    value = numpy.linspace(0.0, 1.0, 256)
+    alpha = numpy.clip(value * 1.5, 0.0, .8)
+    red = numpy.clip(value * 3, 0.0, 1.0) * alpha
+    green = numpy.clip(value * 3 - 1, 0.0, 1.0) * alpha
+    blue = numpy.clip(value * 3 - 2, 0.0, 1.0) * alpha
+
+    channels = [numpy.round(channel * 255).astype(numpy.uint32)
+                for channel in (alpha, red, green, blue)]
+    return (channels[0] << 24) | (channels[1] << 16) | (channels[2] << 8) | channels[3]
+
+
+def positions_from_config(config, device_type):
+    """Return the playfield position (fractions of the width and height) of
+    every device of device_type placed in monitor.yaml."""
+    positions = dict()
+    for name, device_config in (config or dict()).get(device_type, dict()).items():
+        try:
+            positions[name] = (float(device_config['x']), float(device_config['y']))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return positions
+
+
+class Heatmap(object):
+    """Activity of one device type, spread over a grid of the playfield.
+
+    Switches add one per activation, lights the seconds they were lit. Each
+    amount is added to the grid as a small gaussian around the device as it
+    happens. The totals per device are kept as well, so the grid can be
+    rebuilt when a device is moved.
+    """
+
+    def __init__(self, device_type, width=128, height=256, radius=4):
+        self.device_type = device_type
+        self.radius = radius
+        self.grid = numpy.zeros((height, width), numpy.float32)
+
+        offsets = numpy.arange(-radius, radius + 1)
+        distance = offsets[None, :] ** 2 + offsets[:, None] ** 2
+        self.kernel = numpy.exp(-distance / (radius * radius / 2.0)).astype(numpy.float32)
+
+        self.positions = dict()
+        self.totals = Counter()
+        self.active = dict()
+        self.lit_since = dict()
+        self.version = 0
+
+    def set_positions(self, positions):
+        if positions == self.positions:
+            return
+
+        self.positions = positions
+        self.grid[:] = 0
+        for name, amount in self.totals.items():
+            self._splat(self.grid, name, amount)
+        self.version += 1
+
+    def record(self, name, state, timestamp=None):
+        if not isinstance(state, dict):
+            return
+
+        if timestamp is None:
+            timestamp = time.perf_counter()
+
+        if self.device_type == 'switch':
+            active = bool(state.get('state'))
+            if active and not self.active.get(name, False):
+                self.add(name, 1)
+            self.active[name] = active
+
+        else:
+            try:
+                lit = max(state['color']) > 0
+            except (KeyError, TypeError, ValueError):
+                return
+
+            if lit and name not in self.lit_since:
+                self.lit_since[name] = timestamp
+            elif not lit and name in self.lit_since:
+                self.add(name, timestamp - self.lit_since.pop(name))
+
+    def add(self, name, amount):
+        self.totals[name] += amount
+        self._splat(self.grid, name, amount)
+        self.version += 1
+
+    def finish(self, timestamp):
+        """Count lights that are still lit up to timestamp."""
+        for name in list(self.lit_since):
+            self.add(name, timestamp - self.lit_since.pop(name))
+
+    def _splat(self, grid, name, amount):
+        position = self.positions.get(name)
+        if position is None or not amount:
+            return
+
+        height, width = grid.shape
+        radius = self.radius
+        x = int(position[0] * width)
+        y = int(position[1] * height)
+
+        left, right = max(0, x - radius), min(width, x + radius + 1)
+        top, bottom = max(0, y - radius), min(height, y + radius + 1)
+        if left >= right or top >= bottom:
+            return
+
+        grid[top:bottom, left:right] += amount * self.kernel[
+            top - y + radius:bottom - y + radius, left - x + radius:right - x + radius]
+
+    def values(self, now=None):
+        """Return the grid, including lights that are lit right now."""
+        if not self.lit_since:
+            return self.grid
+
+        if now is None:
+            now = time.perf_counter()
+
+        grid = self.grid.copy()
+        for name, since in self.lit_since.items():
+            self._splat(grid, name, now - since)
+        return grid
+
+    def ranking(self):
+        """Return (name, total) of every placed device, busiest first.
+        Devices that never fired are at the end with 0."""
+        names = set(self.totals) | set(self.positions)
+        return sorted(((name, self.totals[name]) for name in names),
+                      key=lambda entry: (-entry[1], entry[0]))
+
+    def image(self, now=None):
+        """Render the grid as a transparent heat image."""
+        grid = self.values(now)
+        peak = grid.max()
+        if peak > 0:
+            # Square root, so quiet devices still show next to busy ones
+            levels = (numpy.sqrt(grid / peak) * 255).astype(numpy.uint8)
+        else:
+            levels = numpy.zeros(grid.shape, numpy.uint8)
+
+        pixels = heat_colors()[levels]
+        height, width = pixels.shape
+        return QImage(pixels.data, width, height, width * 4,
+                      QImage.Format_ARGB32_Premultiplied).copy()
+
+    def clear(self):
+        self.grid[:] = 0
+        self.totals.clear()
+        self.active.clear()
+        self.lit_since.clear()
+        self.version += 1
+
+
+def render_heatmap(heatmap, background=None, now=None):
+    """Return the heatmap blended over the background image, or alone."""
+    heat = heatmap.image(now)
+    if background is None or background.isNull():
+        return heat
+
+    image = background.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform, True)
+    painter.drawImage(QRectF(image.rect()), heat)
+    painter.end()
+    return image
+
+
+class HeatmapOverlay(QGraphicsItem):
+    """The live heatmap, drawn over the playfield image.
+
+    Device updates only touch the grid, the image is rebuilt at most once
+    per refresh_interval while the heatmap is shown.
+    """
+
+    refresh_interval = 1000
+    grid_width = 128
+
+    def __init__(self, mpfmon, playfield):
+        super().__init__(playfield)
+        self.mpfmon = mpfmon
+        self.rect = playfield.boundingRect()
+
+        aspect = self.rect.height() / self.rect.width() if self.rect.width() else 2.0
+        grid_height = max(1, int(round(self.grid_width * aspect)))
+        self.heatmaps = {device_type: Heatmap(device_type, self.grid_width, grid_height)
+                         for device_type in ('switch', 'light')}
+
+        self.device_type = None
+        self.image = None
+        self._image_key = None
+
+        self.setAcceptedMouseButtons(Qt.NoButton)
+        self.setVisible(False)
+
+        self.refresh_timer = QTimer()
+        self.refresh_timer.setInterval(self.refresh_interval)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    @staticmethod
+    def available():
+        return numpy is not None
+
+    def record(self, device_type, name, state, timestamp=None):
+        heatmap = self.heatmaps.get(device_type)
+        if heatmap is not None:
+            heatmap.record(name, state, timestamp)
+
+    def show_heatmap(self, device_type=None):
+        """Show the heatmap of 'switch' or 'light', None to hide it."""
+        self.device_type = device_type
+        self.setVisible(device_type is not None)
+        if device_type is None:
+            self.refresh_timer.stop()
+        else:
+            self.refresh()
+            self.refresh_timer.start()
+
+    def current(self):
+        heatmap = self.heatmaps[self.device_type or 'switch']
+        heatmap.set_positions(positions_from_config(self.mpfmon.config, heatmap.device_type))
+        return heatmap
+
+    def refresh(self):
+        heatmap = self.current()
+
+        # Lit lights keep heating up without new updates
+        key = (heatmap.device_type, heatmap.version)
+        if key == self._image_key and not heatmap.lit_since:
+            return
+
+        self.image = heatmap.image()
+        self._image_key = key
+        self.update()
+
+    def export(self, file_name, background=None):
+        return render_heatmap(self.current(), background).save(file_name)
+
+    def clear(self):
+        for heatmap in self.heatmaps.values():
+            heatmap.clear()
+        if self.isVisible():
+            self.refresh()
+
+    def boundingRect(self):
+        return self.rect
+
+    def paint(self, painter, option, widget=None):
+        if self.image is not None:
+            painter.setRenderHint(QPainter.SmoothPixmapTransform, True)
+            painter.drawImage(self.rect, self.image)
+
+
+def read_capture(capture_file):
+    """Yield (timestamp, command, kwargs) for the messages of a capture.
+
+    Every line of a capture is the delay in ms since the previous message,
+    a comma and the BCP message.
+    """
+    import mpf.core.bcp.bcp_socket_client as bcp
+
+    timestamp = 0.0
+    with open(capture_file, 'r') as f:
+        for line in f:
+            delay, _, message = line.rstrip('\n').partition(',')
+            try:
+                timestamp += int(delay) / 1000
+                cmd, kwargs = bcp.decode_command_string(message)
+            except ValueError:
+                continue
+            yield timestamp, cmd, kwargs
+
+
+def heatmap_from_capture(capture_file, config, device_type, width=128, height=256):
+    heatmap = Heatmap(device_type, width, height)
+    heatmap.set_positions(positions_from_config(config, device_type))
+
+    timestamp = 0.0
+    for timestamp, cmd, kwargs in read_capture(capture_file):
+        if cmd == 'device' and kwargs.get('type') == device_type:
+            heatmap.record(kwargs.get('name'), kwargs.get('state'), timestamp)
+
+    heatmap.finish(timestamp)
+    return heatmap
+
+
+def main(args=None):
+    import ruamel.yaml as yaml
+
+    parser = argparse.ArgumentParser(
+        description='Render a playfield heatmap from an MPF Monitor capture')
+    parser.add_argument("machine_path", help="The machine folder")
+    parser.add_argument("--lights", action="store_true",
+                        help="Light on-time instead of switch activations")
+    parser.add_argument("--capture", help="Capture file, default monitor/cache.txt")
+    parser.add_argument("-o", dest="output", help="PNG file, default "
+                        "monitor/heatmap_switches.png or heatmap_lights.png")
+    args = parser.parse_args(args)
+
+    if numpy is None:
+        parser.error("numpy is needed for heatmaps")
+
+    monitor_path = os.path.join(args.machine_path, "monitor")
+    device_type = 'light' if args.lights else 'switch'
+    capture_file = args.capture or os.path.join(monitor_path, "cache.txt")
+    output = args.output or os.path.join(
+        monitor_path, "heatmap_switches.png" if device_type == 'switch' else "heatmap_lights.png")
+
+    try:
+        with open(os.path.join(monitor_path, "monitor.yaml"), 'r') as f:
+            config = yaml.safe_load(f)
+    except FileNotFoundError:
+        config = dict()
+
+    app = QGuiApplication(sys.argv[:1])
+
+    background = QImage(os.path.join(monitor_path, "playfield.jpg"))
+    height = 256
+    if not background.isNull():
+        height = max(1, int(round(128 * background.height() / background.width())))
+
+    heatmap = heatmap_from_capture(capture_file, config, device_type, height=height)
+    if not render_heatmap(heatmap, background).save(output):
+        parser.error("could not write {}".format(output))
+
+    unit = 'activations' if device_type == 'switch' else 's lit'
+    for name, total in heatmap.ranking():
+        print("{:>10.1f} {} {}".format(total, unit, name))
+    print("Saved", output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+import time
+
+from array import array
+
+# will change these to specific imports once code is more final
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+
+
+def state_to_value(state):
+    """Reduce a device state dict to a single number that can be charted.
+
+    Lights chart their brightest channel, ball devices their ball count and
+    everything else the truthiness of its main state.
+    """
+    if not isinstance(state, dict):
+        return 0.0
+
+    try:
+        if 'color' in state:
+            return float(max(state['color']))
+        if 'brightness' in state:
+            return float(state['brightness'])
+        for key in ('balls', 'balls_locked'):
+            if key in state:
+                return float(state[key])
+        if 'state' in state:
+            return float(state['state'])
+        if 'enabled' in state:
+            return float(bool(state['enabled']))
+        if 'complete' in state:
+            return float(not state['complete'])
+    except (TypeError, ValueError):
+        pass
+
+    return 0.0
+
+
+def downsample(times, values, max_points):
+    """Min/max decimation of a series down to about max_points samples.
+
+    Each bucket keeps its lowest and highest sample (in the order they
+    happened) so short spikes like a chattering switch are not lost.
+    """
+    count = len(values)
+    if count <= max_points or max_points < 2:
+        return list(times), list(values)
+
+    step = -(-count // (max_points // 2))  # ceil division
+    out_times = []
+    out_values = []
+
+    for start in range(0, count, step):
+        chunk = values[start:start + step]
+        lo = min(chunk)
+        hi = max(chunk)
+        lo_index = chunk.index(lo)
+        hi_index = chunk.index(hi)
+
+        if lo_index == hi_index:
+            out_times.append(times[start + lo_index])
+            out_values.append(lo)
+        elif lo_index < hi_index:
+            out_times += [times[start + lo_index], times[start + hi_index]]
+            out_values += [lo, hi]
+        else:
+            out_times += [times[start + hi_index], times[start + lo_index]]
+            out_values += [hi, lo]
+
+    return out_times, out_values
+
+
+class StateRingBuffer(object):
+    """Fixed capacity ring of (timestamp, value) samples for one device."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.start = 0
+        self.count = 0
+        self.version = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, value):
+        end = (self.start + self.count) % self.capacity
+        self.times[end] = timestamp
+        self.values[end] = value
+
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+        self.version += 1
+
+    def samples(self):
+        """Return (times, values) oldest first as arrays."""
+        end = self.start + self.count
+        if end <= self.capacity:
+            return self.times[self.start:end], self.values[self.start:end]
+
+        wrap = end - self.capacity
+        return (self.times[self.start:] + self.times[:wrap],
+                self.values[self.start:] + self.values[:wrap])
+
+    def resize(self, capacity):
+        """Change the capacity, keeping the newest samples."""
+        times, values = self.samples()
+        keep = min(len(times), capacity)
+
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.times[:keep] = times[len(times) - keep:]
+        self.values[:keep] = values[len(values) - keep:]
+        self.start = 0
+        self.count = keep
+        self.version += 1
+
+
+class DeviceHistory(object):
+    """Per-device state history sharing one global sample budget."""
+
+    min_capacity = 64
+
+    def __init__(self, max_samples=500000, per_device=10000):
+        self.max_samples = max_samples
+        self.per_device = per_device
+        self.capacity = per_device
+        self.buffers = dict()
+
+    def record(self, device_type, name, state, timestamp=None):
+        key = (device_type, name)
+        buffer = self.buffers.get(key)
+
+        if buffer is None:
+            buffer = self._add_buffer(key)
+
+        if timestamp is None:
+            timestamp = time.perf_counter()
+
+        buffer.append(timestamp, state_to_value(state))
+
+    def get(self, device_type, name):
+        return self.buffers.get((device_type, name))
+
+    def clear(self):
+        self.buffers.clear()
+        self.capacity = self.per_device
+
+    def _add_buffer(self, key):
+        capacity = max(self.min_capacity,
+                       min(self.per_device,
+                           self.max_samples // (len(self.buffers) + 1)))
+
+        # Shrink everyone when the new device would blow the global cap.
+        # Halving leaves room for the next devices, so with n devices all
+        # buffers are only resized about log2(n) times, not n times.
+        if capacity < self.capacity:
+            while self.capacity > capacity:
+                self.capacity //= 2
+            self.capacity = max(self.min_capacity, self.capacity)
+            for buffer in self.buffers.values():
+                buffer.resize(self.capacity)
+
+        buffer = StateRingBuffer(self.capacity)
+        self.buffers[key] = buffer
+        return buffer
+
+
+class HistoryWidget(QWidget):
+    """Sparkline (lights) or step chart (everything else) of one device."""
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.device_type = None
+        self.name = None
+
+        self._cache_key = None
+        self._cache = None
+
+        self.setMinimumHeight(50)
+        self.setMaximumHeight(80)
+
+    def set_device(self, device_type, name):
+        self.device_type = device_type
+        self.name = name
+        self._cache_key = None
+
+        if name is None:
+            self.setToolTip("")
+        else:
+            self.setToolTip('History of {}: {}'.format(device_type, name))
+
+        self.update()
+
+    def is_showing(self, device_type, name):
+        return self.name == name and self.device_type == device_type
+
+    def series(self, width):
+        """Return the downsampled series for the current device, cached
+        until the device records a new sample or the widget is resized."""
+        buffer = self.history.get(self.device_type, self.name)
+        if buffer is None:
+            return None
+
+        key = (id(buffer), buffer.version, width)
+        if key != self._cache_key:
+            times, values = buffer.samples()
+            self._cache = downsample(times, values, max(2, width))
+            self._cache_key = key
+
+        return self._cache
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        rect = self.rect().adjusted(2, 4, -2, -4)
+        painter.fillRect(self.rect(), self.palette().base())
+
+        series = self.series(rect.width())
+        if not series or not series[0]:
+            painter.setPen(self.palette().color(QPalette.Disabled, QPalette.Text))
+            painter.drawText(self.rect(), Qt.AlignCenter, "No history")
+            return
+
+        times, values = series
+
+        t_first = times[0]
+        t_span = (times[-1] - t_first) or 1.0
+        v_low = min(values)
+        v_span = (max(values) - v_low) or 1.0
+
+        def point(t, v):
+            return QPointF(rect.left() + (t - t_first) / t_span * rect.width(),
+                           rect.bottom() - (v - v_low) / v_span * rect.height())
+
+        step = self.device_type != 'light'
+
+        path = QPainterPath(point(times[0], values[0]))
+        for t, v in zip(times[1:], values[1:]):
+            next_point = point(t, v)
+            if step:
+                path.lineTo(next_point.x(), path.currentPosition().y())
+            path.lineTo(next_point)
+
+        if step:
+            # Hold the last state until the right edge
+            path.lineTo(rect.right(), path.currentPosition().y())
+
+        painter.setRenderHint(QPainter.Antialiasing, not step)
+        painter.setPen(QPen(self.palette().color(QPalette.Highlight), 1.5))
+        painter.drawPath(path)
@@ -13,6 +13,9 @@ import os
 
 class InspectorWindow(QWidget):
 
+    # Device type of each entry of device_type_combo_box, None is all of them
+    device_types = (None, 'light', 'switch')
+
     def __init__(self, mpfmon):
         self.mpfmon = mpfmon
         super().__init__()
@@ -27,6 +30,10 @@ class InspectorWindow(QWidget):
 
         self.last_pf_widget = None
 
+        # The devices of a rectangle drawn on the playfield, the controls
+        # act on all of them instead of only on last_pf_widget
+        self.selected_pf_widgets = []
+
     def draw_ui(self):
         # Load ui file from ./ui/
         ui_path = os.path.join(os.path.dirname(__file__), "ui", "inspector.ui")
@@ -37,7 +44,7 @@ class InspectorWindow(QWidget):
         self.ui.move(self.mpfmon.local_settings.value('windows/inspector/pos',
                                                    QPoint(1100, 465)))
         self.ui.resize(self.mpfmon.local_settings.value('windows/inspector/size',
-                                                     QSize(300, 340)))
+                                                     QSize(300, 450)))
 
     def attach_signals(self):
         self.attach_inspector_tab_signals()
@@ -56,6 +63,8 @@ class InspectorWindow(QWidget):
         self.ui.reset_to_defaults_button.clicked.connect(self.reset_defaults_last_device)
         self.ui.delete_last_device_button.clicked.connect(self.delete_last_device)
 
+        self.ui.reset_type_sizes_button.clicked.connect(self.reset_type_sizes)
+
     def attach_monitor_tab_signals(self):
         self.ui.toggle_device_win_button.setChecked(self.mpfmon.toggle_device_window_action.isChecked())
         self.ui.toggle_device_win_button.stateChanged.connect(self.mpfmon.toggle_device_window)
@@ -89,6 +98,10 @@ class InspectorWindow(QWidget):
 
     def update_last_selected(self, pf_widget=None):
         if pf_widget is not None:
+            # Clicking a device selects only that one
+            if self.selected_pf_widgets:
+                self.set_selected_pf_widgets([])
+
             self.enable_non_default_widgets(enabled=True)
 
             self.last_pf_widget = pf_widget
@@ -98,16 +111,41 @@ class InspectorWindow(QWidget):
             self.ui.device_group_box.setTitle(text)
 
             # Update the size slider and spinbox
-            self.ui.size_slider.setValue(self.last_pf_widget.size * 100)
+            self.ui.size_slider.setValue(round(self.last_pf_widget.size * 100))
             self.ui.size_spinbox.setValue(self.last_pf_widget.size)
 
             # Update the shape combo box
-            self.ui.shape_combo_box.setCurrentIndex(self.last_pf_widget.shape.value)
+            self.ui.shape_combo_box.setCurrentIndex(self.last_pf_widget.widget_shape.value)
 
             # Update the rotation dial
             rotation = int(self.last_pf_widget.angle / 10) + 18
             self.ui.rotationDial.setValue(rotation)
 
+    def select_pf_widgets(self, pf_widgets):
+        """Select pf_widgets, the devices in a rectangle drawn on the
+        playfield. The controls show the first one and change all of them."""
+        if not pf_widgets:
+            self.clear_last_selected_device()
+            return
+
+        # Fill in the controls before the selection is set, so that doing
+        # so does not give every device the size of the first one
+        self.update_last_selected(pf_widgets[0])
+
+        if len(pf_widgets) > 1:
+            self.set_selected_pf_widgets(pf_widgets)
+            text = str(len(pf_widgets)) + ' Devices Size:'
+            self.ui.device_group_box.setTitle(text)
+
+    def set_selected_pf_widgets(self, pf_widgets):
+        self.selected_pf_widgets = list(pf_widgets)
+        self.mpfmon.view.show_selection(self.selected_pf_widgets)
+
+    def selected_device_type(self):
+        index = self.ui.device_type_combo_box.currentIndex()
+        if index < 0:
+            return None
+        return self.device_types[index]
 
     def slider_drag(self):
         # For live preview
@@ -125,7 +163,7 @@ class InspectorWindow(QWidget):
     def spinbox_changed(self):
         new_size = self.ui.size_spinbox.value()
         # Update slider value
-        self.ui.size_slider.setValue(new_size*100)
+        self.ui.size_slider.setValue(round(new_size*100))
 
         self.update_last_device(new_size=new_size)
 
@@ -146,6 +184,7 @@ class InspectorWindow(QWidget):
         # self.last_selected_label.setText("Default Device Size:")
         self.ui.device_group_box.setTitle("Default Device:")
         self.last_pf_widget = None
+        self.set_selected_pf_widgets([])
         self.ui.size_spinbox.setValue(self.mpfmon.pf_device_size)  # Reset the value to the stored default.
         self.enable_non_default_widgets(enabled=False)
 
@@ -160,24 +199,32 @@ class InspectorWindow(QWidget):
         # Check that there is a last widget
         if self.last_pf_widget is not None:
 
+            pf_widgets = self.selected_pf_widgets or [self.last_pf_widget]
             update_and_resize = False
 
             if new_size is not None:
                 new_size = round(new_size, 3)
 
-                self.last_pf_widget.set_size(new_size)
+                for pf_widget in pf_widgets:
+                    pf_widget.set_size(new_size)
                 update_and_resize = True
 
             if rotation is not None:
-                self.last_pf_widget.set_rotation(rotation)
+                for pf_widget in pf_widgets:
+                    pf_widget.set_rotation(rotation)
                 update_and_resize = True
 
             if shape is not None:
-                self.last_pf_widget.set_shape(shape=shape)
+                for pf_widget in pf_widgets:
+                    pf_widget.set_shape(shape=shape)
                 update_and_resize = True
 
             if update_and_resize:
-                self.last_pf_widget.update_pos(save=save)
+                for pf_widget in pf_widgets:
+                    pf_widget.update_pos(save=save)
+                if self.selected_pf_widgets:
+                    # Fit the rings to the new sizes
+                    self.mpfmon.view.show_selection(self.selected_pf_widgets)
                 self.mpfmon.view.resizeEvent()
 
         else:
@@ -193,7 +240,8 @@ class InspectorWindow(QWidget):
 
     def delete_last_device(self):
         if self.last_pf_widget is not None:
-            self.last_pf_widget.destroy()
+            for pf_widget in self.selected_pf_widgets or [self.last_pf_widget]:
+                pf_widget.destroy()
             self.clear_last_selected_device()
         else:
             self.log.info("No device selected to delete")
@@ -212,7 +260,8 @@ class InspectorWindow(QWidget):
 
 
             # Update the device info and clear saved size data
-            self.last_pf_widget.resize_to_default(force=True)
+            for pf_widget in self.selected_pf_widgets or [self.last_pf_widget]:
+                pf_widget.resize_to_default(force=True)
 
 
             # Redraw the device
@@ -220,13 +269,15 @@ class InspectorWindow(QWidget):
             self.ui.size_spinbox.setValue(0.07)
             self.log.info("No device selected to resize")
 
-    def resize_all_devices(self):
-        for i in self.mpfmon.scene.items():
-            try:
-                i.resize_to_default()
-            except AttributeError as e:
-                # Can't resize object. That's ok.
-                pass
+    def resize_all_devices(self, device_type=None, force=False):
+        for widget in self.mpfmon.widget_registry.widgets(device_type):
+            widget.resize_to_default(force=force)
+
+    def reset_type_sizes(self):
+        # Sizes set per device are dropped, so all of the type get the default
+        self.resize_all_devices(self.selected_device_type(), force=True)
+        self.mpfmon.view.resizeEvent()
+        self.mpfmon.save_config()
 
     def register_last_selected_cb(self):
         self.mpfmon.inspector_window_last_selected_cb = self.update_last_selected
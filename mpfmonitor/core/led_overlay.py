@@ -0,0 +1,196 @@
+"""Renders the playfield lights into one image instead of one item each.
+
+Enable it in monitor.yaml with
+
+    light_renderer: overlay
+
+It needs numpy. Lights keep their PfWidget for dragging and the inspector,
+but the widget paints nothing, the overlay draws every round light in one
+vectorized pass per frame.
+"""
+
+import math
+
+# will change these to specific imports once code is more final
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from mpfmonitor.core.playfield import PfWidget, Shape
+
+OUTLINE = 0xffffffff
+
+
+def disc_offsets(radius):
+    """Return the (y, x) pixel offsets of a disc and of its outline ring,
+    for a light of radius pixels."""
+    reach = int(math.ceil(radius))
+    y, x = numpy.mgrid[-reach:reach + 1, -reach:reach + 1]
+    distance = numpy.hypot(x, y)
+
+    ring_width = max(1.0, radius * .15)
+    inside = distance <= radius - ring_width
+    ring = (distance <= radius) & ~inside
+
+    return (y[inside], x[inside]), (y[ring], x[ring])
+
+
+def flat_indices(offsets, x, y, width, height):
+    """Return the offsets around (x, y) as flat indices into an image of
+    width and height, leaving out those beyond its edges."""
+    ys = offsets[0] + y
+    xs = offsets[1] + x
+    keep = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < width)
+    return ys[keep] * width + xs[keep]
+
+
+class LedOverlay(QGraphicsItem):
+    """All round lights of the playfield in one image.
+
+    The raw colors live in one (lights, 3) uint8 array. A frame corrects
+    them with the gamma table, packs them into ARGB and scatters them to the
+    pixels of every light with one fancy indexed assignment. The pixel
+    indices are only worked out again when a light is added, moved or
+    resized.
+
+    The image is rendered at a reduced scale, lights are at most
+    max_radius pixels, and scaled up when painted.
+    """
+
+    max_radius = 8
+
+    def __init__(self, mpfmon, playfield):
+        # A child of the playfield image is drawn above it, but below the
+        # widgets added to the scene after it
+        super().__init__(playfield)
+        self.mpfmon = mpfmon
+        self.rect = playfield.boundingRect()
+
+        self.widgets = []
+        self.index = dict()
+        self.colors = numpy.zeros((0, 3), numpy.uint8)
+        self.lut = numpy.array(PfWidget.gamma_lut, numpy.uint8)
+
+        self.buffer = None
+        self.image = None
+        self.pixels = numpy.zeros(0, numpy.intp)
+        self.owners = numpy.zeros(0, numpy.intp)
+        self.layout_dirty = True
+
+        self.setAcceptedMouseButtons(Qt.NoButton)
+
+    @staticmethod
+    def available():
+        return numpy is not None
+
+    def accepts(self, pf_widget):
+        return pf_widget.device_type == 'light' and \
+            pf_widget.resolved_shape() == Shape.CIRCLE
+
+    def place(self, pf_widget):
+        """Take pf_widget over, follow its new position or size, or hand it
+        back if it is no longer round."""
+        if not self.accepts(pf_widget):
+            self.remove(pf_widget)
+            return
+
+        if pf_widget not in self.index:
+            self.index[pf_widget] = len(self.widgets)
+            self.widgets.append(pf_widget)
+            self.colors = numpy.vstack((self.colors, numpy.zeros((1, 3), numpy.uint8)))
+            pf_widget.overlay = self
+            pf_widget.setFlag(QGraphicsItem.ItemHasNoContents, True)
+            self.set_color(pf_widget, pf_widget.widget.data().get('color', (0, 0, 0)))
+
+        self.layout_dirty = True
+        self.schedule()
+
+    def remove(self, pf_widget):
+        index = self.index.pop(pf_widget, None)
+        if index is None:
+            return
+
+        del self.widgets[index]
+        self.colors = numpy.delete(self.colors, index, axis=0)
+        self.index = {widget: i for i, widget in enumerate(self.widgets)}
+
+        pf_widget.overlay = None
+        pf_widget.setFlag(QGraphicsItem.ItemHasNoContents, False)
+        pf_widget.update()
+
+        self.layout_dirty = True
+        self.schedule()
+
+    def set_color(self, pf_widget, color):
+        try:
+            self.colors[self.index[pf_widget]] = color[:3]
+        except (KeyError, TypeError, ValueError):
+            return
+        self.schedule()
+
+    def schedule(self):
+        self.mpfmon.frame_scheduler.mark_dirty(self.mpfmon.view, self, self.render)
+
+    def layout(self):
+        """Work out which pixels belong to which light."""
+        radii = [widget.device_size / 2 for widget in self.widgets]
+        scale = min(1.0, self.max_radius / max(radii)) if radii else 1.0
+
+        width = max(1, int(math.ceil(self.rect.width() * scale)))
+        height = max(1, int(math.ceil(self.rect.height() * scale)))
+
+        self.buffer = numpy.zeros((height, width), numpy.uint32)
+        self.image = QImage(self.buffer.data, width, height, width * 4,
+                            QImage.Format_ARGB32_Premultiplied)
+
+        flat = self.buffer.reshape(-1)
+        pixels = []
+        owners = []
+        offsets = dict()
+
+        for index, (widget, radius) in enumerate(zip(self.widgets, radii)):
+            key = round(radius * scale, 1)
+            if key not in offsets:
+                offsets[key] = disc_offsets(key)
+            inside, ring = offsets[key]
+
+            x = int((widget.pos().x() - self.rect.left()) * scale)
+            y = int((widget.pos().y() - self.rect.top()) * scale)
+
+            # Lights at the edge of the playfield are clipped to it
+            flat[flat_indices(ring, x, y, width, height)] = OUTLINE
+            inside = flat_indices(inside, x, y, width, height)
+            pixels.append(inside)
+            owners.append(numpy.full(len(inside), index, numpy.intp))
+
+        if pixels:
+            self.pixels = numpy.concatenate(pixels)
+            self.owners = numpy.concatenate(owners)
+        else:
+            self.pixels = numpy.zeros(0, numpy.intp)
+            self.owners = numpy.zeros(0, numpy.intp)
+
+        self.layout_dirty = False
+
+    def render(self):
+        if self.layout_dirty:
+            self.layout()
+
+        corrected = self.lut[self.colors].astype(numpy.uint32)
+        packed = 0xff000000 | (corrected[:, 0] << 16) | (corrected[:, 1] << 8) | corrected[:, 2]
+        self.buffer.reshape(-1)[self.pixels] = packed[self.owners]
+
+        self.update()
+
+    def boundingRect(self):
+        return self.rect
+
+    def paint(self, painter, option, widget=None):
+        if self.image is not None:
+            painter.setRenderHint(QPainter.SmoothPixmapTransform, True)
+            painter.drawImage(self.rect, self.image)
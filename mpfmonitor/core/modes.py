@@ -6,13 +6,20 @@ from PyQt5 import uic
 import os
 import time
 
+from mpfmonitor.core.timeline import ModeTimeline, TimelineWidget
+
 class ModeWindow(QWidget):
 
+    # Sort key of a row, the mode priority as an int on the name item
+    PriorityRole = Qt.UserRole + 1
+
     def __init__(self, mpfmon):
         self.mpfmon = mpfmon
         super().__init__()
         self.ui = None
         self.model = None
+        self.rows = dict()
+        self.timeline = ModeTimeline()
         self.draw_ui()
         self.attach_model()
         self.attach_signals()
@@ -30,7 +37,7 @@ class ModeWindow(QWidget):
         self.ui.move(self.mpfmon.local_settings.value('windows/modes/pos',
                                                    QPoint(1100, 200)))
         self.ui.resize(self.mpfmon.local_settings.value('windows/modes/size',
-                                                     QSize(300, 240)))
+                                                     QSize(300, 360)))
 
         # Fix sort combobox verbiage
         self.ui.sortComboBox.setItemText(1, "Priority ▴")
@@ -42,6 +49,10 @@ class ModeWindow(QWidget):
         self.ui.sortComboBox.model().item(0).setEnabled(False)
         self.ui.sortComboBox.setCurrentIndex(1)
 
+        # Start/stop history of every mode, below the running ones
+        self.ui.timeline_widget = TimelineWidget(self.timeline, self)
+        self.ui.gridLayout.addWidget(self.ui.timeline_widget, 2, 0, 1, 2)
+
 
     def attach_signals(self):
         assert (self.ui is not None)
@@ -54,7 +65,8 @@ class ModeWindow(QWidget):
 
         self.model.setHeaderData(0, Qt.Horizontal, "Mode")
         self.model.setHeaderData(1, Qt.Horizontal, "Priority")
-        # self.model.setHeaderData(2, Qt.Horizontal, "Time")
+
+        self.rows.clear()
 
         self.filtered_model = QSortFilterProxyModel(self)
         self.filtered_model.setSourceModel(self.model)
@@ -64,24 +76,42 @@ class ModeWindow(QWidget):
         self.change_sort()  # Default sort
 
         self.ui.tableView.setModel(self.filtered_model)
-        self.ui.tableView.setColumnHidden(2, True)
         self.rootNode = self.model.invisibleRootItem()
 
-    def process_mode_update(self, running_modes):
-        """Update mode list."""
-        self.model.clear()
-
-        for mode in running_modes:
-            mode_name = QStandardItem(mode[0])
-            mode_priority = QStandardItem(str(mode[1]))
-            mode_priority_padded = QStandardItem(str(mode[1]).zfill(10))
-            self.model.insertRow(0, [mode_name, mode_priority, mode_priority_padded])
-
-        # Reset the headers for the tree. For some reason clear() wipes these too.
-        self.model.setHeaderData(0, Qt.Horizontal, "Mode")
-        self.model.setHeaderData(1, Qt.Horizontal, "Priority")
-
-        self.ui.tableView.setColumnHidden(2, True)
+    def process_mode_update(self, running_modes, received=None):
+        """Update mode list and timeline.
+
+        Only the rows of modes that started, stopped or changed priority are
+        touched, so the selection and scroll position survive.
+        """
+        priorities = {mode[0]: int(mode[1]) for mode in running_modes}
+
+        for name in [name for name in self.rows if name not in priorities]:
+            name_item, _ = self.rows.pop(name)
+            self.model.removeRow(name_item.row())
+
+        for name, priority in priorities.items():
+            items = self.rows.get(name)
+            if items is None:
+                name_item = QStandardItem(name)
+                name_item.setData(priority, self.PriorityRole)
+                priority_item = QStandardItem(str(priority))
+                priority_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.rows[name] = (name_item, priority_item)
+                self.model.appendRow([name_item, priority_item])
+
+            elif items[0].data(self.PriorityRole) != priority:
+                items[0].setData(priority, self.PriorityRole)
+                items[1].setText(str(priority))
+
+        self.timeline.update(running_modes, received)
+        self.mpfmon.frame_scheduler.mark_dirty(self, self.ui.timeline_widget,
+                                               self.ui.timeline_widget.update)
+
+    def clear(self):
+        self.model.removeRows(0, self.model.rowCount())
+        self.rows.clear()
+        self.timeline.clear()
 
     def filter_text(self, string):
         wc_string = "*" + str(string) + "*"
@@ -90,14 +120,19 @@ class ModeWindow(QWidget):
         self.ui.tableView.resizeColumnToContents(1)
 
     def change_sort(self, index=1):
-        # This is a bit sloppy and probably should be reworked.
-        if index == 1:  # Received up
-            self.filtered_model.sort(2, Qt.DescendingOrder)
-        elif index == 2:  # Received down
-            self.filtered_model.sort(2, Qt.AscendingOrder)
+        # Switching the role and order is a layout change for the proxy,
+        # the selection is kept.
+        if index == 1:  # Priority up
+            self.filtered_model.setSortRole(self.PriorityRole)
+            self.filtered_model.sort(0, Qt.DescendingOrder)
+        elif index == 2:  # Priority down
+            self.filtered_model.setSortRole(self.PriorityRole)
+            self.filtered_model.sort(0, Qt.AscendingOrder)
         elif index == 3:  # Name up
+            self.filtered_model.setSortRole(Qt.DisplayRole)
             self.filtered_model.sort(0, Qt.AscendingOrder)
         elif index == 4:  # Name down
+            self.filtered_model.setSortRole(Qt.DisplayRole)
             self.filtered_model.sort(0, Qt.DescendingOrder)
 
     def closeEvent(self, event):
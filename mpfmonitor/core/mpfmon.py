@@ -15,15 +15,25 @@ import ruamel.yaml as yaml
 
 from mpfmonitor.core.devices import *
 from mpfmonitor.core.playfield import *
+from mpfmonitor.core.led_overlay import LedOverlay
+from mpfmonitor.core.heatmap import HeatmapOverlay
+from mpfmonitor.core.pyramid import ImagePyramid
+from mpfmonitor.core.config_writer import ConfigWriter
+from mpfmonitor.core.widget_registry import WidgetRegistry
 from mpfmonitor.core.bcp_client import BCPClient
 from mpfmonitor.core.events import EventWindow
 from mpfmonitor.core.modes import ModeWindow
+from mpfmonitor.core.stats import EventStats, StatsWindow
+from mpfmonitor.core.event_filters import EventFilter
 from mpfmonitor.core.inspector import InspectorWindow
+from mpfmonitor.core.scheduler import FrameScheduler
+from mpfmonitor.core.snapshot import load_snapshot, save_snapshot
 
 
 
 class MPFMonitor():
-    def __init__(self, app, machine_path, thread_stopper, parent=None, testing=False):
+    def __init__(self, app, machine_path, thread_stopper, parent=None, testing=False,
+                 capture=False):
 
         # super().__init__(parent)
 
@@ -44,20 +54,41 @@ class MPFMonitor():
                                         "monitor.yaml")
         self.playfield_image_file = os.path.join(self.machine_path,
                                                  "monitor", "playfield.jpg")
+        self.snapshot_file = os.path.join(self.machine_path, "monitor",
+                                          "snapshot.json")
+        self.event_history_file = os.path.join(self.machine_path, "monitor",
+                                               "event_history.sqlite")
 
         self.local_settings = QSettings("mpf", "mpf-monitor")
 
         self.load_config()
 
+        config_save_delay = self.config.get("config_save_delay", 500)
+        if not isinstance(config_save_delay, int) or config_save_delay < 0:  # Protect against corrupted delay
+            config_save_delay = 500
+        self.config_writer = ConfigWriter(self.config_file, thread_stopper, config_save_delay)
+        self.app.aboutToQuit.connect(self.config_writer.flush)
+
+        self.frame_scheduler = FrameScheduler(self.config.get("frame_rate", 30))
+        self.event_stats = EventStats()
+        self.event_filter = EventFilter.from_config(self.config.get("event_filters"))
+
         self.device_window = DeviceWindow(self)
 
         self.pf_device_size = self.config.get("device_size", .02)
         if not isinstance(self.pf_device_size, float):  # Protect against corrupted device size
             self.pf_device_size = .02
 
+        light_gamma = self.config.get("light_gamma", 0.5)
+        light_gamma_scale = self.config.get("light_gamma_scale", 18)
+        if not isinstance(light_gamma, (int, float)) or light_gamma <= 0 or \
+                not isinstance(light_gamma_scale, (int, float)) or light_gamma_scale <= 0:  # Protect against corrupted gamma
+            light_gamma, light_gamma_scale = 0.5, 18
+        PfWidget.set_gamma(light_gamma, light_gamma_scale)
+
         self.bcp = BCPClient(self, self.receive_queue,
                              self.sending_queue, 'localhost', 5051,
-                             simulate=testing, cache=False)
+                             simulate=testing, cache=capture)
 
         self.tick_timer = QTimer(self.device_window)
         self.tick_timer.setInterval(20)
@@ -84,11 +115,34 @@ class MPFMonitor():
                                         triggered=self.toggle_mode_window)
         self.toggle_mode_window_action.setCheckable(True)
 
+        self.toggle_stats_window_action = QAction('&Statistics', self.device_window,
+                                        statusTip='Show the event statistics window',
+                                        triggered=self.toggle_stats_window)
+        self.toggle_stats_window_action.setCheckable(True)
+
         self.scene = QGraphicsScene()
 
-        self.pf = PfPixmapItem(QPixmap(self.playfield_image_file), self)
+        self.playfield_pyramid = ImagePyramid(self.playfield_image_file)
+        self.playfield_pyramid.start()
+
+        self.pf = PfPixmapItem(self.playfield_pyramid, self)
         self.scene.addItem(self.pf)
 
+        # About the size of a default widget per cell
+        self.widget_registry = WidgetRegistry(
+            cell_size=max(1.0, self.pf.boundingRect().width() / 32))
+
+        self.led_overlay = None
+        if self.config.get("light_renderer", "items") == "overlay":
+            if LedOverlay.available():
+                self.led_overlay = LedOverlay(self, self.pf)
+            else:
+                self.log.warning("light_renderer: overlay needs numpy, drawing lights as items")
+
+        self.heatmap_overlay = None
+        if HeatmapOverlay.available():
+            self.heatmap_overlay = HeatmapOverlay(self, self.pf)
+
         self.view = PfView(self.scene, self)
 
         self.view.move(self.local_settings.value('windows/pf/pos',
@@ -96,10 +150,18 @@ class MPFMonitor():
         self.view.resize(self.local_settings.value('windows/pf/size',
                                                    QSize(300, 600)))
 
+        # Show the last known devices until MPF connects and confirms them
+        self.device_window.load_snapshot(load_snapshot(self.snapshot_file,
+                                                       self.machine_path))
+        self.app.aboutToQuit.connect(self.save_snapshot)
+
         self.event_window = EventWindow(self)
+        self.app.aboutToQuit.connect(self.event_window.close_store)
 
         self.mode_window = ModeWindow(self)
 
+        self.stats_window = StatsWindow(self)
+
         if self.get_local_settings_bool('windows/pf/visible'):
             self.toggle_pf_window()
 
@@ -112,6 +174,9 @@ class MPFMonitor():
         if self.get_local_settings_bool('windows/modes/visible'):
             self.toggle_mode_window()
 
+        if self.get_local_settings_bool('windows/stats/visible'):
+            self.toggle_stats_window()
+
         self.exit_on_close = False
 
         if self.get_local_settings_bool('settings/exit-on-close'):
@@ -131,8 +196,32 @@ class MPFMonitor():
         self.view_menu.addAction(self.toggle_pf_window_action)
         self.view_menu.addAction(self.toggle_device_window_action)
         self.view_menu.addAction(self.toggle_event_window_action)
-
-
+        self.view_menu.addAction(self.toggle_stats_window_action)
+
+        if self.heatmap_overlay is not None:
+            self.heatmap_menu = self.view_menu.addMenu("&Heatmap")
+            heatmap_group = QActionGroup(self.heatmap_menu)
+            for label, device_type in [("&Off", None), ("&Switch Activity", 'switch'),
+                                       ("&Light On-Time", 'light')]:
+                action = QAction(label, heatmap_group, checkable=True,
+                                 checked=device_type is None)
+                action.triggered.connect(
+                    lambda checked, device_type=device_type:
+                        self.heatmap_overlay.show_heatmap(device_type))
+                self.heatmap_menu.addAction(action)
+            self.heatmap_menu.addSeparator()
+            self.heatmap_menu.addAction("&Export...", self.export_heatmap)
+            self.heatmap_menu.addAction("&Clear", self.heatmap_overlay.clear)
+
+
+
+    def export_heatmap(self):
+        file_name, _ = QFileDialog.getSaveFileName(
+            self.view, "Export Heatmap",
+            os.path.join(self.machine_path, "monitor", "heatmap.png"), "PNG (*.png)")
+        if file_name and not self.heatmap_overlay.export(
+                file_name, QImage(self.playfield_image_file)):
+            self.log.warning("Could not export the heatmap to %s", file_name)
 
     def toggle_pf_window(self):
         if self.view.isVisible():
@@ -142,6 +231,19 @@ class MPFMonitor():
             self.view.show()
             self.toggle_pf_window_action.setChecked(True)
 
+    def locate_device(self, device_type, name):
+        """Show where the device is on the playfield."""
+        widget = self.widget_registry.get(device_type, name)
+        if widget is None:
+            self.log.info("%s %s is not on the playfield", device_type, name)
+            return False
+
+        if not self.view.isVisible():
+            self.toggle_pf_window()
+        self.view.raise_()
+        self.view.locate(widget)
+        return True
+
     def toggle_device_window(self):
         if self.device_window.isVisible():
             self.device_window.hide()
@@ -166,6 +268,14 @@ class MPFMonitor():
             self.mode_window.show()
             self.toggle_mode_window_action.setChecked(True)
 
+    def toggle_stats_window(self):
+        if self.stats_window.isVisible():
+            self.stats_window.hide()
+            self.toggle_stats_window_action.setChecked(False)
+        else:
+            self.stats_window.show()
+            self.toggle_stats_window_action.setChecked(True)
+
     def toggle_exit_on_close(self):
         if self.exit_on_close:
             self.exit_on_close = False
@@ -185,7 +295,9 @@ class MPFMonitor():
     def reset_connection(self):
         self.start_time = 0
         self.event_window.model.clear()
-        self.mode_window.model.clear()
+        self.event_stats.clear()
+        self.event_filter.clear()
+        self.mode_window.clear()
 
     def eventFilter(self, source, event):
         try:
@@ -205,22 +317,29 @@ class MPFMonitor():
         If any devices have updated, refresh the model data.
         """
 
+        start = time.perf_counter()
+
         device_update = False
         while not self.receive_queue.empty():
-            cmd, kwargs = self.receive_queue.get_nowait()
+            cmd, kwargs, received = self.receive_queue.get_nowait()
             if cmd == 'device':
                 self.device_window.process_device_update(**kwargs)
+                if self.heatmap_overlay is not None:
+                    self.heatmap_overlay.record(kwargs.get('type'), kwargs.get('name'),
+                                                kwargs.get('state'), received)
                 device_update = True
             elif cmd == 'monitored_event':
                 # self.process_event_update(**kwargs)
-                self.event_window.add_event_to_model(**kwargs)
+                self.event_window.add_event_to_model(received=received, **kwargs)
             elif cmd in ('mode_start', 'mode_stop', 'mode_list'):
                 # self.process_mode_update(kwargs['running_modes'])
-                self.mode_window.process_mode_update(kwargs['running_modes'])
+                self.mode_window.process_mode_update(kwargs['running_modes'], received)
             elif cmd == 'reset':
                 self.reset_connection()
                 self.bcp.send("reset_complete")
 
+        self.frame_scheduler.add_ingest_time(time.perf_counter() - start)
+
     def about(self):
         QMessageBox.about(self, "About MPF Monitor",
                 "This is the MPF Monitor")
@@ -233,9 +352,12 @@ class MPFMonitor():
                 self.config = dict()
 
     def save_config(self):
-        self.log.debug("Saving config to disk")
-        with open(self.config_file, 'w') as f:
-            f.write(yaml.dump(self.config, default_flow_style=False))
+        self.config_writer.save(self.config)
+
+    def save_snapshot(self):
+        self.log.debug("Saving device snapshot to disk")
+        save_snapshot(self.snapshot_file, self.machine_path,
+                      self.device_window.snapshot())
 
     def closeEvent(self, event):
         self.write_local_settings()
@@ -267,6 +389,7 @@ class MPFMonitor():
             'pf': self.view,
             'modes': self.mode_window,
             'events': self.event_window,
+            'stats': self.stats_window,
             'inspector': self.inspector_window
         }
 
@@ -280,13 +403,14 @@ class MPFMonitor():
     def set_inspector_mode(self, enabled=False):
         self.inspector_enabled = enabled
         self.view.set_inspector_mode_title(inspect=enabled)
+        self.view.set_selecting(enabled=enabled)
 
 
 
 
 
-def run(machine_path, thread_stopper, testing=False):
+def run(machine_path, thread_stopper, testing=False, capture=False):
 
     app = QApplication(sys.argv)
-    MPFMonitor(app, machine_path, thread_stopper, testing=testing)
+    MPFMonitor(app, machine_path, thread_stopper, testing=testing, capture=capture)
     app.exec_()
@@ -11,6 +11,17 @@ from PyQt5.QtWidgets import *
 from enum import Enum
 
 
+def gamma_table(gamma=0.5, scale=18):
+    """Return the 256 entry lookup table of the light color correction,
+    value ** gamma * scale capped at 255.
+
+    Feel free to fiddle with these constants until it feels right
+    With gamma = 0.5 and constant a = 18, the top 54 values are lost,
+    but the bottom 25% feels much more normal.
+    """
+    return [min(255, int(pow(value, gamma) * scale)) for value in range(256)]
+
+
 class Shape(Enum):
     DEFAULT = 0
     SQUARE = 1
@@ -21,18 +32,161 @@ class Shape(Enum):
     FLIPPER = 6
 
 
+def shape_path(shape, size):
+    """Return the outline of a widget of shape and size (in scene units),
+    centered on the origin."""
+    path = QPainterPath()
+
+    # Draw based on the shape we want, not device type.
+    if shape == Shape.CIRCLE:
+        path.addEllipse(QRectF(size / -2, size / -2, size, size))
+
+    elif shape == Shape.SQUARE:
+        aspect_ratio = 1  # Smaller for taller rectangles, larger for wider rectangles
+        path.addRect(QRectF((size * aspect_ratio) / -2, size / -2, size * aspect_ratio, size))
+
+    elif shape == Shape.RECTANGLE:
+        aspect_ratio = .4  # Smaller for taller rectangles, larger for wider rectangles
+        path.addRect(QRectF((size * aspect_ratio) / -2, size / -2, size * aspect_ratio, size))
+
+    elif shape == Shape.TRIANGLE:
+        aspect_ratio = 1
+        scale = .6
+        path.addPolygon(QPolygonF([
+            QPointF(0, size * scale * -1),
+            QPointF(size * scale * -1, ((size * scale) / 2) * aspect_ratio),
+            QPointF(size * scale, ((size * scale) / 2) * aspect_ratio),
+        ]))
+        path.closeSubpath()
+
+    elif shape == Shape.ARROW:
+        """
+        Vertex  1: x=0   y=-10
+        Vertex  2: x=-5  y=0
+        Vertex  3: x=-2  y=0
+        Vertex  4: x=-2  y=5
+        Vertex  5: x=2   y=5
+        Vertex  6: x=2   y=0
+        Vertex  7: x=5   y=0
+        """
+
+        aspect_ratio = 1
+        scale = .8
+        path.addPolygon(QPolygonF([
+            QPointF(0, size * scale * -1),
+            QPointF(size * scale / -2, 0),
+            QPointF(size * scale / -4, 0),
+            QPointF(size * scale / -4, size * scale / 2),
+            QPointF(size * scale / 4, size * scale / 2),
+            QPointF(size * scale / 4, 0),
+            QPointF(size * scale / 2, 0)
+        ]))
+        path.closeSubpath()
+
+    elif shape == Shape.FLIPPER:
+        aspect_ratio = 5
+        scale = .7
+        path.addPolygon(QPolygonF([
+            QPointF(0, size * scale * -1),
+            QPointF(size * scale * -1, ((size * scale) / 2) * aspect_ratio),
+            QPointF(size * scale, ((size * scale) / 2) * aspect_ratio),
+        ]))
+        path.closeSubpath()
+
+    return path
+
+
 class PfView(QGraphicsView):
 
+    # How long locate() shows its ring, in ms
+    locate_time = 1500
+
     def __init__(self, parent, mpfmon):
         self.mpfmon = mpfmon
         super().__init__(parent)
 
+        # Widgets whose look changed since the last frame
+        self.dirty_widgets = set()
+
+        # In inspector mode a rectangle dragged on the playfield selects the
+        # devices in it, rubber_band is that rectangle in scene coordinates
+        self.rubber_band = None
+        self.selection_marks = []
+        self.rubberBandChanged.connect(self.rubber_band_changed)
+
+        # A light show dirties many small, scattered regions. Let Qt decide
+        # between repainting them one by one or their bounding rect.
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+
         self.setWindowTitle("Playfield")
         self.set_inspector_mode_title(inspect=False)
 
     def resizeEvent(self, event=None):
         self.fitInView(self.mpfmon.pf, Qt.KeepAspectRatio)
 
+    def locate(self, widget):
+        """Bring widget into view and ring it for a moment."""
+        self.ensureVisible(widget)
+
+        radius = widget.boundingRect().width() / 2 + widget.device_size / 2
+        ring = QGraphicsEllipseItem(QRectF(-radius, -radius, radius * 2, radius * 2))
+        ring.setPen(QPen(Qt.yellow, max(2.0, widget.device_size / 5)))
+        ring.setPos(widget.pos())
+        ring.setZValue(widget.zValue() + 1)
+        ring.setAcceptedMouseButtons(Qt.NoButton)
+        self.scene().addItem(ring)
+
+        QTimer.singleShot(self.locate_time, lambda: self.scene().removeItem(ring))
+
+    def mark_widget_dirty(self, widget):
+        """Repaint widget with all others that changed, on the next frame."""
+        self.dirty_widgets.add(widget)
+        self.mpfmon.frame_scheduler.mark_dirty(self, 'widgets', self.update_widgets)
+
+    def discard_widget(self, widget):
+        self.dirty_widgets.discard(widget)
+
+    def update_widgets(self):
+        # Qt collects these into a single pass over the scene
+        for widget in self.dirty_widgets:
+            widget.update()
+        self.dirty_widgets.clear()
+
+    def set_selecting(self, enabled=False):
+        if enabled:
+            self.setDragMode(QGraphicsView.RubberBandDrag)
+        else:
+            self.setDragMode(QGraphicsView.NoDrag)
+            self.rubber_band = None
+
+    def rubber_band_changed(self, rect, from_scene, to_scene):
+        if not rect.isNull():
+            self.rubber_band = QRectF(from_scene, to_scene).normalized()
+            return
+
+        # The band is gone once the mouse is released
+        if self.rubber_band is None:
+            return
+        inspector = self.mpfmon.inspector_window
+        inspector.select_pf_widgets(self.mpfmon.widget_registry.in_rect(
+            self.rubber_band, inspector.selected_device_type()))
+        self.rubber_band = None
+
+    def show_selection(self, widgets):
+        """Draw a dashed ring around each of widgets, and none around the
+        ones of the previous call."""
+        for mark in self.selection_marks:
+            if mark.scene() is not None:
+                mark.scene().removeItem(mark)
+        self.selection_marks = []
+
+        for widget in widgets:
+            mark = QGraphicsEllipseItem(widget.boundingRect(), widget)
+            pen = QPen(Qt.white, max(1.0, widget.device_size / 8), Qt.DashLine)
+            mark.setPen(pen)
+            mark.setAcceptedMouseButtons(Qt.NoButton)
+            self.selection_marks.append(mark)
+
     def set_inspector_mode_title(self, inspect=False):
         if inspect:
             self.setWindowTitle('Inspector Enabled - Playfield')
@@ -45,14 +199,49 @@ class PfView(QGraphicsView):
         self.mpfmon.check_if_quit()
 
 
-class PfPixmapItem(QGraphicsPixmapItem):
+class PfPixmapItem(QGraphicsItem):
+    """The playfield image, drawn from the ImagePyramid level closest to
+    the zoom. Scene coordinates stay those of the full image while the
+    levels are still loading."""
 
-    def __init__(self, image, mpfmon, parent=None):
-        super().__init__(image, parent)
+    def __init__(self, pyramid, mpfmon, parent=None):
+        super().__init__(parent)
 
         self.mpfmon = mpfmon
+        self.pyramid = pyramid
+        self.rect = QRectF(QPointF(0, 0), QSizeF(pyramid.size))
         self.setAcceptDrops(True)
 
+        # Lights repaint small parts of the playfield all the time, those
+        # are copied from the cache instead of scaling the image again
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+
+        self.load_timer = QTimer()
+        self.load_timer.setInterval(50)
+        self.load_timer.timeout.connect(self.take_levels)
+        if not pyramid.is_complete():
+            self.load_timer.start()
+
+    def take_levels(self):
+        if self.pyramid.take():
+            self.update()
+        if self.pyramid.is_complete():
+            self.load_timer.stop()
+
+    def boundingRect(self):
+        return self.rect
+
+    def shape(self):
+        path = QPainterPath()
+        path.addRect(self.rect)
+        return path
+
+    def paint(self, painter, option, widget=None):
+        scale = option.levelOfDetailFromTransform(painter.worldTransform())
+        pixmap = self.pyramid.level(self.rect.width() * scale)
+        if pixmap is not None:
+            painter.setRenderHint(QPainter.SmoothPixmapTransform, True)
+            painter.drawPixmap(self.rect, pixmap, QRectF(pixmap.rect()))
 
     def create_widget_from_config(self, widget, device_type, device_name):
         try:
@@ -106,21 +295,40 @@ class PfPixmapItem(QGraphicsPixmapItem):
 
 class PfWidget(QGraphicsItem):
 
+    # Shared by all widgets, a paint only looks up its corrected color and
+    # the brush for it. Change the curve with set_gamma().
+    gamma_lut = gamma_table()
+    brushes = dict()
+    brush_cache_size = 4096
+    outline_pen = QPen(Qt.white, 3, Qt.SolidLine)
+    # Outlines by (shape, size), see path()
+    paths = dict()
+
     def __init__(self, mpfmon, widget, device_type, device_name, x, y,
                  size=None, rotation=0, shape=Shape.DEFAULT, save=True):
         super().__init__()
 
+        self._path = None
+        self._bounds = None
+        self._shape = None
+        self._visual_key = None
+        # The LedOverlay drawing this widget, if any
+        self.overlay = None
+
         self.widget = widget
         self.mpfmon = mpfmon
         self.name = device_name
         self.move_in_progress = True
         self.device_type = device_type
         self.set_size(size=size)
-        self.shape = shape
+        self.widget_shape = shape
         self.angle = rotation
 
         self.setToolTip('{}: {}'.format(self.device_type, self.name))
         self.setAcceptedMouseButtons(Qt.LeftButton | Qt.RightButton)
+        # Repaints of neighbours reuse the rendered widget, notify() and
+        # update_pos() invalidate it
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
         self.setPos(x, y)
         self.update_pos(save)
         self.click_start = 0
@@ -136,14 +344,26 @@ class PfWidget(QGraphicsItem):
 
 
     def boundingRect(self):
-        return QRectF(self.device_size / -2, self.device_size / -2,
-                      self.device_size, self.device_size)
+        # The rotated outline plus the pen, the item cache clips to this
+        if self._bounds is None:
+            pen = self.outline_pen.widthF() / 2
+            self._bounds = QTransform().rotate(self.angle).mapRect(
+                self.path().boundingRect()).adjusted(-pen, -pen, pen, pen)
+        return self._bounds
+
+    def shape(self):
+        # Clicks on dense layouts hit the outline, not the bounding box that
+        # may overlap the neighbours
+        if self._shape is None:
+            self._shape = QTransform().rotate(self.angle).map(self.path())
+        return self._shape
 
     def set_shape(self, shape):
         if isinstance(shape, Shape):
-            self.shape = shape
+            self.widget_shape = shape
         else:
-            self.shape = Shape.DEFAULT
+            self.widget_shape = Shape.DEFAULT
+        self._path = None
 
     def set_rotation(self, angle=0):
         angle = angle % 360
@@ -157,6 +377,7 @@ class PfWidget(QGraphicsItem):
         else:
             self.size = size
             self.device_size = self.mpfmon.scene.width() * size
+        self._path = None
 
     def resize_to_default(self, force=False):
         device_config = self.mpfmon.config[self.device_type].get(self.name, None)
@@ -174,25 +395,14 @@ class PfWidget(QGraphicsItem):
 
         self.update_pos(save=False)  # Do not save at this point. Let it be saved elsewhere. This reduces writes.
 
-    def color_gamma(self, color):
-
-        """
-        Feel free to fiddle with these constants until it feels right
-        With gamma = 0.5 and constant a = 18, the top 54 values are lost,
-        but the bottom 25% feels much more normal.
-        """
-
-        gamma = 0.5
-        a = 18
-        corrected = []
+    @classmethod
+    def set_gamma(cls, gamma=0.5, scale=18):
+        cls.gamma_lut = gamma_table(gamma, scale)
+        cls.brushes.clear()
 
-        for value in color:
-            value = int(pow(value, gamma) * a)
-            if value > 255:
-                value = 255
-            corrected.append(value)
-
-        return corrected
+    def color_gamma(self, color):
+        lut = self.gamma_lut
+        return [lut[min(255, max(0, int(value)))] for value in color]
 
     def set_colored_brush(self, device_type, widget):
         if device_type == 'light':
@@ -206,94 +416,80 @@ class PfWidget(QGraphicsItem):
             else:
                 color = [0, 0, 0]
 
-        return QBrush(QColor(*color), Qt.SolidPattern)
+        key = tuple(color)
+        brush = self.brushes.get(key)
+        if brush is None:
+            if len(self.brushes) >= self.brush_cache_size:
+                self.brushes.clear()
+            brush = self.brushes[key] = QBrush(QColor(*color), Qt.SolidPattern)
+
+        return brush
+
+    def resolved_shape(self):
+        # Preserve legacy and regular use
+        if self.widget_shape == Shape.DEFAULT:
+            if self.device_type == 'light':
+                return Shape.CIRCLE
+            elif self.device_type == 'switch':
+                return Shape.SQUARE
+        return self.widget_shape
+
+    def path(self):
+        """Return the outline of the widget, built once per shape and size
+        and shared by all widgets that look the same."""
+        if self._path is None:
+            key = (self.resolved_shape(), self.device_size)
+            path = self.paths.get(key)
+            if path is None:
+                path = self.paths[key] = shape_path(*key)
+            self._path = path
+        return self._path
 
     def paint(self, painter, option, widget=None):
 
         painter.setRenderHint(QPainter.Antialiasing, True)
-        painter.setPen(QPen(Qt.white, 3, Qt.SolidLine))
+        painter.setPen(self.outline_pen)
         painter.rotate(self.angle)
 
         brush = self.set_colored_brush(self.device_type, self.widget)
         painter.setBrush(brush)
 
-        draw_shape = self.shape
+        painter.drawPath(self.path())
 
-        # Preserve legacy and regular use
-        if draw_shape == Shape.DEFAULT:
-            if self.device_type == 'light':
-                draw_shape = Shape.CIRCLE
-            elif self.device_type == 'switch':
-                draw_shape = Shape.SQUARE
-
-        # Draw based on the shape we want, not device type.
-        if draw_shape == Shape.CIRCLE:
-            painter.drawEllipse(self.device_size / -2, self.device_size / -2,
-                                self.device_size, self.device_size)
-
-        elif draw_shape == Shape.SQUARE:
-            aspect_ratio = 1  # Smaller for taller rectangles, larger for wider rectangles
-            painter.drawRect((self.device_size * aspect_ratio) / -2, self.device_size / -2,
-                             self.device_size * aspect_ratio, self.device_size)
-
-        elif draw_shape == Shape.RECTANGLE:
-            aspect_ratio = .4  # Smaller for taller rectangles, larger for wider rectangles
-            painter.drawRect((self.device_size * aspect_ratio) / -2, self.device_size / -2,
-                             self.device_size * aspect_ratio, self.device_size)
-
-        elif draw_shape == Shape.TRIANGLE:
-            aspect_ratio = 1
-            scale = .6
-            points = QPolygon([
-                QPoint(0, self.device_size * scale * -1),
-                QPoint(self.device_size * scale * -1, ((self.device_size * scale) / 2) * aspect_ratio),
-                QPoint(self.device_size * scale, ((self.device_size * scale) / 2) * aspect_ratio),
-            ])
-            painter.drawPolygon(points)
-
-        elif draw_shape == Shape.ARROW:
-            """
-            Vertex  1: x=0   y=-10 
-            Vertex  2: x=-5  y=0
-            Vertex  3: x=-2  y=0
-            Vertex  4: x=-2  y=5
-            Vertex  5: x=2   y=5
-            Vertex  6: x=2   y=0
-            Vertex  7: x=5   y=0
-            """
-
-            aspect_ratio = 1
-            scale = .8
-            points = QPolygon([
-                QPoint(0, self.device_size * scale * -1),
-                QPoint(self.device_size * scale / -2, 0),
-                QPoint(self.device_size * scale / -4, 0),
-                QPoint(self.device_size * scale / -4, self.device_size * scale / 2),
-                QPoint(self.device_size * scale / 4, self.device_size * scale / 2),
-                QPoint(self.device_size * scale / 4, 0),
-                QPoint(self.device_size * scale / 2, 0)
-            ])
-            painter.drawPolygon(points)
-
-        elif draw_shape == Shape.FLIPPER:
-            aspect_ratio = 5
-            scale = .7
-            points = QPolygon([
-                QPoint(0, self.device_size * scale * -1),
-                QPoint(self.device_size * scale * -1, ((self.device_size * scale) / 2) * aspect_ratio),
-                QPoint(self.device_size * scale, ((self.device_size * scale) / 2) * aspect_ratio),
-            ])
-            painter.drawPolygon(points)
+    def visual_key(self):
+        """Return what the widget looks like, state changes that leave it
+        the same don't need a repaint."""
+        if self.device_type == 'light':
+            return tuple(self.color_gamma(self.widget.data()['color']))
+        elif self.device_type == 'switch':
+            return bool(self.widget.data()['state'])
+        return None
 
     def notify(self, destroy=False, resize=False):
-        self.update()
-
         if destroy:
+            self.mpfmon.view.discard_widget(self)
             self.destroy()
+            return
+
+        if self.overlay is not None:
+            self.overlay.set_color(self, self.widget.data().get('color'))
+            return
+
+        visual_key = self.visual_key()
+        if visual_key == self._visual_key:
+            return
+
+        self._visual_key = visual_key
+        self.mpfmon.view.mark_widget_dirty(self)
 
 
     def destroy(self):
         self.log.debug("Destroy device: " + self.name)
+        if self.overlay is not None:
+            self.overlay.remove(self)
+        registry = getattr(self.mpfmon, 'widget_registry', None)
+        if registry is not None:
+            registry.remove(self)
         self.mpfmon.scene.removeItem(self)
         self.delete_from_config()
 
@@ -348,6 +544,20 @@ class PfWidget(QGraphicsItem):
         self.click_start = 0
 
     def update_pos(self, save=True):
+        # Size, shape or rotation may have changed
+        self.prepareGeometryChange()
+        self._bounds = None
+        self._shape = None
+        self.update()
+
+        overlay = getattr(self.mpfmon, 'led_overlay', None)
+        if overlay is not None:
+            overlay.place(self)
+
+        registry = getattr(self.mpfmon, 'widget_registry', None)
+        if registry is not None:
+            registry.place(self)
+
         x = self.pos().x() / self.mpfmon.scene.width() if self.mpfmon.scene.width() > 0 else self.pos().x()
         y = self.pos().y() / self.mpfmon.scene.height() if self.mpfmon.scene.height() > 0 else self.pos().y()
 
@@ -364,9 +574,9 @@ class PfWidget(QGraphicsItem):
         conf_shape_str = self.mpfmon.config[self.device_type][self.name].get('shape', 'DEFAULT')
         conf_shape = Shape[str(conf_shape_str).upper()]
 
-        if self.shape is not conf_shape:
-            if self.shape is not Shape.DEFAULT:
-                self.mpfmon.config[self.device_type][self.name]['shape'] = self.shape.name
+        if self.widget_shape is not conf_shape:
+            if self.widget_shape is not Shape.DEFAULT:
+                self.mpfmon.config[self.device_type][self.name]['shape'] = self.widget_shape.name
             else:
                 try:
                     self.mpfmon.config[self.device_type][self.name].pop('shape')
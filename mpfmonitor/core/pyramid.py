@@ -0,0 +1,143 @@
+"""Pre-scaled copies of the playfield image.
+
+A playfield photo is often 20 MP or more, far bigger than the window that
+shows it. The image is decoded once in a background thread and halved
+until it is about min_width wide. The view draws from the smallest level
+that still covers the pixels on screen, so Qt never scales the full image
+when the window is resized or repainted.
+
+The smaller levels are cached next to the image, in
+monitor/playfield_cache/, and rebuilt when the image changes.
+"""
+
+import logging
+import os
+import queue
+import threading
+
+# will change these to specific imports once code is more final
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+
+
+class ImagePyramid(object):
+
+    min_width = 256
+    quality = 90
+
+    def __init__(self, image_file, cache_path=None):
+        self.log = logging.getLogger('ImagePyramid')
+        self.image_file = image_file
+        self.cache_path = cache_path or os.path.join(
+            os.path.dirname(image_file), "playfield_cache")
+
+        # Only reads the header, the scene needs the size right away
+        self.size = QImageReader(image_file).size()
+        if not self.size.isValid():
+            self.size = QSize(0, 0)
+
+        self.sizes = self.level_sizes(self.size)
+
+        # QPixmaps belong to the GUI thread, the worker hands QImages over
+        self.levels = [None] * len(self.sizes)
+        self.loaded = queue.Queue()
+        self.thread = None
+
+    @classmethod
+    def level_sizes(cls, size):
+        """Return the size of every level, the full image first."""
+        if size.isEmpty():
+            return []
+
+        sizes = [size]
+        width, height = size.width(), size.height()
+        while width >= cls.min_width * 2:
+            width = (width + 1) // 2
+            height = max(1, (height + 1) // 2)
+            sizes.append(QSize(width, height))
+        return sizes
+
+    def cache_file(self, size):
+        # The size and time of the image are in the name, a new image never
+        # picks up the levels of the old one
+        stat = os.stat(self.image_file)
+        name = os.path.splitext(os.path.basename(self.image_file))[0]
+        return os.path.join(self.cache_path, "{}-{:x}-{:x}-{}x{}.jpg".format(
+            name, stat.st_size, int(stat.st_mtime), size.width(), size.height()))
+
+    def start(self):
+        if self.sizes:
+            self.thread = threading.Thread(target=self.load, daemon=True)
+            self.thread.start()
+
+    def load(self):
+        """Queue every level, smallest first. Runs in the worker thread."""
+        missing = []
+        for index in reversed(range(1, len(self.sizes))):
+            image = QImage(self.cache_file(self.sizes[index]))
+            if image.size() == self.sizes[index]:
+                self.loaded.put((index, image))
+            else:
+                missing.append(index)
+
+        image = QImage(self.image_file)
+        if image.isNull():
+            self.log.warning("Could not read %s", self.image_file)
+            return
+
+        if missing:
+            self.build(image, sorted(missing))
+
+        self.loaded.put((0, image))
+
+    def build(self, image, indexes):
+        try:
+            os.makedirs(self.cache_path, exist_ok=True)
+            self.remove_stale()
+        except OSError as e:
+            self.log.warning("Cannot cache the playfield levels: %s", e)
+
+        # Halving the previous level looks as good as scaling the full image
+        # in one go, at a fraction of the cost
+        level = image
+        for index in range(1, indexes[-1] + 1):
+            level = level.scaled(self.sizes[index], Qt.IgnoreAspectRatio,
+                                 Qt.SmoothTransformation)
+            if index in indexes:
+                level.save(self.cache_file(self.sizes[index]), "JPG", self.quality)
+                self.loaded.put((index, level))
+
+    def remove_stale(self):
+        current = {os.path.basename(self.cache_file(size)) for size in self.sizes[1:]}
+        name = os.path.splitext(os.path.basename(self.image_file))[0] + "-"
+        for file_name in os.listdir(self.cache_path):
+            if file_name.startswith(name) and file_name not in current:
+                os.remove(os.path.join(self.cache_path, file_name))
+
+    def take(self):
+        """Turn the levels the worker finished into pixmaps. Returns True if
+        there were any."""
+        taken = False
+        while True:
+            try:
+                index, image = self.loaded.get_nowait()
+            except queue.Empty:
+                return taken
+
+            self.levels[index] = QPixmap.fromImage(image)
+            taken = True
+
+    def is_complete(self):
+        return all(level is not None for level in self.levels)
+
+    def level(self, width):
+        """Return the smallest loaded level at least width pixels wide, or
+        the largest there is."""
+        largest = None
+        for level in reversed(self.levels):
+            if level is None:
+                continue
+            largest = level
+            if level.width() >= width:
+                return level
+        return largest
@@ -0,0 +1,103 @@
+import logging
+import time
+
+# will change these to specific imports once code is more final
+from PyQt5.QtCore import *
+
+
+class FrameScheduler(QObject):
+    """Collects dirty rows and scene items from all monitor windows and
+    flushes them together once per frame.
+
+    Work is keyed per window, so a device that changes a hundred times
+    between two frames is only redrawn once. Windows that are hidden,
+    minimized or paused keep their pending work until they are shown (or
+    resumed) again.
+
+    It also adds up the time spent taking in data and drawing it, and
+    reports both once per second with timings_updated (in ms per second).
+    """
+
+    timings_updated = pyqtSignal(float, float)
+
+    def __init__(self, frame_rate=30, parent=None):
+        super().__init__(parent)
+        self.log = logging.getLogger('Core')
+
+        self.pending = dict()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.set_frame_rate(frame_rate)
+
+        self.ingest_time = 0.0
+        self.render_time = 0.0
+        self.timings_timer = QTimer(self)
+        self.timings_timer.setInterval(1000)
+        self.timings_timer.timeout.connect(self.report_timings)
+        self.timings_timer.start()
+
+    def set_frame_rate(self, frame_rate):
+        try:
+            frame_rate = float(frame_rate)
+        except (TypeError, ValueError):
+            frame_rate = 30
+
+        if frame_rate <= 0:
+            self.log.warning("Invalid frame rate %s, using 30 fps", frame_rate)
+            frame_rate = 30
+
+        self.frame_rate = frame_rate
+        self.timer.setInterval(int(1000 / frame_rate))
+
+    def mark_dirty(self, window, key, callback):
+        """Run callback on the next frame in which window is visible.
+
+        Marking the same key again before then replaces the callback.
+        """
+        self.pending.setdefault(window, dict())[key] = callback
+
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def discard(self, window, key):
+        """Forget pending work, e.g. for an item that was removed."""
+        try:
+            del self.pending[window][key]
+        except KeyError:
+            pass
+
+    @staticmethod
+    def is_window_active(window):
+        return window.isVisible() and not window.isMinimized() and \
+            not getattr(window, 'paused', False)
+
+    def add_ingest_time(self, seconds):
+        self.ingest_time += seconds
+
+    def report_timings(self):
+        self.timings_updated.emit(self.ingest_time * 1000, self.render_time * 1000)
+        self.ingest_time = 0.0
+        self.render_time = 0.0
+
+    def flush(self):
+        start = time.perf_counter()
+
+        for window in list(self.pending):
+            if not self.is_window_active(window):
+                continue
+
+            callbacks = self.pending.pop(window)
+            for callback in callbacks.values():
+                # One broken row must not leave the rest of the window stale
+                try:
+                    callback()
+                except Exception:
+                    self.log.exception("Frame update of %s failed", window)
+
+        self.render_time += time.perf_counter() - start
+
+        # Nothing to do until someone marks work again. Hidden windows keep
+        # the timer running so their work lands as soon as they are shown.
+        if not self.pending:
+            self.timer.stop()
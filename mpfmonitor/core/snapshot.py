@@ -0,0 +1,64 @@
+"""Last-known device inventory, saved on exit and loaded at startup."""
+
+import json
+import logging
+import os
+
+SNAPSHOT_VERSION = 1
+
+log = logging.getLogger('Snapshot')
+
+
+def save_snapshot(snapshot_file, machine_path, devices):
+    """Write devices, a list of (type, name, state), to snapshot_file.
+
+    The file is written next to the target and then renamed over it so a
+    crash while saving never leaves a truncated snapshot behind.
+    """
+    payload = {
+        'version': SNAPSHOT_VERSION,
+        'machine_path': os.path.abspath(machine_path),
+        'devices': [[device_type, name, state] for device_type, name, state in devices],
+    }
+
+    tmp_file = snapshot_file + '.tmp'
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(payload, f, separators=(',', ':'), default=str)
+        os.replace(tmp_file, snapshot_file)
+    except OSError as e:
+        log.warning("Could not save device snapshot: %s", e)
+
+
+def load_snapshot(snapshot_file, machine_path):
+    """Return the (type, name, state) list saved for machine_path.
+
+    Missing, corrupt or outdated snapshots and snapshots of another
+    machine are ignored and return an empty list.
+    """
+    try:
+        with open(snapshot_file, 'r') as f:
+            payload = json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable device snapshot: %s", e)
+        return []
+
+    if not isinstance(payload, dict) or payload.get('version') != SNAPSHOT_VERSION:
+        log.info("Ignoring device snapshot from another monitor version")
+        return []
+
+    if payload.get('machine_path') != os.path.abspath(machine_path):
+        log.info("Ignoring device snapshot of another machine")
+        return []
+
+    devices = []
+    for entry in payload.get('devices', []):
+        try:
+            device_type, name, state = entry
+        except (TypeError, ValueError):
+            continue
+        devices.append((device_type, name, state))
+
+    return devices
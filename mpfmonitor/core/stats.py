@@ -0,0 +1,321 @@
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+from PyQt5 import uic
+
+import fnmatch
+import heapq
+import os
+import re
+import time
+
+from collections import Counter
+
+# MPF sends handler callbacks as their repr, e.g.
+# "<bound method BallDevice._source_playfield of <ball_device.bd_trough>>"
+CALLBACK_NAME = re.compile(r'<(?:bound method|function|built-in method) ([^\s>]+)')
+
+
+def handler_label(handler):
+    """Return a short name and the priority of one registered handler, as
+    sent in the registered_handlers list of a monitored event."""
+    if isinstance(handler, (list, tuple)) and handler:
+        callback = str(handler[0])
+        priority = handler[1] if len(handler) > 1 else None
+    else:
+        callback = str(handler)
+        priority = None
+
+    match = CALLBACK_NAME.match(callback)
+    if match is not None:
+        callback = match.group(1)
+
+    return callback, priority
+
+
+class EventStats(object):
+    """Per event name totals and sliding window rates.
+
+    Counts are kept in one bucket per second. Every window keeps a running
+    sum that is updated as events arrive and as buckets fall out of it, so
+    recording an event is O(1) and a rate never needs a rescan.
+
+    The handlers registered for each event are kept as well. Every handler
+    runs once per event, so rate times handler count estimates how many
+    handler calls an event causes per second, its dispatch load.
+    """
+
+    windows = (1, 10, 60)
+
+    def __init__(self):
+        self.totals = Counter()
+        self.buckets = dict()
+        self.sums = {window: Counter() for window in self.windows}
+        self.second = None
+        self.raw_handlers = dict()
+        self.handlers = dict()
+
+    def record(self, name, now=None, handlers=None):
+        second = int(time.monotonic() if now is None else now)
+        self.advance(second)
+
+        # Handlers rarely change, only label them when they do
+        if handlers is not None and handlers != self.raw_handlers.get(name):
+            self.raw_handlers[name] = handlers
+            self.handlers[name] = [handler_label(handler) for handler in handlers]
+
+        self.totals[name] += 1
+        self.buckets.setdefault(second, Counter())[name] += 1
+        for window in self.windows:
+            self.sums[window][name] += 1
+
+    def advance(self, second):
+        """Move the windows forward to second, dropping expired buckets."""
+        if self.second is None:
+            self.second = second
+            return
+
+        if second - self.second > max(self.windows):
+            # Everything expired
+            self.buckets.clear()
+            for counts in self.sums.values():
+                counts.clear()
+            self.second = second
+            return
+
+        while self.second < second:
+            self.second += 1
+            for window in self.windows:
+                expired = self.buckets.get(self.second - window)
+                if expired:
+                    self._subtract(self.sums[window], expired)
+            self.buckets.pop(self.second - max(self.windows), None)
+
+    @staticmethod
+    def _subtract(counts, expired):
+        for name, count in expired.items():
+            left = counts[name] - count
+            if left > 0:
+                counts[name] = left
+            else:
+                del counts[name]
+
+    def rate(self, name, window):
+        """Events per second of name over the last window seconds."""
+        return self.sums[window][name] / window
+
+    def handler_count(self, name):
+        return len(self.handlers.get(name, ()))
+
+    def dispatch_rate(self, name, window):
+        """Estimated handler calls per second caused by name."""
+        return self.rate(name, window) * self.handler_count(name)
+
+    def top_dispatch(self, count, window, names=None):
+        """Return the count event names with the highest dispatch load."""
+        counts = self.sums[window]
+        if names is None:
+            names = counts.keys()
+
+        return heapq.nlargest(count, names,
+                              key=lambda name: counts[name] * self.handler_count(name))
+
+    def top_handlers(self, count, window, names=None):
+        """Return the count busiest (handler, priority, event name) pairs
+        with their calls per second, busiest first."""
+        counts = self.sums[window]
+        if names is None:
+            names = counts.keys()
+
+        pairs = ((counts[name] / window, handler, priority, name)
+                 for name in names for handler, priority in self.handlers.get(name, ()))
+
+        return heapq.nlargest(count, pairs, key=lambda pair: pair[0])
+
+    def top(self, count, window=None, names=None):
+        """Return the count busiest event names, by total or by rate over
+        window. names can restrict the ranking to a subset."""
+        counts = self.totals if window is None else self.sums[window]
+        if names is None:
+            names = counts.keys()
+
+        return heapq.nlargest(count, names, key=counts.__getitem__)
+
+    def clear(self):
+        self.totals.clear()
+        self.buckets.clear()
+        for counts in self.sums.values():
+            counts.clear()
+        self.second = None
+        self.raw_handlers.clear()
+        self.handlers.clear()
+
+
+class StatsWindow(QWidget):
+
+    headers = ["Event", "Count", "1 s", "10 s", "60 s", "Suppressed",
+               "Handlers", "Dispatch/s"]
+    handler_headers = ["Handler", "Event", "Priority", "Calls/s"]
+
+    def __init__(self, mpfmon):
+        self.mpfmon = mpfmon
+        super().__init__()
+        self.ui = None
+        self.model = None
+        self.handler_model = None
+        self.filter_regex = None
+        self.rank_window = 10
+        self.rank_dispatch = False
+
+        self.top_count = self.mpfmon.config.get("event_stats_top", 50)
+        if not isinstance(self.top_count, int) or self.top_count <= 0:  # Protect against corrupted count
+            self.top_count = 50
+
+        self.draw_ui()
+        self.attach_model()
+        self.attach_signals()
+
+        # Rates are shown once per second, however fast events come in
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
+
+    def draw_ui(self):
+        # Load ui file from ./ui/
+        ui_path = os.path.join(os.path.dirname(__file__), "ui", "searchable_table.ui")
+        self.ui = uic.loadUi(ui_path, self)
+
+        self.ui.setWindowTitle('Event Statistics')
+
+        self.ui.move(self.mpfmon.local_settings.value('windows/stats/pos',
+                                                   QPoint(500, 850)))
+        self.ui.resize(self.mpfmon.local_settings.value('windows/stats/size',
+                                                     QSize(400, 300)))
+
+        # Rank by total count or by one of the rates
+        self.ui.sortComboBox.setItemText(1, "Count ▾")
+        self.ui.sortComboBox.setItemText(2, "1 s rate ▾")
+        self.ui.sortComboBox.setItemText(3, "10 s rate ▾")
+        self.ui.sortComboBox.setItemText(4, "60 s rate ▾")
+        self.ui.sortComboBox.addItem("Dispatch ▾")
+
+        # Disable option "Sort", select the 10 s rate.
+        self.ui.sortComboBox.model().item(0).setEnabled(False)
+        self.ui.sortComboBox.setCurrentIndex(3)
+
+        self.ui.tableView.setSortingEnabled(False)
+
+        # Hottest handlers, below the events
+        self.ui.handlerTableView = QTableView(self)
+        self.ui.handlerTableView.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.ui.handlerTableView.setAlternatingRowColors(True)
+        self.ui.handlerTableView.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.ui.handlerTableView.verticalHeader().setVisible(False)
+        self.ui.gridLayout.addWidget(self.ui.handlerTableView, 2, 0, 1, 2)
+
+    def attach_signals(self):
+        assert (self.ui is not None)
+        self.ui.filterLineEdit.textChanged.connect(self.filter_text)
+        self.ui.sortComboBox.currentIndexChanged.connect(self.change_sort)
+
+    def attach_model(self):
+        self.model = QStandardItemModel(0, len(self.headers))
+        self.model.setHorizontalHeaderLabels(self.headers)
+
+        self.ui.tableView.setModel(self.model)
+
+        self.handler_model = QStandardItemModel(0, len(self.handler_headers))
+        self.handler_model.setHorizontalHeaderLabels(self.handler_headers)
+
+        self.ui.handlerTableView.setModel(self.handler_model)
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+
+        stats = self.mpfmon.event_stats
+        stats.advance(int(time.monotonic()))
+        # Copy, the receive thread keeps counting while we render
+        suppressed = dict(self.mpfmon.event_filter.suppressed)
+
+        names = None
+        if self.filter_regex is not None:
+            names = [name for name in stats.totals if self.filter_regex.match(name)]
+
+        # Dispatch load is always estimated from the 10 s rate
+        if self.rank_dispatch:
+            top = stats.top_dispatch(self.top_count, 10, names)
+        else:
+            top = stats.top(self.top_count, self.rank_window, names)
+
+        # Events a drop rule removes entirely never reach the stats, they
+        # are listed after the ranked ones, most suppressed first
+        dropped = [name for name in suppressed if name not in stats.totals and
+                   (self.filter_regex is None or self.filter_regex.match(name))]
+        top += heapq.nlargest(self.top_count, dropped, key=suppressed.__getitem__)
+
+        rows = []
+        for name in top:
+            values = [name, str(stats.totals[name])]
+            values += ['{:.1f}'.format(stats.rate(name, window)) for window in stats.windows]
+            values.append(str(suppressed.get(name, 0)))
+            values.append(str(stats.handler_count(name)))
+            values.append('{:.1f}'.format(stats.dispatch_rate(name, 10)))
+            rows.append(values)
+        self.update_rows(self.model, rows)
+
+        rows = [[handler, name, '' if priority is None else str(priority),
+                 '{:.1f}'.format(calls)]
+                for calls, handler, priority, name
+                in stats.top_handlers(self.top_count, 10, names)]
+        self.update_rows(self.handler_model, rows, text_columns=2)
+
+        self.ui.tableView.resizeColumnToContents(0)
+        self.ui.handlerTableView.resizeColumnToContents(0)
+
+        total_suppressed = sum(suppressed.values())
+        if total_suppressed:
+            self.ui.setWindowTitle('Event Statistics ({} suppressed)'.format(total_suppressed))
+        else:
+            self.ui.setWindowTitle('Event Statistics')
+
+    @staticmethod
+    def update_rows(model, rows, text_columns=1):
+        """Update the rows in place, keeping the scroll position. Columns
+        after the first text_columns are numbers and aligned right."""
+        model.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = model.item(row, column)
+                if item is None:
+                    item = QStandardItem()
+                    if column >= text_columns:
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    model.setItem(row, column, item)
+                if item.text() != value:
+                    item.setText(value)
+
+    def filter_text(self, string):
+        if string:
+            self.filter_regex = re.compile(fnmatch.translate("*" + str(string) + "*"))
+        else:
+            self.filter_regex = None
+        self.refresh()
+
+    def change_sort(self, index=3):
+        self.rank_dispatch = index == 5
+        if index == 1:  # Total count
+            self.rank_window = None
+        elif index == 2:
+            self.rank_window = 1
+        elif index == 3:
+            self.rank_window = 10
+        elif index == 4:
+            self.rank_window = 60
+        self.refresh()
+
+    def closeEvent(self, event):
+        self.mpfmon.write_local_settings()
+        event.accept()
+        self.mpfmon.check_if_quit()
@@ -0,0 +1,288 @@
+import time
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+# will change these to specific imports once code is more final
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+
+from mpfmonitor.core.events import format_time
+
+RUNNING = float('inf')
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return '{}s'.format(seconds)
+    if seconds < 3600:
+        return '{}m {:02d}s'.format(seconds // 60, seconds % 60)
+    return '{}h {:02d}m'.format(seconds // 3600, seconds % 3600 // 60)
+
+
+class ModeLane(object):
+    """Start/stop history of one mode.
+
+    A mode only runs once at a time, so its intervals never overlap and
+    both their starts and their ends are sorted. Any time range is found
+    with two binary searches. A priority change closes the interval and
+    opens a new one, it does not count as an activation.
+    """
+
+    __slots__ = ('starts', 'ends', 'priorities', 'activations', 'closed_time')
+
+    def __init__(self):
+        self.starts = array('d')
+        self.ends = array('d')
+        self.priorities = array('l')
+        self.activations = 0
+        self.closed_time = 0.0
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def running(self):
+        return bool(self.ends) and self.ends[-1] == RUNNING
+
+    @property
+    def priority(self):
+        return self.priorities[-1] if self.running else None
+
+    def start(self, timestamp, priority):
+        self.starts.append(timestamp)
+        self.ends.append(RUNNING)
+        self.priorities.append(priority)
+
+    def stop(self, timestamp):
+        self.ends[-1] = timestamp
+        self.closed_time += timestamp - self.starts[-1]
+
+    def total_time(self, now):
+        if self.running:
+            return self.closed_time + now - self.starts[-1]
+        return self.closed_time
+
+    def segments(self, first_time, last_time, resolution, now):
+        """Return the (start, end, intervals) bars to draw between
+        first_time and last_time.
+
+        Intervals closer than resolution (about one pixel) are merged into
+        one bar, so a bar list is never longer than the width in pixels no
+        matter how many times the mode ran.
+        """
+        first = bisect_right(self.ends, first_time)
+        last = bisect_left(self.starts, last_time)
+
+        bars = []
+        i = first
+        while i < last:
+            end = self.ends[i]
+            j = i + 1
+            while j < last:
+                # Every interval starting within resolution of the bar joins
+                # it, the last of them ends it
+                k = bisect_left(self.starts, min(end, now) + resolution, j, last)
+                if k == j:
+                    break
+                end = self.ends[k - 1]
+                j = k
+
+            bars.append((self.starts[i], min(end, now), j - i))
+            i = j
+
+        return bars
+
+
+class ModeTimeline(object):
+    """Interval history of all modes, fed from the running_modes lists of
+    mode_start, mode_stop and mode_list."""
+
+    def __init__(self):
+        self.lanes = dict()
+        self.first_time = None
+
+    def update(self, running_modes, timestamp=None):
+        if timestamp is None:
+            timestamp = time.perf_counter()
+
+        if self.first_time is None:
+            self.first_time = timestamp
+
+        priorities = {mode[0]: int(mode[1]) for mode in running_modes}
+
+        for name, lane in self.lanes.items():
+            if lane.running and name not in priorities:
+                lane.stop(timestamp)
+
+        for name, priority in priorities.items():
+            lane = self.lanes.get(name)
+            if lane is None:
+                lane = self.lanes[name] = ModeLane()
+
+            if not lane.running:
+                lane.start(timestamp, priority)
+                lane.activations += 1
+            elif lane.priority != priority:
+                lane.stop(timestamp)
+                lane.start(timestamp, priority)
+
+    def is_running(self):
+        return any(lane.running for lane in self.lanes.values())
+
+    def clear(self):
+        self.lanes.clear()
+        self.first_time = None
+
+
+class TimelineWidget(QWidget):
+    """Gantt chart with one lane per mode.
+
+    It follows the current time until it is zoomed with the mouse wheel or
+    dragged, a double click goes back to the whole session.
+    """
+
+    label_width = 120
+    axis_height = 14
+    max_lane_height = 16
+
+    def __init__(self, timeline, parent=None):
+        super().__init__(parent)
+        self.timeline = timeline
+
+        # Shown range, None for the whole session up to now
+        self.span = None
+        self.end = None
+        self._drag = None
+
+        self.setMinimumHeight(60)
+        self.setMouseTracking(True)
+
+        # Running modes grow, keep redrawing while any are
+        self.live_timer = QTimer(self)
+        self.live_timer.setInterval(1000)
+        self.live_timer.timeout.connect(self.update_live)
+        self.live_timer.start()
+
+    def update_live(self):
+        if self.isVisible() and self.end is None and self.timeline.is_running():
+            self.update()
+
+    def view_range(self, now=None):
+        if now is None:
+            now = time.perf_counter()
+
+        end = now if self.end is None else self.end
+        if self.span is not None:
+            return end - self.span, end
+
+        first_time = self.timeline.first_time
+        if first_time is None or first_time >= end:
+            return end - 60.0, end
+        return first_time, end
+
+    def lane_height(self):
+        lanes = max(1, len(self.timeline.lanes))
+        return max(4, min(self.max_lane_height,
+                          (self.height() - self.axis_height) // lanes))
+
+    def lane_at(self, y):
+        index = y // self.lane_height()
+        names = list(self.timeline.lanes)
+        if 0 <= index < len(names):
+            return names[index]
+        return None
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().base())
+
+        if not self.timeline.lanes:
+            painter.setPen(self.palette().color(QPalette.Disabled, QPalette.Text))
+            painter.drawText(self.rect(), Qt.AlignCenter, "No modes yet")
+            return
+
+        now = time.perf_counter()
+        first_time, last_time = self.view_range(now)
+        left = self.label_width
+        width = max(1, self.width() - left - 2)
+        scale = width / (last_time - first_time)
+        lane_height = self.lane_height()
+
+        text_color = self.palette().color(QPalette.Text)
+        bar_color = self.palette().color(QPalette.Highlight)
+
+        for row, (name, lane) in enumerate(self.timeline.lanes.items()):
+            top = row * lane_height
+            if top + lane_height > self.height() - self.axis_height:
+                break
+
+            painter.setPen(text_color)
+            painter.drawText(QRect(2, top, left - 4, lane_height),
+                             Qt.AlignLeft | Qt.AlignVCenter, name)
+
+            for start, end, count in lane.segments(first_time, last_time, 1 / scale, now):
+                x = left + max(0.0, start - first_time) * scale
+                bar_width = max(1.0, (min(end, last_time) - first_time) * scale - (x - left))
+                painter.fillRect(QRectF(x, top + 2, bar_width, lane_height - 3), bar_color)
+
+        # Time axis
+        painter.setPen(self.palette().color(QPalette.Disabled, QPalette.Text))
+        axis = QRect(left, self.height() - self.axis_height, width, self.axis_height)
+        painter.drawText(axis, Qt.AlignLeft | Qt.AlignVCenter, format_time(first_time))
+        painter.drawText(axis, Qt.AlignRight | Qt.AlignVCenter,
+                         "now" if self.end is None else format_time(last_time))
+
+    def event(self, event):
+        if event.type() == QEvent.ToolTip:
+            name = self.lane_at(event.pos().y())
+            if name is None:
+                QToolTip.hideText()
+            else:
+                lane = self.timeline.lanes[name]
+                QToolTip.showText(event.globalPos(), '{}: {} activations, {} active'.format(
+                    name, lane.activations, format_duration(lane.total_time(time.perf_counter()))))
+            return True
+
+        return super().event(event)
+
+    def wheelEvent(self, event):
+        first_time, last_time = self.view_range()
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+
+        # Zoom around the time under the cursor
+        width = max(1, self.width() - self.label_width - 2)
+        fraction = min(1.0, max(0.0, (event.pos().x() - self.label_width) / width))
+        anchor = first_time + fraction * (last_time - first_time)
+
+        self.span = max(0.01, (last_time - first_time) * factor)
+        if self.end is not None or fraction < 1.0:
+            self.end = min(time.perf_counter(), anchor + (1 - fraction) * self.span)
+
+        self.update()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self._drag = (event.pos().x(), self.view_range())
+
+    def mouseMoveEvent(self, event):
+        if self._drag is None:
+            return
+
+        x, (first_time, last_time) = self._drag
+        width = max(1, self.width() - self.label_width - 2)
+        shift = (x - event.pos().x()) / width * (last_time - first_time)
+
+        self.span = last_time - first_time
+        self.end = min(time.perf_counter(), last_time + shift)
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        self._drag = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.span = None
+        self.end = None
+        self.update()
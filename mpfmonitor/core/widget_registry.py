@@ -0,0 +1,87 @@
+"""Index of the widgets on the playfield, by device and by position."""
+
+import math
+
+
+class WidgetRegistry(object):
+    """Finds PfWidgets by (device type, name) and by where they are.
+
+    Positions are kept in a uniform grid of cell_size scene units. A
+    rectangle or point query only looks at the cells it covers, however many
+    widgets there are. Widgets report moves with place().
+    """
+
+    def __init__(self, cell_size=50.0):
+        self.cell_size = float(cell_size)
+        self.devices = dict()
+        self.cells = dict()
+        self.cell_of = dict()
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __contains__(self, widget):
+        return widget in self.cell_of
+
+    def cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def place(self, widget):
+        """Add widget, or follow it to its new position."""
+        key = (widget.device_type, widget.name)
+        old = self.devices.get(key)
+        if old is not None and old is not widget:
+            self.remove(old)
+        self.devices[key] = widget
+
+        cell = self.cell(widget.pos().x(), widget.pos().y())
+        old_cell = self.cell_of.get(widget)
+        if old_cell == cell:
+            return
+
+        if old_cell is not None:
+            self._leave(widget, old_cell)
+        self.cells.setdefault(cell, set()).add(widget)
+        self.cell_of[widget] = cell
+
+    def remove(self, widget):
+        cell = self.cell_of.pop(widget, None)
+        if cell is None:
+            return
+
+        self._leave(widget, cell)
+        key = (widget.device_type, widget.name)
+        if self.devices.get(key) is widget:
+            del self.devices[key]
+
+    def _leave(self, widget, cell):
+        widgets = self.cells[cell]
+        widgets.discard(widget)
+        if not widgets:
+            del self.cells[cell]
+
+    def get(self, device_type, name):
+        return self.devices.get((device_type, name))
+
+    def widgets(self, device_type=None):
+        return [widget for (widget_type, name), widget in self.devices.items()
+                if device_type is None or widget_type == device_type]
+
+    def in_rect(self, rect, device_type=None):
+        """Return the widgets whose center is inside the QRectF rect."""
+        first_x, first_y = self.cell(rect.left(), rect.top())
+        last_x, last_y = self.cell(rect.right(), rect.bottom())
+
+        found = []
+        for cell_x in range(first_x, last_x + 1):
+            for cell_y in range(first_y, last_y + 1):
+                for widget in self.cells.get((cell_x, cell_y), ()):
+                    if (device_type is None or widget.device_type == device_type) and \
+                            rect.contains(widget.pos()):
+                        found.append(widget)
+        return found
+
+    def clear(self):
+        self.devices.clear()
+        self.cells.clear()
+        self.cell_of.clear()
@@ -0,0 +1,60 @@
+import unittest
+import io
+import os
+import queue
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from mpfmonitor.core.bcp_client import *
+from mpfmonitor.core.heatmap import read_capture
+
+
+class TestableBCPClientNoGUI(BCPClient):
+    def __init__(self, mpfmon_mock, cache_file):
+        self.mpfmon = mpfmon_mock
+        self.log = logging.getLogger('BCP Client')
+        self.receive_queue = queue.Queue()
+        self.simulate = False
+        self.caching_enabled = True
+        self.cache_file = cache_file
+        self.last_time = datetime.now()
+
+
+class TestCapture(unittest.TestCase):
+
+    def setUp(self):
+        mpfmon = MagicMock()
+        mpfmon.event_filter = None
+        self.cache_file = io.StringIO()
+        self.client = TestableBCPClientNoGUI(mpfmon, self.cache_file)
+
+    def test_delay_keeps_whole_seconds(self):
+        self.client.last_time = datetime.now() - timedelta(seconds=2, milliseconds=500)
+        self.client.process_received_message('reset')
+
+        delay = int(self.cache_file.getvalue().split(',', 1)[0])
+        self.assertGreaterEqual(delay, 2500)
+        self.assertLess(delay, 3500)
+
+    def test_capture_reads_back(self):
+        self.client.last_time = datetime.now() - timedelta(seconds=1)
+        self.client.process_received_message(
+            'device?json={"type": "light", "name": "l_test", "changes": false, '
+            '"state": {"color": [255, 0, 0]}}')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            capture_file = os.path.join(tmp_dir, "cache.txt")
+            with open(capture_file, 'w') as f:
+                f.write(self.cache_file.getvalue())
+
+            (timestamp, cmd, kwargs), = read_capture(capture_file)
+
+        self.assertGreaterEqual(timestamp, 1.0)
+        self.assertEqual(cmd, 'device')
+        self.assertEqual(kwargs['name'], "l_test")
+        self.assertEqual(self.client.receive_queue.get()[0], 'device')
+
+
+if __name__ == '__main__':
+    unittest.main()
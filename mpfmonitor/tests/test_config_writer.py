@@ -0,0 +1,101 @@
+import unittest
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+
+from PyQt5.QtWidgets import QApplication
+
+from mpfmonitor.core.config_writer import *
+
+app = QApplication(sys.argv)
+
+
+class TestableConfigWriter(ConfigWriter):
+    """The writer mechanics, without depending on the installed YAML
+    library."""
+
+    def dump(self, config):
+        return json.dumps(config)
+
+
+class TestConfigWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.path, "monitor.yaml")
+        self.thread_stopper = threading.Event()
+        self.writer = TestableConfigWriter(self.config_file, self.thread_stopper)
+
+    def tearDown(self):
+        self.writer.flush()
+        self.thread_stopper.set()
+        shutil.rmtree(self.path)
+
+    def read(self):
+        with open(self.config_file, 'r') as f:
+            return json.load(f)
+
+    def test_debounce(self):
+        config = {"light": {"l_test": {"x": 0.5, "y": 0.5}}}
+        for rotation in range(10):
+            config["light"]["l_test"]["rotation"] = rotation
+            self.writer.save(config)
+
+        # Nothing happens until the delay is over
+        self.assertTrue(self.writer.timer.isActive())
+        self.assertIsNone(self.writer.writer_thread)
+        self.assertFalse(os.path.exists(self.config_file))
+
+        self.writer.commit()
+        self.writer.flush()
+
+        self.assertEqual(self.writer.writes, 1)
+        self.assertFalse(self.writer.timer.isActive())
+        self.assertEqual(self.read()["light"]["l_test"]["rotation"], 9)
+
+    def test_writes_copy(self):
+        config = {"device_size": 0.02}
+        self.writer.save(config)
+        self.writer.commit()
+
+        # Changes after the delay are in the next write, never half of this one
+        config["device_size"] = 0.04
+        self.writer.flush()
+        self.assertEqual(self.read(), {"device_size": 0.02})
+
+        self.writer.save(config)
+        self.writer.flush()
+        self.assertEqual(self.read(), {"device_size": 0.04})
+        self.assertEqual(self.writer.writes, 2)
+
+    def test_atomic_replace(self):
+        with open(self.config_file, 'w') as f:
+            f.write("{}")
+        os.chmod(self.config_file, 0o640)
+
+        self.writer.save({"switch": {}})
+        self.writer.flush()
+
+        self.assertEqual(os.listdir(self.path), ["monitor.yaml"])
+        self.assertEqual(stat.S_IMODE(os.stat(self.config_file).st_mode), 0o640)
+        self.assertEqual(self.read(), {"switch": {}})
+
+    def test_flush_without_changes(self):
+        self.writer.flush()
+
+        self.assertIsNone(self.writer.writer_thread)
+        self.assertFalse(os.path.exists(self.config_file))
+
+    def test_write_error(self):
+        writer = TestableConfigWriter(os.path.join(self.path, "missing", "monitor.yaml"),
+                                      self.thread_stopper)
+        with self.assertLogs('ConfigWriter', level='ERROR'):
+            writer.save({})
+            writer.flush()
+
+        self.assertEqual(writer.writes, 0)
+        self.assertEqual(os.listdir(self.path), [])
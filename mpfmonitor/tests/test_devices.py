@@ -5,6 +5,7 @@ from PyQt5.QtTest import QTest
 from PyQt5 import QtCore, QtGui, QtWidgets
 from unittest.mock import MagicMock, patch, NonCallableMock
 from mpfmonitor.core.devices import *
+from mpfmonitor.core.scheduler import FrameScheduler
 
 
 class TestableDeviceWindowNoGUI(DeviceWindow):
@@ -17,9 +18,11 @@ class TestableDeviceWindowNoGUI(DeviceWindow):
 
         self.ui = None
         self.model = None
+        self.paused = False
 
         self.device_states = dict()
         self.device_type_widgets = dict()
+        self.history = DeviceHistory()
 
 class TestDeviceWindowFunctions(unittest.TestCase):
     def setUp(self):
@@ -64,6 +67,70 @@ class TestDeviceWindowFunctions(unittest.TestCase):
 
         self.device_window.device_states[type][name].setData.assert_called_with(state)
 
+        self.assertEqual(len(self.device_window.history.get(type, name)), 1)
+
+
+    def test_new_device_while_paused(self):
+        self.device_window.log = MagicMock()
+        self.device_window.mpfmon = MagicMock()
+        self.device_window.model = QStandardItemModel()
+        self.device_window.paused = True
+
+        scheduler = FrameScheduler()
+        scheduler.is_window_active = lambda window: not window.paused
+        self.device_window.mpfmon.frame_scheduler = scheduler
+
+        self.device_window.process_device_update("s_start", {'state': 1}, False, "switch")
+        self.device_window.process_device_update("s_start", {'state': 0}, False, "switch")
+        scheduler.flush()
+
+        self.assertEqual(self.device_window.model.rowCount(), 0)
+        self.assertIn("s_start", self.device_window.device_states["switch"])
+
+        self.device_window.paused = False
+        scheduler.flush()
+
+        switches = self.device_window.model.item(0)
+        self.assertEqual(switches.text(), "switch")
+        self.assertEqual(switches.child(0, 0).text(), "s_start")
+        self.assertEqual(switches.child(0, 1).text(), "0")
+
+    @patch('mpfmonitor.core.devices.DeviceNode', autospec=True)
+    def test_load_snapshot_is_stale(self, node):
+        self.device_window.log = MagicMock()
+        self.device_window.mpfmon = MagicMock()
+
+        self.device_window.load_snapshot([("switch", "s_start", {'state': 1})])
+
+        node().set_stale.assert_called_with(True)
+        self.assertIsNone(self.device_window.history.get("switch", "s_start"))
+
+        self.device_window.process_device_update("s_start", {'state': 0}, False, "switch")
+
+        node().set_stale.assert_called_with(False)
+        self.assertEqual(len(self.device_window.history.get("switch", "s_start")), 1)
+
+    def test_snapshot_drops_unconfirmed(self):
+        self.device_window.log = MagicMock()
+        self.device_window.mpfmon = MagicMock()
+        self.device_window.mpfmon.frame_scheduler = None
+        self.device_window.ui.history_widget.is_showing.return_value = False
+        self.device_window.model = QStandardItemModel()
+
+        self.device_window.load_snapshot([("switch", "s_start", {'state': 1}),
+                                          ("switch", "s_removed", {'state': 0})])
+
+        # Never connected, the last inventory is kept
+        self.assertEqual(self.device_window.snapshot(),
+                         [("switch", "s_start", {'state': 1}),
+                          ("switch", "s_removed", {'state': 0})])
+
+        self.device_window.process_device_update("s_start", {'state': 0}, False, "switch")
+        self.device_window.process_device_update("l_new", {'color': [0, 0, 0]}, False, "light")
+
+        self.assertEqual(self.device_window.snapshot(),
+                         [("switch", "s_start", {'state': 0}),
+                          ("light", "l_new", {'color': [0, 0, 0]})])
 
     def test_filter_text(self):
         string_in = "filter_string_test"
@@ -75,24 +142,168 @@ class TestDeviceWindowFunctions(unittest.TestCase):
 
     def test_change_sort_default(self):
         self.device_window.change_sort()
-        self.device_window.filtered_model.sort.assert_called_once_with(2, Qt.AscendingOrder)
+        self.device_window.filtered_model.setSortRole.assert_called_once_with(DeviceNode.ReceivedRole)
+        self.device_window.filtered_model.sort.assert_called_once_with(0, Qt.AscendingOrder)
 
     def test_change_sort_time_down(self):
         self.device_window.change_sort(1)
-        self.device_window.filtered_model.sort.assert_called_once_with(2, Qt.AscendingOrder)
+        self.device_window.filtered_model.setSortRole.assert_called_once_with(DeviceNode.ReceivedRole)
+        self.device_window.filtered_model.sort.assert_called_once_with(0, Qt.AscendingOrder)
 
     def test_change_sort_time_up(self):
         self.device_window.change_sort(2)
-        self.device_window.filtered_model.sort.assert_called_once_with(2, Qt.DescendingOrder)
+        self.device_window.filtered_model.setSortRole.assert_called_once_with(DeviceNode.ReceivedRole)
+        self.device_window.filtered_model.sort.assert_called_once_with(0, Qt.DescendingOrder)
 
     def test_change_sort_name_up(self):
         self.device_window.change_sort(3)
+        self.device_window.filtered_model.setSortRole.assert_called_once_with(Qt.DisplayRole)
         self.device_window.filtered_model.sort.assert_called_once_with(0, Qt.AscendingOrder)
 
     def test_change_sort_name_down(self):
         self.device_window.change_sort(4)
+        self.device_window.filtered_model.setSortRole.assert_called_once_with(Qt.DisplayRole)
         self.device_window.filtered_model.sort.assert_called_once_with(0, Qt.DescendingOrder)
 
+    def test_change_sort_keeps_layout(self):
+        self.device_window.change_sort(3)
+        self.device_window.filtered_model.beginResetModel.assert_not_called()
+        self.device_window.model.layoutAboutToBeChanged.emit.assert_not_called()
+
+    def test_device_at(self):
+        model = QtGui.QStandardItemModel()
+        type_item = QtGui.QStandardItem("light")
+        device_item = QtGui.QStandardItem("l_shoot_again")
+        property_item = QtGui.QStandardItem("color")
+        device_item.appendRow(property_item)
+        type_item.appendRow(device_item)
+        model.appendRow(type_item)
+
+        self.assertEqual(DeviceWindow.device_at(property_item.index()), ("light", "l_shoot_again"))
+        self.assertEqual(DeviceWindow.device_at(device_item.index()), ("light", "l_shoot_again"))
+        self.assertEqual(DeviceWindow.device_at(type_item.index()), (None, None))
+
+
+class TestDescribeState(unittest.TestCase):
+
+    def test_light(self):
+        descriptor = describe_state({'color': [255, 128, 0]})
+        self.assertEqual(descriptor.color, (255, 128, 0))
+        self.assertEqual(descriptor.text, '')
+
+    def test_switch(self):
+        descriptor = describe_state({'state': 1, 'recycle_jitter_count': 0})
+        self.assertIs(descriptor.state, True)
+        self.assertEqual(descriptor.text, '1')
+
+    def test_ball_device(self):
+        descriptor = describe_state({'balls': 2, 'state': 'idle',
+                                     'num_balls_requested': 1})
+        self.assertEqual(descriptor.balls, 2)
+        self.assertEqual(descriptor.text, 'idle Requested: 1')
+
+    def test_unknown(self):
+        self.assertIsNone(describe_state({'value': 12}))
+        self.assertIsNone(describe_state("not a dict"))
+
+    def test_node_stale(self):
+        node = DeviceNode()
+        node.setData({'state': 0})
+
+        node.set_stale(True)
+        self.assertTrue(node.q_name.font().italic())
+
+        node.set_stale(False)
+        self.assertFalse(node.q_name.font().italic())
+
+    def test_node_caches_descriptor(self):
+        node = DeviceNode()
+        node.setData({'state': 0})
+        first = node.descriptor()
+
+        self.assertIs(node.descriptor(), first)
+
+        node.setData({'state': 1})
+        self.assertIsNot(node.descriptor(), first)
+        self.assertIs(node.descriptor().state, True)
+
+
+class TestDeviceDelegate(unittest.TestCase):
+
+    def test_pixmap_cache(self):
+        delegate = DeviceDelegate()
+        on = describe_state({'state': 1})
+
+        pixmap = delegate.indicator_pixmap(on, 1.0)
+
+        self.assertIs(delegate.indicator_pixmap(describe_state({'state': 1}), 1.0), pixmap)
+        self.assertIsNot(delegate.indicator_pixmap(describe_state({'state': 0}), 1.0), pixmap)
+
+    def test_ball_count(self):
+        delegate = DeviceDelegate()
+        self.assertEqual(delegate.indicator_count(describe_state({'balls': 3})), 3)
+        self.assertEqual(delegate.indicator_count(describe_state({'balls': 300})),
+                         delegate.max_circles)
+
+
+app = QApplication(sys.argv)
+
+
+class TestDeviceWindowSorting(unittest.TestCase):
+
+    def setUp(self):
+        self.device_window = TestableDeviceWindowNoGUI(mpfmon_mock=MagicMock(), logger=True)
+        self.device_window.ui = MagicMock()
+        self.device_window.ui.treeView = QTreeView()
+
+        # The testable window never ran QWidget.__init__, so it can't parent the proxy
+        with patch('mpfmonitor.core.devices.QSortFilterProxyModel',
+                   lambda parent: QtCore.QSortFilterProxyModel()):
+            self.device_window.attach_model()
+
+        for name in ["s_b", "s_c", "s_a"]:
+            self.device_window.process_device_update(name, {'state': 0}, False, "switch")
+
+        self.view = self.device_window.ui.treeView
+        self.proxy = self.device_window.filtered_model
+        self.switches = self.proxy.index(0, 0)
+
+    def tearDown(self):
+        # Destroy the view while the application is still running
+        self.view.deleteLater()
+        QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+
+    def names(self):
+        return [self.proxy.index(row, 0, self.switches).data()
+                for row in range(self.proxy.rowCount(self.switches))]
+
+    def test_sort_orders(self):
+        self.assertEqual(self.names(), ["s_b", "s_c", "s_a"])
+
+        self.device_window.change_sort(2)
+        self.assertEqual(self.names(), ["s_a", "s_c", "s_b"])
+
+        self.device_window.change_sort(3)
+        self.assertEqual(self.names(), ["s_a", "s_b", "s_c"])
+
+        self.device_window.change_sort(4)
+        self.assertEqual(self.names(), ["s_c", "s_b", "s_a"])
+
+    def test_sort_keeps_view_state(self):
+        self.view.expand(self.switches)
+        self.view.setCurrentIndex(self.proxy.index(1, 0, self.switches))
+        self.assertEqual(self.view.currentIndex().data(), "s_c")
+
+        self.device_window.change_sort(3)
+
+        self.assertTrue(self.view.isExpanded(self.proxy.index(0, 0)))
+        self.assertEqual(self.view.currentIndex().data(), "s_c")
+
+    def test_insert_into_sorted_view(self):
+        self.device_window.change_sort(3)
+        self.device_window.process_device_update("s_bb", {'state': 0}, False, "switch")
+
+        self.assertEqual(self.names(), ["s_a", "s_b", "s_bb", "s_c"])
 
 
 if __name__ == '__main__':
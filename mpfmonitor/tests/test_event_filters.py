@@ -0,0 +1,69 @@
+import unittest
+
+from mpfmonitor.core.event_filters import *
+
+
+class TestPeekEventName(unittest.TestCase):
+
+    def test_json(self):
+        message = 'monitored_event?json={"event_name": "ball_started", "event_type": null, ' \
+                  '"event_kwargs": {"event_name": "other"}, "registered_handlers": []}'
+        self.assertEqual(peek_event_name(message), "ball_started")
+
+    def test_query_string(self):
+        message = 'monitored_event?event_type=NoneType:&event_name=player%5Fadded&x=int:1'
+        self.assertEqual(peek_event_name(message), "player_added")
+
+    def test_other_commands(self):
+        self.assertIsNone(peek_event_name('device?json={"type": "switch", "name": "s_start"}'))
+        self.assertIsNone(peek_event_name('mode_start?name=base&priority=int:100'))
+
+
+class TestEventFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.event_filter = EventFilter.from_config([
+            {'events': 'timer_*', 'action': 'drop'},
+            {'events': '*_hit', 'action': 'sample', 'every': 3},
+            {'events': 's_*', 'action': 'rate_limit', 'per_second': 2},
+            {'events': 'broken', 'action': 'explode'},
+            {'events': 'broken', 'action': 'sample', 'every': 0},
+            'garbage',
+        ])
+
+    def test_invalid_rules_are_skipped(self):
+        self.assertEqual(len(self.event_filter.rules), 3)
+        self.assertFalse(EventFilter.from_config("not a list"))
+        self.assertFalse(EventFilter.from_config(None))
+
+    def test_drop(self):
+        self.assertFalse(self.event_filter.allow("timer_ball_save_tick"))
+        self.assertTrue(self.event_filter.allow("ball_started"))
+        self.assertEqual(self.event_filter.suppressed["timer_ball_save_tick"], 1)
+        self.assertNotIn("ball_started", self.event_filter.suppressed)
+
+    def test_sample(self):
+        allowed = [self.event_filter.allow("target_hit") for i in range(7)]
+
+        self.assertEqual(allowed, [True, False, False, True, False, False, True])
+        self.assertEqual(self.event_filter.suppressed["target_hit"], 4)
+
+    def test_rate_limit(self):
+        allowed = [self.event_filter.allow("s_flipper", now=100.1) for i in range(4)]
+        allowed.append(self.event_filter.allow("s_flipper", now=101.2))
+
+        self.assertEqual(allowed, [True, True, False, False, True])
+
+    def test_first_rule_wins(self):
+        self.assertFalse(self.event_filter.allow("timer_hit"))
+        self.assertEqual(self.event_filter.rule_by_name["timer_hit"].action, "drop")
+
+    def test_clear(self):
+        self.event_filter.allow("timer_x")
+        self.event_filter.clear()
+
+        self.assertEqual(sum(self.event_filter.suppressed.values()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
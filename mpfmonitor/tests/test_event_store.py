@@ -0,0 +1,227 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from mpfmonitor.core.events import EventRecord, EventTableModel, parse_filter
+from mpfmonitor.core.event_store import *
+
+
+class TestEventStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp_dir.name, "event_history.sqlite")
+        self.stopper = threading.Event()
+        self.store = EventStore(self.db_file, self.stopper, EventRecord,
+                                page_size=4, cached_pages=2)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def append(self, *names, first_seq=0):
+        self.store.append([EventRecord(name, {"player": i}, first_seq + i)
+                           for i, name in enumerate(names)])
+
+    def wait_for_writer(self):
+        while self.store.committed_seq < self.store.next_seq:
+            self.stopper.wait(0.01)
+
+    def test_read_before_written(self):
+        self.append("a", "b")
+
+        self.assertEqual(self.store.get(1).name, "b")
+        self.assertIsNone(self.store.get(2))
+
+    def test_read_from_disk(self):
+        self.append(*[str(i) for i in range(20)])
+        self.wait_for_writer()
+
+        self.assertEqual(len(self.store), 20)
+        self.assertEqual([self.store.get(seq).name for seq in range(20)],
+                         [str(i) for i in range(20)])
+        self.assertLessEqual(len(self.store.pages), 2)
+
+    def test_repeats_survive(self):
+        self.store.append([EventRecord("tick", {"n": [1, 2]}, 0, 10.0, 12.5, 3)])
+        self.wait_for_writer()
+        self.store.pages.clear()
+
+        record = self.store.load_page(0)[0]
+        self.assertEqual((record.count, record.first_time, record.last_time), (3, 10.0, 12.5))
+        self.assertEqual(record.kwargs, {"n": [1, 2]})
+
+    def test_commit_during_page_load(self):
+        # Stop the writer, it is run by hand right after the page query
+        self.store.queue.put(None)
+        self.store.writer_thread.join()
+        self.append("a", "b", "c", "d")
+
+        store = self.store
+
+        class CommittingDb(object):
+            def __init__(self, db):
+                self.db = db
+
+            def execute(self, *args):
+                rows = self.db.execute(*args).fetchall()
+                store.queue.put(None)
+                store.write_loop()
+                return rows
+
+        self.store.db = CommittingDb(self.store.db)
+        page = self.store.load_page(0)
+        self.store.db = self.store.db.db
+
+        self.assertEqual(self.store.committed_seq, 4)
+        self.assertEqual([page[seq].name for seq in range(4)], ["a", "b", "c", "d"])
+        self.assertEqual([self.store.get(seq).name for seq in range(4)],
+                         ["a", "b", "c", "d"])
+
+    def test_search(self):
+        self.append("ball_started", "mode_started", "ball_ended")
+        self.wait_for_writer()
+        self.append("ball_x", first_seq=3)
+
+        model = EventTableModel(store=self.store)
+        model.set_filter(*parse_filter("ball_"))
+        self.assertEqual(self.store.search("ball_*", [], model._accepts), [0, 2, 3])
+
+        model.set_filter(*parse_filter("player=2"))
+        self.assertEqual(self.store.search(None, model.kwarg_filters, model._accepts), [2])
+
+    def test_seq_at_time(self):
+        self.store.append([EventRecord("a", {}, i, first_time=float(i)) for i in range(10)])
+        self.wait_for_writer()
+        self.store.append([EventRecord("b", {}, 10, first_time=20.0)])
+
+        self.assertEqual(self.store.seq_at_time(3.5), 4)
+        self.assertEqual(self.store.seq_at_time(15.0), 10)
+        self.assertEqual(self.store.seq_at_time(25.0), 11)
+
+    def test_clear(self):
+        self.append("a", "b")
+        self.store.clear(2)
+        self.append("c", first_seq=2)
+        self.wait_for_writer()
+
+        self.assertIsNone(self.store.get(0))
+        self.assertEqual(self.store.get(2).name, "c")
+        self.assertEqual(len(self.store), 1)
+
+    def test_model_keeps_evicted_rows(self):
+        model = EventTableModel(capacity=2, store=self.store)
+        for name in ["a", "b", "c", "d", "e"]:
+            model.add(name, "{}")
+            model.flush()
+
+        self.assertEqual(model.rowCount(), 5)
+        self.assertEqual([model.index(row, 0).data() for row in range(5)],
+                         ["e", "d", "c", "b", "a"])
+
+        model.set_filter("*c*")
+        self.assertEqual(model.rowCount(), 1)
+        self.assertEqual(model.index(0, 0).data(), "c")
+
+    def test_paused_batch_overflows_to_store(self):
+        model = EventTableModel(capacity=2, store=self.store, pending_limit=100)
+        for i in range(10):
+            model.add(str(i), {})
+        model.flush()
+
+        self.assertEqual(model.rowCount(), 10)
+        self.assertEqual(len(model.ring), 2)
+        self.assertEqual([model.index(row, 0).data() for row in range(10)],
+                         [str(i) for i in reversed(range(10))])
+
+    def test_unflushed_overflow_is_spilled(self):
+        # A hidden window gets far more events than it queues
+        model = EventTableModel(capacity=4, store=self.store, pending_limit=10)
+        for i in range(5):
+            model.add(str(i), {})
+        model.flush()
+
+        for i in range(5, 60):
+            model.add(str(i), {})
+
+        self.assertLess(len(model.pending), 10)
+        self.assertEqual(model.rowCount(), 5)  # Nothing shown until the flush
+        self.assertEqual(model.seq_at_time(float('inf')), 5)
+
+        model.flush()
+        self.wait_for_writer()
+
+        self.assertEqual(model.rowCount(), 60)
+        self.assertEqual(self.store.committed_seq, 56)
+        self.assertEqual([model.record(row).name for row in range(60)],
+                         [str(i) for i in reversed(range(60))])
+        self.store.pages.clear()
+        self.assertEqual([self.store.get(seq).name for seq in range(56)],
+                         [str(i) for i in range(56)])
+
+    def test_spilled_events_filtered(self):
+        model = EventTableModel(capacity=4, store=self.store, pending_limit=10)
+        model.set_filter("a*")
+        for i in range(30):
+            model.add("a" if i % 3 == 0 else "b", {})
+        model.flush()
+
+        self.assertEqual([model.record(row).seq for row in range(model.rowCount())],
+                         list(reversed(range(0, 30, 3))))
+
+    def test_spilled_events_by_name(self):
+        model = EventTableModel(capacity=4, store=self.store, pending_limit=10)
+        model.set_sort(by_name=True, descending=False)
+        for i in range(3):
+            model.add("c{}".format(i), {})
+        model.flush()
+
+        for i in range(30):
+            model.add("b{:02d}".format(i), {})
+        self.assertEqual(model.rowCount(), 0)  # The ring went to disk
+
+        model.flush()
+        self.assertEqual([model.record(row).name for row in range(model.rowCount())],
+                         ["b26", "b27", "b28", "b29"])
+        self.assertEqual(self.store.get(3).name, "b00")
+
+    def test_kwarg_filter_same_on_disk(self):
+        values = [True, None, False, 1, "True", None]
+        on_disk = EventTableModel(capacity=len(values), store=self.store)
+        in_memory = EventTableModel(capacity=len(values))
+        for model in (on_disk, in_memory):
+            for value in values:
+                model.add("switch_active", {"debounced": value})
+            model.flush()
+
+        # Push the first ones out of memory onto disk
+        for i in range(len(values)):
+            on_disk.add("other", {})
+        on_disk.flush()
+        self.wait_for_writer()
+        self.assertEqual(on_disk.ring.first_seq, len(values))
+
+        for text, expected in (("True", [4, 0]), ("None", [5, 1]), ("1", [3]), ("F*", [2])):
+            for model in (on_disk, in_memory):
+                model.set_filter("switch*", parse_filter("debounced=" + text)[1])
+                self.assertEqual([model.record(row).seq for row in range(model.rowCount())],
+                                 expected, text)
+
+    def test_model_filters_in_thread(self):
+        model = EventTableModel(capacity=2, store=self.store)
+        model.sync_filter_limit = 0
+        for name in ["ab", "b", "ab", "c", "ab"]:
+            model.add(name, {})
+            model.flush()
+
+        model.set_filter("*a*")
+        while model.is_filtering():
+            model.filter_pass.thread.join()
+            model.flush()
+
+        self.assertEqual([model.record(row).seq for row in range(model.rowCount())], [4, 2, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,11 @@
 import unittest
+import os
+import tempfile
 import threading
 import sys
 from PyQt5.QtTest import QTest
 from PyQt5 import QtCore, QtGui, QtWidgets
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from mpfmonitor.core.events import *
 
 
@@ -15,14 +17,11 @@ class TestableEventNoGUI(EventWindow):
         self.ui = None
         self.model = None
 
-        self.already_hidden = False
-        self.added_index = 0
-
 
 class TestEventWindowFunctions(unittest.TestCase):
 
     def setUp(self):
-        self.event_window = TestableEventNoGUI()
+        self.event_window = TestableEventNoGUI(mpfmon_mock=MagicMock())
 
         self.event_window.ui = MagicMock()
         self.event_window.model = MagicMock()
@@ -33,40 +32,341 @@ class TestEventWindowFunctions(unittest.TestCase):
         self.mock_event_kwargs.pop.return_value(False)
 
     def test_add_event_to_model(self):
-        self.assertEqual(self.event_window.already_hidden, False)
-
         self.event_window.add_event_to_model("event1", None, None, self.mock_event_kwargs, None)
 
-        self.event_window.model.insertRow.assert_called_once()
-        self.assertEqual(self.event_window.already_hidden, True)
-        
+        self.event_window.model.add.assert_called_once_with("event1", self.mock_event_kwargs, None)
+        self.event_window.mpfmon.event_stats.record.assert_called_once_with("event1", handlers=None)
+        self.event_window.mpfmon.frame_scheduler.mark_dirty.assert_called_once_with(
+            self.event_window, 'flush_events', self.event_window.flush_events)
+
+    def test_flush_events(self):
+        self.event_window.flush_events()
+
+        self.event_window.model.flush.assert_called_once()
+        self.event_window.ui.tableView.resizeColumnToContents.assert_called()
+
     def test_filter_text(self):
         string_in = "filter_string_test"
         expected_string_out = "*filter_string_test*"
 
         self.event_window.filter_text(string=string_in)
 
-        self.event_window.filtered_model.setFilterWildcard.assert_called_once_with(expected_string_out)
+        self.event_window.model.set_filter.assert_called_once_with(expected_string_out, [], None)
+
+    def test_filter_text_kwargs(self):
+        self.event_window.filter_text(string="ball player=1")
+
+        pattern, kwarg_filters, time_range = self.event_window.model.set_filter.call_args[0]
+        self.assertEqual(pattern, "*ball*")
+        self.assertEqual([(f.key, f.pattern) for f in kwarg_filters], [("player", "1")])
 
     def test_change_sort_default(self):
         self.event_window.change_sort()
-        self.event_window.filtered_model.sort.assert_called_once_with(2, Qt.DescendingOrder)
+        self.event_window.model.set_sort.assert_called_once_with(by_name=False, descending=True)
 
     def test_change_sort_time_down(self):
         self.event_window.change_sort(1)
-        self.event_window.filtered_model.sort.assert_called_once_with(2, Qt.DescendingOrder)
+        self.event_window.model.set_sort.assert_called_once_with(by_name=False, descending=True)
 
     def test_change_sort_time_up(self):
         self.event_window.change_sort(2)
-        self.event_window.filtered_model.sort.assert_called_once_with(2, Qt.AscendingOrder)
+        self.event_window.model.set_sort.assert_called_once_with(by_name=False, descending=False)
 
     def test_change_sort_name_up(self):
         self.event_window.change_sort(3)
-        self.event_window.filtered_model.sort.assert_called_once_with(0, Qt.AscendingOrder)
+        self.event_window.model.set_sort.assert_called_once_with(by_name=True, descending=False)
 
     def test_change_sort_name_down(self):
         self.event_window.change_sort(4)
-        self.event_window.filtered_model.sort.assert_called_once_with(0, Qt.DescendingOrder)
+        self.event_window.model.set_sort.assert_called_once_with(by_name=True, descending=True)
+
+
+class TestEventRingBuffer(unittest.TestCase):
+
+    def test_append_and_evict(self):
+        ring = EventRingBuffer(3)
+        for name in ["a", "b", "c", "d"]:
+            ring.append(EventRecord(name, ""))
+
+        self.assertEqual(len(ring), 3)
+        self.assertEqual([r.name for r in ring], ["b", "c", "d"])
+        self.assertIsNone(ring.get(0))
+        self.assertEqual(ring.get(3).name, "d")
+
+    def test_copy_range(self):
+        ring = EventRingBuffer(3)
+        for name in ["a", "b", "c", "d", "e"]:
+            ring.append(EventRecord(name, ""))
+
+        self.assertEqual([r.name for r in ring.copy_range(0, 5)], ["c", "d", "e"])
+        self.assertEqual([r.name for r in ring.copy_range(3, 4)], ["d"])
+        self.assertEqual(ring.copy_range(5, 9), [])
+
+    def test_clear_keeps_numbering(self):
+        ring = EventRingBuffer(3)
+        ring.append(EventRecord("a", ""))
+        ring.clear()
+        ring.append(EventRecord("b", ""))
+
+        self.assertEqual(len(ring), 1)
+        self.assertEqual(ring.get(1).name, "b")
+
+
+class TestEventTableModel(unittest.TestCase):
+
+    def setUp(self):
+        self.model = EventTableModel(capacity=4)
+        self.inserts = []
+        self.removes = []
+        self.model.rowsInserted.connect(lambda parent, first, last: self.inserts.append((first, last)))
+        self.model.rowsRemoved.connect(lambda parent, first, last: self.removes.append((first, last)))
+
+    def names(self):
+        return [self.model.index(row, 0).data() for row in range(self.model.rowCount())]
+
+    def add(self, *names):
+        for name in names:
+            self.model.add(name, "{}")
+        self.model.flush()
+
+    def test_batched_insert(self):
+        self.add("a", "b", "c")
+
+        self.assertEqual(self.names(), ["c", "b", "a"])
+        self.assertEqual(self.inserts, [(0, 2)])
+
+    def test_eviction(self):
+        self.add("a", "b", "c")
+        self.add("d", "e")
+
+        self.assertEqual(self.names(), ["e", "d", "c", "b"])
+        self.assertEqual(self.removes, [(2, 2)])
+        self.assertEqual(self.inserts, [(0, 2), (0, 1)])
+
+    def test_batch_larger_than_capacity(self):
+        self.add("a", "b", "c", "d", "e", "f")
+
+        self.assertEqual(self.names(), ["f", "e", "d", "c"])
+
+    def test_ascending(self):
+        self.model.set_sort(by_name=False, descending=False)
+        self.add("a", "b", "c")
+        self.add("d", "e")
+
+        self.assertEqual(self.names(), ["b", "c", "d", "e"])
+        self.assertEqual(self.removes, [(0, 0)])
+
+    def test_filter(self):
+        self.add("ab", "cd", "abc")
+        self.model.set_filter("*ab*")
+
+        self.assertEqual(self.names(), ["abc", "ab"])
+
+        self.add("xab", "zz", "zz")
+        self.assertEqual(self.names(), ["xab", "abc"])
+
+    def test_sort_by_name(self):
+        self.add("b", "c", "a")
+        self.model.set_sort(by_name=True, descending=False)
+
+        self.assertEqual(self.names(), ["a", "b", "c"])
+
+        self.add("bb", "d")
+        self.assertEqual(self.names(), ["a", "bb", "c", "d"])
+
+    def test_sort_keeps_selection(self):
+        self.add("b", "c", "a")
+        selected = QPersistentModelIndex(self.model.index(1, 0))
+        self.assertEqual(selected.data(), "c")
+
+        self.model.set_sort(by_name=True, descending=True)
+
+        self.assertEqual(selected.data(), "c")
+        self.assertEqual(selected.row(), 0)
+
+    def test_pending_is_bounded(self):
+        for i in range(100):
+            self.model.add(str(i), "{}")
+
+        self.assertLess(len(self.model.pending), 2 * self.model.ring.capacity)
+
+    def test_pending_limit(self):
+        model = EventTableModel(capacity=4, pending_limit=10)
+        for i in range(25):
+            model.add(str(i), "{}")
+
+        self.assertLess(len(model.pending), 10)
+        self.assertEqual(model.pending[-1].name, "24")
+
+    def test_clear(self):
+        self.add("a", "b")
+        self.model.clear()
+
+        self.assertEqual(self.model.rowCount(), 0)
+
+    def test_collapse_repeats(self):
+        self.model.set_collapse(True)
+        changes = []
+        self.model.dataChanged.connect(lambda first, last: changes.append(first.row()))
+
+        self.model.add("tick", "{'n': 1}", timestamp=10.0)
+        self.model.add("tick", "{'n': 2}", timestamp=11.0)
+        self.model.flush()
+        self.model.add("tick", "{'n': 3}", timestamp=12.5)
+        self.model.add("ball", "{}", timestamp=13.0)
+        self.model.add("tick", "{'n': 4}", timestamp=14.0)
+        self.model.flush()
+
+        self.assertEqual(self.names(), ["tick", "ball", "tick"])
+        self.assertEqual(self.inserts, [(0, 0), (0, 1)])
+        self.assertEqual(changes, [2])
+
+        record = self.model.record(2)
+        self.assertEqual(record.count, 3)
+        self.assertEqual((record.first_time, record.last_time), (10.0, 12.5))
+        self.assertEqual(record.kwargs, "{'n': 3}")
+        self.assertEqual(self.model.index(2, 2).data(), "3")
+
+    def test_collapse_with_kwarg_filter(self):
+        self.model.set_collapse(True)
+        self.model.set_filter(*parse_filter("player=0"))
+
+        self.model.add("ball_hit", {"player": 0})
+        self.model.add("ball_hit", {"player": 1})
+        self.model.add("ball_hit", {"player": 1})
+        self.model.flush()
+        self.model.add("ball_hit", {"player": 0})
+        self.model.add("ball_hit", {"player": 0})
+        self.model.flush()
+
+        self.assertEqual(self.model.rowCount(), 2)
+        self.assertEqual([self.model.record(row).kwargs for row in range(2)],
+                         [{"player": 0}] * 2)
+        self.assertEqual([self.model.record(row).count for row in range(2)], [2, 1])
+
+        # Unfiltered, the other player's repeats are one row
+        self.model.set_filter(*parse_filter(""))
+        self.assertEqual([self.model.record(row).count for row in range(3)], [2, 2, 1])
+
+    def test_lazy_kwargs(self):
+        self.model.add("ball_started", {"player": 1, "ball": 2})
+        self.model.flush()
+
+        self.assertEqual(self.model.kwargs_cache, {})
+        self.assertEqual(self.model.index(0, 1).data(), "{'player': 1, 'ball': 2}")
+        self.assertIn(0, self.model.kwargs_cache)
+
+    def test_kwargs_cache_is_bounded(self):
+        self.model.kwargs_cache_size = 2
+        self.add("a", "b", "c")
+        for row in range(3):
+            self.model.index(row, 1).data()
+
+        self.assertEqual(len(self.model.kwargs_cache), 2)
+
+    def test_kwargs_filter(self):
+        for player, name in [(1, "ball_started"), (2, "ball_started"), (1, "score")]:
+            self.model.add(name, {"player": player})
+        self.model.flush()
+
+        self.model.set_filter(*parse_filter("player=1"))
+        self.assertEqual(self.names(), ["score", "ball_started"])
+
+        self.model.set_filter(*parse_filter("ball player=1"))
+        self.assertEqual(self.names(), ["ball_started"])
+
+        self.model.set_filter(*parse_filter("missing=*"))
+        self.assertEqual(self.names(), [])
+
+    def add_timed(self, *times):
+        for timestamp in times:
+            self.model.add("t{}".format(timestamp), {}, timestamp=timestamp)
+        self.model.flush()
+
+    def test_time_index(self):
+        self.add_timed(1.0, 2.0, 2.0, 3.5)
+
+        self.assertEqual(self.model.seq_at_time(0.5), 0)
+        self.assertEqual(self.model.seq_at_time(2.0), 1)
+        self.assertEqual(self.model.seq_at_time(2.1), 3)
+        self.assertEqual(self.model.seq_at_time(9.0), 4)
+        self.assertEqual(self.model.seqs_between(2.0, 3.5), range(1, 3))
+        self.assertEqual(self.model.seqs_between(None, 2.0), range(0, 1))
+
+    def test_time_range_filter(self):
+        self.add_timed(1.0, 2.0, 3.0)
+        self.model.set_filter("*", [], (2.0, None))
+        self.assertEqual(self.names(), ["t3.0", "t2.0"])
+
+        self.model.set_filter("*", [], (None, 3.0))
+        self.add_timed(4.0)
+        self.assertEqual(self.names(), ["t2.0", "t1.0"])
+
+    def test_row_at_time(self):
+        self.add_timed(1.0, 2.0, 3.0)
+
+        self.assertEqual(self.model.row_at_time(1.5), 1)
+        self.assertEqual(self.model.row_at_time(9.0), 0)
+
+        self.model.set_filter("*", [], (None, 2.5))
+        self.assertEqual(self.model.row_at_time(1.5), 0)
+
+    def test_delta(self):
+        self.add_timed(1.0, 1.25, 2.0)
+        delta = self.model.headers.index("Δ")
+
+        self.assertEqual(self.model.index(0, delta).data(), "+0.750000")
+        self.assertIsNone(self.model.index(2, delta).data())
+
+        self.model.set_delta_origin(1)
+        self.assertEqual(self.model.index(2, delta).data(), "-0.250000")
+
+    def test_format_time(self):
+        self.assertEqual(format_time(parse_time("12:01:05.250")), "12:01:05.250")
+        self.assertIsNone(parse_time("soon"))
+
+        pattern, kwarg_filters, time_range = parse_filter(">12:00 <12:01:05.250 ball")
+        self.assertEqual(pattern, "*ball*")
+        self.assertEqual(time_range, (parse_time("12:00"), parse_time("12:01:05.250")))
+
+    def finish_filter(self):
+        while self.model.is_filtering():
+            self.model.filter_pass.thread.join()
+            self.model.flush()
+
+    def test_filter_in_thread(self):
+        self.model.sync_filter_limit = 0
+        FilterPass.chunk_size = 1
+        self.addCleanup(setattr, FilterPass, 'chunk_size', 1024)
+
+        self.add("ab", "cd", "abc")
+        self.model.set_filter("*ab*")
+        self.assertTrue(self.model.is_filtering())
+
+        # New events arrive while the filter runs
+        self.model.add("xab", "{}")
+        self.finish_filter()
+
+        self.assertEqual(self.names(), ["xab", "abc", "ab"])
+
+    def test_new_filter_cancels_running_one(self):
+        self.model.sync_filter_limit = 0
+        self.add("ab", "cd", "abc")
+
+        with patch.object(FilterPass, 'start'):  # Keep it "running"
+            self.model.set_filter("*ab*")
+        first_pass = self.model.filter_pass
+
+        self.model.set_filter("*cd*")
+        self.finish_filter()
+
+        self.assertTrue(first_pass.cancelled.is_set())
+        self.assertEqual(self.names(), ["cd"])
+
+    def test_collapse_off(self):
+        self.add("tick", "tick")
+
+        self.assertEqual(self.names(), ["tick", "tick"])
 
 
 app = QApplication(sys.argv)
@@ -77,6 +377,7 @@ class TestEvents(unittest.TestCase):
     def setUpClass(self):
         mock_mpfmon = MagicMock()
         mock_mpfmon.local_settings.value.side_effect = [QPoint(500, 200), QSize(300, 600)]
+        mock_mpfmon.config = {'event_history_disk': False}
 
         self.eventWindow = EventWindow(mock_mpfmon)
 
@@ -93,79 +394,161 @@ class TestEvents(unittest.TestCase):
 
         # Check it's empty
         self.assertEqual(self.eventWindow.model.rowCount(), 0)
-        self.assertEqual(self.eventWindow.filtered_model.rowCount(), 0)
+        self.assertEqual(self.eventWindow.model.rowCount(), 0)
 
     def test_add_to_table(self):
         # Reset table model
         self.eventWindow.attach_model()
-        self.assertEqual(self.eventWindow.filtered_model.rowCount(), 0)
+        self.assertEqual(self.eventWindow.model.rowCount(), 0)
 
         self.eventWindow.add_event_to_model("event1", None, None, self.mock_event_kwargs, None)
+        self.eventWindow.flush_events()
 
         # Check table has 1 row
-        self.assertEqual(self.eventWindow.filtered_model.rowCount(), 1)
+        self.assertEqual(self.eventWindow.model.rowCount(), 1)
 
         self.eventWindow.add_event_to_model("event2", None, None, self.mock_event_kwargs, None)
         self.eventWindow.add_event_to_model("event3", None, None, self.mock_event_kwargs, None)
+        self.eventWindow.flush_events()
 
         # Check table has 3 rows
-        self.assertEqual(self.eventWindow.filtered_model.rowCount(), 3)
+        self.assertEqual(self.eventWindow.model.rowCount(), 3)
+
+    def test_collapse_repeats(self):
+        # Reset table model
+        self.eventWindow.attach_model()
+        self.assertTrue(self.eventWindow.ui.tableView.isColumnHidden(2))
+
+        self.eventWindow.ui.collapseCheckBox.setChecked(True)
+        self.assertFalse(self.eventWindow.ui.tableView.isColumnHidden(2))
+
+        for e in ["timer_tick", "timer_tick", "timer_tick"]:
+            self.eventWindow.add_event_to_model(e, None, None, self.mock_event_kwargs, None)
+        self.eventWindow.flush_events()
+
+        self.assertEqual(self.eventWindow.model.rowCount(), 1)
+        self.assertEqual(self.eventWindow.model.index(0, 2).data(), "3")
+
+        self.eventWindow.ui.collapseCheckBox.setChecked(False)
+
+    def test_jump_to_time(self):
+        # Reset table model
+        self.eventWindow.attach_model()
+
+        for e, received in [("a", parse_time("10:00")), ("b", parse_time("10:05")),
+                            ("c", parse_time("10:10"))]:
+            self.eventWindow.add_event_to_model(e, None, None, {}, None, received)
+        self.eventWindow.flush_events()
+
+        self.eventWindow.ui.timeLineEdit.setText("10:04")
+        self.eventWindow.jump_to_time()
+
+        self.assertEqual(self.eventWindow.ui.tableView.currentIndex().data(), "b")
+
+    def test_pause(self):
+        self.eventWindow.ui.pauseCheckBox.setChecked(True)
+        self.assertTrue(self.eventWindow.paused)
+
+        self.eventWindow.ui.pauseCheckBox.setChecked(False)
+        self.assertFalse(self.eventWindow.paused)
+
+    def test_long_pause_keeps_every_event(self):
+        config = self.eventWindow.mpfmon.config
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.eventWindow.mpfmon.event_history_file = os.path.join(tmp_dir, "events.sqlite")
+            self.eventWindow.mpfmon.thread_stopper = threading.Event()
+            self.eventWindow.mpfmon.config = {'event_history_size': 5, 'event_pause_buffer': 20}
+            try:
+                self.eventWindow.attach_model()
+                self.eventWindow.ui.pauseCheckBox.setChecked(True)
+
+                for i in range(100):
+                    self.eventWindow.add_event_to_model("e{}".format(i), None, None, {}, None)
+                self.assertLess(len(self.eventWindow.model.pending), 20)
+                self.assertEqual(self.eventWindow.model.rowCount(), 0)
+
+                self.eventWindow.ui.pauseCheckBox.setChecked(False)
+                self.eventWindow.flush_events()
+
+                model = self.eventWindow.model
+                self.assertEqual([model.record(row).name for row in range(model.rowCount())],
+                                 ["e{}".format(i) for i in reversed(range(100))])
+            finally:
+                self.eventWindow.close_store()
+                self.eventWindow.mpfmon.config = config
+                self.eventWindow.attach_model()
+
+    def test_kwargs_tree(self):
+        # Reset table model
+        self.eventWindow.attach_model()
+
+        self.eventWindow.add_event_to_model("player_added", None, None,
+                                            {"player": {"number": 1}, "num": 1}, None)
+        self.eventWindow.flush_events()
+        self.eventWindow.ui.tableView.setCurrentIndex(self.eventWindow.model.index(0, 0))
+
+        tree = self.eventWindow.ui.kwargsTree
+        self.assertEqual(tree.topLevelItemCount(), 2)
+        self.assertEqual(tree.topLevelItem(0).child(0).text(1), "1")
+        self.assertEqual(tree.topLevelItem(1).text(1), "1")
 
     def test_sort(self):
         # Reset table model
         self.eventWindow.attach_model()
-        self.assertEqual(self.eventWindow.filtered_model.rowCount(), 0)
+        self.assertEqual(self.eventWindow.model.rowCount(), 0)
 
         event_list = ["event_a", "event_b", "event_c"]
 
         for e in event_list:
             self.eventWindow.add_event_to_model(e, None, None, self.mock_event_kwargs, None)
+        self.eventWindow.flush_events()
 
         # Default is Received up
-        top_row_text = self.eventWindow.filtered_model.index(0, 0).data()
+        top_row_text = self.eventWindow.model.index(0, 0).data()
         self.assertEqual(top_row_text, event_list[-1])
 
         # Sort Received up
         self.eventWindow.ui.sortComboBox.setCurrentIndex(1)
-        top_row_text = self.eventWindow.filtered_model.index(0, 0).data()
+        top_row_text = self.eventWindow.model.index(0, 0).data()
         self.assertEqual(top_row_text, event_list[-1])
 
         # Sort Received down
         self.eventWindow.ui.sortComboBox.setCurrentIndex(2)
-        top_row_text = self.eventWindow.filtered_model.index(0, 0).data()
+        top_row_text = self.eventWindow.model.index(0, 0).data()
         self.assertEqual(top_row_text, event_list[0])
 
         # Sort Name up
         self.eventWindow.ui.sortComboBox.setCurrentIndex(3)
-        top_row_text = self.eventWindow.filtered_model.index(0, 0).data()
+        top_row_text = self.eventWindow.model.index(0, 0).data()
         self.assertEqual(top_row_text, event_list[0])
 
         # Sort Name down
         self.eventWindow.ui.sortComboBox.setCurrentIndex(4)
-        top_row_text = self.eventWindow.filtered_model.index(0, 0).data()
+        top_row_text = self.eventWindow.model.index(0, 0).data()
         self.assertEqual(top_row_text, event_list[-1])
 
     def test_filter(self):
         # Reset table model
         self.eventWindow.attach_model()
-        self.assertEqual(self.eventWindow.filtered_model.rowCount(), 0)
+        self.assertEqual(self.eventWindow.model.rowCount(), 0)
 
         event_list = ["abc", "def", "ghi", "ghijkl"]
 
         for e in event_list:
             self.eventWindow.add_event_to_model(e, None, None, self.mock_event_kwargs, None)
+        self.eventWindow.flush_events()
 
         # Make sure filter is empty and check none are filtered
         self.eventWindow.ui.filterLineEdit.setText("")
-        self.assertEqual(self.eventWindow.filtered_model.rowCount(), len(event_list))
+        self.assertEqual(self.eventWindow.model.rowCount(), len(event_list))
 
         # Set the filter to a unique string and check it returns 1 match
         self.eventWindow.ui.filterLineEdit.setText(event_list[0])
-        self.assertEqual(self.eventWindow.filtered_model.rowCount(), 1)
+        self.assertEqual(self.eventWindow.model.rowCount(), 1)
 
         # Set the filter to a non-unique string and check it returns 2 matches
         self.eventWindow.ui.filterLineEdit.setText(event_list[2])
-        self.assertEqual(self.eventWindow.filtered_model.rowCount(), 2)
+        self.assertEqual(self.eventWindow.model.rowCount(), 2)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,103 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import MagicMock
+
+from mpfmonitor.core.heatmap import *
+
+app = QApplication(sys.argv)
+
+
+@unittest.skipIf(numpy is None, "heatmaps need numpy")
+class TestHeatmap(unittest.TestCase):
+
+    def setUp(self):
+        self.heatmap = Heatmap('switch', width=20, height=40, radius=2)
+        self.heatmap.set_positions({"s_left": (.25, .5), "s_dead": (.75, .5)})
+
+    def test_switch_activations(self):
+        for state in [0, 1, 1, 0, 1, 0]:
+            self.heatmap.record("s_left", {"state": state, "recycle_jitter_count": 0})
+
+        self.assertEqual(self.heatmap.totals["s_left"], 2)
+        self.assertEqual(self.heatmap.grid[20, 5], 2)
+        self.assertEqual(self.heatmap.grid[20, 15], 0)
+        self.assertEqual(self.heatmap.ranking(), [("s_left", 2), ("s_dead", 0)])
+
+    def test_light_on_time(self):
+        heatmap = Heatmap('light', width=20, height=40, radius=2)
+        heatmap.set_positions({"l_ball_save": (.5, .5)})
+
+        heatmap.record("l_ball_save", {"color": [255, 0, 0]}, 10.0)
+        heatmap.record("l_ball_save", {"color": [0, 255, 0]}, 11.0)
+        heatmap.record("l_ball_save", {"color": [0, 0, 0]}, 12.5)
+        heatmap.record("l_ball_save", {"color": [0, 0, 255]}, 20.0)
+
+        self.assertEqual(heatmap.totals["l_ball_save"], 2.5)
+        self.assertEqual(heatmap.values(21.0)[20, 10], 3.5)
+
+        heatmap.finish(22.0)
+        self.assertEqual(heatmap.totals["l_ball_save"], 4.5)
+
+    def test_moved_device(self):
+        self.heatmap.record("s_left", {"state": 1})
+        self.heatmap.set_positions({"s_left": (.75, .25)})
+
+        self.assertEqual(self.heatmap.grid[20, 5], 0)
+        self.assertEqual(self.heatmap.grid[10, 15], 1)
+
+    def test_image(self):
+        self.heatmap.record("s_left", {"state": 1})
+        image = self.heatmap.image()
+
+        self.assertEqual((image.width(), image.height()), (20, 40))
+        self.assertEqual(qAlpha(image.pixel(15, 20)), 0)
+        self.assertGreater(qAlpha(image.pixel(5, 20)), 0)
+
+    def test_from_capture(self):
+        with tempfile.TemporaryDirectory() as path:
+            capture_file = os.path.join(path, "cache.txt")
+            with open(capture_file, "w") as f:
+                for state in [1, 0, 1]:
+                    f.write('100,device?json={"type": "switch", "name": "s_left", '
+                            '"changes": false, "state": {"state": %d}}\n' % state)
+                f.write('100,not a message\n')
+
+            config = {"switch": {"s_left": {"x": .25, "y": .5}}}
+            heatmap = heatmap_from_capture(capture_file, config, 'switch', 20, 40)
+
+            self.assertEqual(heatmap.ranking(), [("s_left", 2)])
+
+            output = os.path.join(path, "heatmap.png")
+            background = QImage(40, 80, QImage.Format_RGB32)
+            background.fill(Qt.black)
+            self.assertTrue(render_heatmap(heatmap, background).save(output))
+            self.assertEqual(QImage(output).size(), QSize(40, 80))
+
+
+@unittest.skipIf(numpy is None, "heatmaps need numpy")
+class TestHeatmapOverlay(unittest.TestCase):
+
+    def test_refresh(self):
+        mpfmon = MagicMock()
+        mpfmon.config = {"switch": {"s_left": {"x": .5, "y": .5}}}
+        playfield = QGraphicsPixmapItem(QPixmap(100, 200))
+        overlay = HeatmapOverlay(mpfmon, playfield)
+
+        overlay.record('switch', "s_left", {"state": 1})
+        overlay.record('coil', "c_flipper", {"state": 1})
+        self.assertIsNone(overlay.image)
+
+        overlay.show_heatmap('switch')
+        self.assertTrue(overlay.isVisible())
+        self.assertEqual(overlay.image.size(), QSize(128, 256))
+        self.assertGreater(qAlpha(overlay.image.pixel(64, 128)), 0)
+
+        overlay.show_heatmap(None)
+        self.assertFalse(overlay.isVisible())
+        self.assertFalse(overlay.refresh_timer.isActive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from unittest.mock import patch
+
+from mpfmonitor.core.history import *
+
+
+class TestStateToValue(unittest.TestCase):
+
+    def test_light(self):
+        self.assertEqual(state_to_value({'color': [10, 200, 30]}), 200.0)
+
+    def test_switch(self):
+        self.assertEqual(state_to_value({'state': 1, 'recycle_jitter_count': 0}), 1.0)
+
+    def test_ball_device(self):
+        self.assertEqual(state_to_value({'balls': 3, 'state': 'idle'}), 3.0)
+
+    def test_unknown(self):
+        self.assertEqual(state_to_value({'state': 'idle'}), 0.0)
+        self.assertEqual(state_to_value(None), 0.0)
+
+
+class TestStateRingBuffer(unittest.TestCase):
+
+    def test_append_and_wrap(self):
+        buffer = StateRingBuffer(4)
+        for i in range(6):
+            buffer.append(float(i), float(i * 10))
+
+        times, values = buffer.samples()
+
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(list(times), [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(list(values), [20.0, 30.0, 40.0, 50.0])
+
+    def test_resize_keeps_newest(self):
+        buffer = StateRingBuffer(4)
+        for i in range(6):
+            buffer.append(float(i), float(i))
+
+        buffer.resize(2)
+        times, values = buffer.samples()
+
+        self.assertEqual(list(times), [4.0, 5.0])
+        buffer.append(6.0, 6.0)
+        self.assertEqual(list(buffer.samples()[1]), [5.0, 6.0])
+
+
+class TestDeviceHistory(unittest.TestCase):
+
+    def test_global_cap(self):
+        history = DeviceHistory(max_samples=1000, per_device=500)
+        history.min_capacity = 1
+
+        for i in range(10):
+            history.record('switch', 's{}'.format(i), {'state': 1}, timestamp=i)
+
+        self.assertLessEqual(sum(b.capacity for b in history.buffers.values()), 1000)
+        self.assertEqual(len(history.get('switch', 's0')), 1)
+        self.assertIsNone(history.get('switch', 'missing'))
+
+    def test_many_devices(self):
+        history = DeviceHistory(max_samples=500000, per_device=10000)
+        resizes = []
+        resize = StateRingBuffer.resize
+
+        def counted_resize(buffer, capacity):
+            resizes.append(capacity)
+            resize(buffer, capacity)
+
+        with patch.object(StateRingBuffer, 'resize', counted_resize):
+            for i in range(600):
+                history.record('light', 'l{}'.format(i), {'color': [255, 0, 0]}, timestamp=i)
+
+        self.assertLessEqual(sum(b.capacity for b in history.buffers.values()), 500000)
+        self.assertEqual(set(resizes), {5000, 2500, 1250, 625})
+        self.assertLess(len(resizes), 4 * 600)
+        self.assertEqual(len(history.get('light', 'l0')), 1)
+
+
+class TestDownsample(unittest.TestCase):
+
+    def test_short_series_untouched(self):
+        times, values = downsample([0, 1, 2], [5, 6, 7], 10)
+        self.assertEqual(values, [5, 6, 7])
+
+    def test_keeps_spikes(self):
+        count = 100000
+        times = array('d', range(count))
+        values = array('d', [0.0] * count)
+        values[54321] = 1.0
+
+        out_times, out_values = downsample(times, values, 200)
+
+        self.assertLessEqual(len(out_values), 200)
+        self.assertIn(1.0, out_values)
+        self.assertEqual(out_times, sorted(out_times))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,6 +11,7 @@ class TestableInspectorNoGUI(InspectorWindow):
 
         # super().__init__()
         self.ui = None
+        self.selected_pf_widgets = []
 
         # Call logger=True if "RuntimeError: super-class __init__()" starts failing tests.
         if logger:
@@ -210,6 +211,67 @@ class InspectorDeviceShape(unittest.TestCase):
         inspector.last_pf_widget.set_shape.assert_called_once_with(shape=shape)
         inspector.last_pf_widget.update_pos.assert_called_once_with(save=True)
 
+    def test_resize_all_devices_of_type(self):
+        mock_mpfmon = MagicMock()
+        inspector = TestableInspectorNoGUI(mpfmon_mock=mock_mpfmon)
+
+        switch = MagicMock()
+        mock_mpfmon.widget_registry.widgets.return_value = [switch]
+        inspector.resize_all_devices('switch')
+
+        mock_mpfmon.widget_registry.widgets.assert_called_once_with('switch')
+        switch.resize_to_default.assert_called_once()
+
+
+class InspectorSelection(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_mpfmon = MagicMock()
+        self.inspector = TestableInspectorNoGUI(mpfmon_mock=self.mock_mpfmon)
+        self.inspector.ui = MagicMock()
+        self.pf_widgets = [MagicMock(angle=0, size=0.07), MagicMock(angle=0, size=0.05)]
+
+    def test_select_applies_to_all(self):
+        self.inspector.select_pf_widgets(self.pf_widgets)
+
+        self.assertIs(self.inspector.last_pf_widget, self.pf_widgets[0])
+        self.assertEqual(self.inspector.selected_pf_widgets, self.pf_widgets)
+        self.mock_mpfmon.view.show_selection.assert_called_with(self.pf_widgets)
+
+        self.inspector.update_last_device(new_size=0.1, rotation=90, save=True)
+        for pf_widget in self.pf_widgets:
+            pf_widget.set_size.assert_called_once_with(0.1)
+            pf_widget.set_rotation.assert_called_once_with(90)
+            pf_widget.update_pos.assert_called_once_with(save=True)
+
+    def test_click_ends_selection(self):
+        self.inspector.select_pf_widgets(self.pf_widgets)
+        self.inspector.update_last_selected(self.pf_widgets[1])
+
+        self.assertEqual(self.inspector.selected_pf_widgets, [])
+        self.inspector.update_last_device(rotation=90, save=False)
+        self.pf_widgets[0].set_rotation.assert_not_called()
+        self.pf_widgets[1].set_rotation.assert_called_once_with(90)
+
+    def test_empty_selection(self):
+        self.inspector.select_pf_widgets(self.pf_widgets)
+        self.inspector.select_pf_widgets([])
+
+        self.assertIsNone(self.inspector.last_pf_widget)
+        self.assertEqual(self.inspector.selected_pf_widgets, [])
+        self.mock_mpfmon.view.show_selection.assert_called_with([])
+
+    def test_reset_type_sizes(self):
+        self.inspector.ui.device_type_combo_box.currentIndex.return_value = 2
+        switch = MagicMock()
+        self.mock_mpfmon.widget_registry.widgets.return_value = [switch]
+
+        self.inspector.reset_type_sizes()
+
+        self.mock_mpfmon.widget_registry.widgets.assert_called_once_with('switch')
+        switch.resize_to_default.assert_called_once_with(force=True)
+        self.mock_mpfmon.save_config.assert_called_once()
+
 
 if __name__ == '__main__':
     unittest.main()
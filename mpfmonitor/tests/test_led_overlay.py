@@ -0,0 +1,95 @@
+import unittest
+import sys
+from unittest.mock import MagicMock
+
+from mpfmonitor.core.led_overlay import *
+from mpfmonitor.core.playfield import PfWidget, Shape
+
+app = QApplication(sys.argv)
+
+
+@unittest.skipIf(numpy is None, "the LED overlay needs numpy")
+class TestLedOverlay(unittest.TestCase):
+
+    def setUp(self):
+        self.mpfmon = MagicMock()
+        self.mpfmon.scene = QGraphicsScene()
+        self.mpfmon.pf = QGraphicsPixmapItem(QPixmap(400, 800))
+        self.mpfmon.scene.addItem(self.mpfmon.pf)
+        self.mpfmon.config = dict()
+        self.mpfmon.pf_device_size = .02
+        self.mpfmon.led_overlay = self.overlay = LedOverlay(self.mpfmon, self.mpfmon.pf)
+
+    def create_widget(self, name, x, y, device_type='light', color=(0, 0, 0)):
+        device = MagicMock()
+        device.set_change_callback.return_value = None
+        device.data.return_value = {'color': list(color), 'state': 0}
+        widget = PfWidget(self.mpfmon, device, device_type, name, x, y, save=False)
+        self.mpfmon.scene.addItem(widget)
+        return widget
+
+    def pixel(self, x, y):
+        scale = self.overlay.image.width() / self.overlay.rect.width()
+        return self.overlay.image.pixel(int(x * scale), int(y * scale))
+
+    def test_takes_round_lights(self):
+        light = self.create_widget("l_round", 100, 100)
+        switch = self.create_widget("s_left", 200, 100, device_type='switch')
+
+        self.assertIs(light.overlay, self.overlay)
+        self.assertTrue(light.flags() & QGraphicsItem.ItemHasNoContents)
+        self.assertIsNone(switch.overlay)
+        self.assertEqual(self.overlay.widgets, [light])
+
+        # Not round any more, the widget draws itself again
+        light.set_shape(Shape.ARROW)
+        light.update_pos(save=False)
+        self.assertIsNone(light.overlay)
+        self.assertFalse(light.flags() & QGraphicsItem.ItemHasNoContents)
+        self.assertEqual(self.overlay.widgets, [])
+
+    def test_edge_lights_are_clipped(self):
+        corner = self.create_widget("l_corner", 3, 3, color=(0, 0, 255))
+        edge = self.create_widget("l_edge", 399, 400, color=(0, 255, 0))
+
+        self.overlay.render()
+        self.assertEqual(self.overlay.widgets, [corner, edge])
+        self.assertEqual(self.pixel(3, 3), 0xff0000ff)
+        self.assertEqual(self.pixel(399, 400), 0xff00ff00)
+
+    def test_render(self):
+        first = self.create_widget("l_first", 100, 100, color=(255, 0, 0))
+        second = self.create_widget("l_second", 300, 600)
+
+        self.overlay.render()
+        self.assertEqual(self.pixel(100, 100), 0xffff0000)
+        self.assertEqual(self.pixel(300, 600), 0xff000000)
+        self.assertEqual(self.pixel(200, 400), 0)
+
+        # Colors are gamma corrected
+        second.widget.data.return_value = {'color': [0, 128, 0]}
+        second.notify()
+        self.overlay.render()
+        self.assertEqual(self.pixel(300, 600), 0xff00cb00)
+
+        self.mpfmon.frame_scheduler.mark_dirty.assert_called_with(
+            self.mpfmon.view, self.overlay, self.overlay.render)
+
+    def test_move_and_remove(self):
+        light = self.create_widget("l_moving", 100, 100, color=(255, 255, 255))
+        self.overlay.render()
+
+        light.setPos(200, 200)
+        light.update_pos(save=False)
+        self.overlay.render()
+        self.assertEqual(self.pixel(100, 100), 0)
+        self.assertEqual(self.pixel(200, 200), 0xffffffff)
+
+        self.overlay.remove(light)
+        self.overlay.render()
+        self.assertEqual(self.pixel(200, 200), 0)
+        self.assertIsNone(light.overlay)
+
+
+if __name__ == '__main__':
+    unittest.main()
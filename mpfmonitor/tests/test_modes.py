@@ -13,12 +13,14 @@ class TestableModeNoGUI(ModeWindow):
 
         self.ui = None
         self.model = None
+        self.rows = dict()
+        self.timeline = ModeTimeline()
 
 
 class TestModeWindowFunctions(unittest.TestCase):
 
     def setUp(self):
-        self.mode_window = TestableModeNoGUI()
+        self.mode_window = TestableModeNoGUI(MagicMock())
 
         self.mode_window.ui = MagicMock()
         self.mode_window.model = MagicMock()
@@ -34,17 +36,13 @@ class TestModeWindowFunctions(unittest.TestCase):
 
         self.mode_window.process_mode_update(running_modes=modes_in)
 
-        self.mode_window.model.clear.assert_called_once()
+        self.mode_window.model.clear.assert_not_called()
+        self.assertEqual(self.mode_window.model.appendRow.call_count, len(modes_in))
 
-        # for mode in modes_in:
-        #     mode_name = QStandardItem(mode[0])
-        #     mode_priority = QStandardItem(str(mode[1]))
-        #     mode_priority_padded = QStandardItem(str(mode[1]).zfill(10))
-        #
-        #     self.mode_window.model.insertRow.assert_called_with(0, [mode_name, mode_priority, mode_priority_padded])
-
-        # For now, just test it's called as many times as there are modes.
-        self.assertEqual(self.mode_window.model.insertRow.call_count, len(modes_in))
+        # Nothing changed, nothing is touched
+        self.mode_window.process_mode_update(running_modes=modes_in)
+        self.assertEqual(self.mode_window.model.appendRow.call_count, len(modes_in))
+        self.mode_window.model.removeRow.assert_not_called()
 
     def test_filter_text(self):
         string_in = "filter_string_test"
@@ -56,15 +54,18 @@ class TestModeWindowFunctions(unittest.TestCase):
 
     def test_change_sort_default(self):
         self.mode_window.change_sort()
-        self.mode_window.filtered_model.sort.assert_called_once_with(2, Qt.DescendingOrder)
+        self.mode_window.filtered_model.setSortRole.assert_called_once_with(ModeWindow.PriorityRole)
+        self.mode_window.filtered_model.sort.assert_called_once_with(0, Qt.DescendingOrder)
 
     def test_change_sort_time_down(self):
         self.mode_window.change_sort(1)
-        self.mode_window.filtered_model.sort.assert_called_once_with(2, Qt.DescendingOrder)
+        self.mode_window.filtered_model.setSortRole.assert_called_once_with(ModeWindow.PriorityRole)
+        self.mode_window.filtered_model.sort.assert_called_once_with(0, Qt.DescendingOrder)
 
     def test_change_sort_time_up(self):
         self.mode_window.change_sort(2)
-        self.mode_window.filtered_model.sort.assert_called_once_with(2, Qt.AscendingOrder)
+        self.mode_window.filtered_model.setSortRole.assert_called_once_with(ModeWindow.PriorityRole)
+        self.mode_window.filtered_model.sort.assert_called_once_with(0, Qt.AscendingOrder)
 
     def test_change_sort_name_up(self):
         self.mode_window.change_sort(3)
@@ -155,6 +156,30 @@ class TestModeWindowGUI(unittest.TestCase):
         top_row_text = self.mode_window.filtered_model.index(0, 0).data()
         self.assertEqual(top_row_text, modes_in[-1][0])
 
+    def test_diff_update(self):
+        # Reset table model
+        self.mode_window.attach_model()
+
+        self.mode_window.process_mode_update([["base", 100], ["attract", 10]])
+        base = self.mode_window.rows["base"][0]
+        self.mode_window.ui.tableView.setCurrentIndex(
+            self.mode_window.filtered_model.mapFromSource(base.index()))
+
+        self.mode_window.process_mode_update([["base", 100], ["skillshot", 1000]])
+
+        self.assertIs(self.mode_window.rows["base"][0], base)
+        self.assertEqual(self.mode_window.ui.tableView.currentIndex().data(), "base")
+        self.assertEqual([self.mode_window.filtered_model.index(row, 0).data() for row in range(2)],
+                         ["skillshot", "base"])
+
+        # Reprioritized mode moves up
+        self.mode_window.process_mode_update([["base", 2000], ["skillshot", 1000]])
+        self.assertEqual(self.mode_window.filtered_model.index(0, 0).data(), "base")
+        self.assertEqual(self.mode_window.filtered_model.index(0, 1).data(), "2000")
+
+        self.mode_window.clear()
+        self.assertEqual(self.mode_window.filtered_model.rowCount(), 0)
+
     def test_filter(self):
         # Reset table model
         self.mode_window.attach_model()
@@ -1,5 +1,7 @@
 import unittest
+import sys
 from mpfmonitor.core.playfield import *
+from mpfmonitor.core.widget_registry import WidgetRegistry
 from unittest.mock import MagicMock
 
 class TestablePfWidgetNonDrawn(PfWidget):
@@ -22,7 +24,7 @@ class TestablePfWidgetNonDrawn(PfWidget):
         self.move_in_progress = True
         self.device_type = device_type
         self.set_size(size=size)
-        self.shape = shape
+        self.widget_shape = shape
         self.angle = rotation
 
         self.setToolTip('{}: {}'.format(self.device_type, self.name))
@@ -52,7 +54,7 @@ class TestPfWidgetParameters(unittest.TestCase):
         shape_to_be_set = Shape.TRIANGLE
         self.widget.set_shape(shape_to_be_set)
 
-        self.assertEqual(self.widget.shape, shape_to_be_set)
+        self.assertEqual(self.widget.widget_shape, shape_to_be_set)
 
     def test_shape_set_invalid(self):
         widget = TestablePfWidgetNonDrawn()
@@ -60,7 +62,7 @@ class TestPfWidgetParameters(unittest.TestCase):
         shape_to_be_set = "Not_A_Shape"
         self.widget.set_shape(shape_to_be_set)
 
-        self.assertEqual(self.widget.shape, Shape.DEFAULT)
+        self.assertEqual(self.widget.widget_shape, Shape.DEFAULT)
 
     def test_rotation_set_valid(self):
         rotation_to_be_set = 42
@@ -164,6 +166,26 @@ class TestPfWidgetColorFuncs(unittest.TestCase):
 
         self.assertEqual(color_out, expected_color_out, 'Gamma does not match expected value')
 
+    def test_gamma_table(self):
+        self.assertEqual(gamma_table()[128], 203)
+        self.assertEqual(gamma_table(gamma=1, scale=1), list(range(256)))
+
+        PfWidget.set_gamma(1, 1)
+        try:
+            self.assertEqual(self.widget.color_gamma([0, 128, 300]), [0, 128, 255])
+        finally:
+            PfWidget.set_gamma()
+
+    def test_brush_cache(self):
+        mock_widget = MagicMock()
+        mock_widget.data.return_value = {'color': [10, 20, 30]}
+
+        brush = self.widget.set_colored_brush(device_type='light', widget=mock_widget)
+        self.assertIs(self.widget.set_colored_brush(device_type='light', widget=mock_widget), brush)
+
+        PfWidget.set_gamma()
+        self.assertIsNot(self.widget.set_colored_brush(device_type='light', widget=mock_widget), brush)
+
     def test_colored_brush_light(self):
         device_type = 'light'
         mock_widget = MagicMock()
@@ -221,7 +243,145 @@ class TestPfWidgetGetAndDestroy(unittest.TestCase):
         self.widget.mpfmon.config[device_type].pop.assert_called_once_with(name)
         self.widget.mpfmon.save_config.assert_called_once()
 
+    def test_notify_schedules_update(self):
+        self.widget._visual_key = None
+        self.widget.overlay = None
+        self.widget.device_type = 'switch'
+        self.widget.widget = MagicMock()
+        self.widget.widget.data.return_value = {'state': 1, 'recycle_jitter_count': 0}
+
+        self.widget.notify()
+        self.widget.mpfmon.view.mark_widget_dirty.assert_called_once_with(self.widget)
+
+        # Same look, no repaint
+        self.widget.widget.data.return_value = {'state': 1, 'recycle_jitter_count': 1}
+        self.widget.notify()
+        self.widget.mpfmon.view.mark_widget_dirty.assert_called_once_with(self.widget)
+
+        self.widget.widget.data.return_value = {'state': 0, 'recycle_jitter_count': 1}
+        self.widget.notify()
+        self.assertEqual(self.widget.mpfmon.view.mark_widget_dirty.call_count, 2)
+
+    def test_light_visual_key(self):
+        self.widget.device_type = 'light'
+        self.widget.widget = MagicMock()
+
+        # Both correct to the same color
+        self.widget.widget.data.return_value = {'color': [255, 0, 0]}
+        bright = self.widget.visual_key()
+        self.widget.widget.data.return_value = {'color': [250, 0, 0]}
+        self.assertEqual(self.widget.visual_key(), bright)
+
     def test_send_to_inspector_window(self):
         self.widget.send_to_inspector_window()
         self.widget.mpfmon.inspector_window_last_selected_cb.assert_called_once_with(pf_widget=self.widget)
 
+
+
+app = QApplication(sys.argv)
+
+
+class TestPfView(unittest.TestCase):
+
+    def test_updates_are_merged(self):
+        mpfmon = MagicMock()
+        view = PfView(QGraphicsScene(), mpfmon)
+        first = MagicMock()
+        second = MagicMock()
+
+        view.mark_widget_dirty(first)
+        view.mark_widget_dirty(second)
+        view.mark_widget_dirty(first)
+        view.discard_widget(second)
+
+        mpfmon.frame_scheduler.mark_dirty.assert_called_with(view, 'widgets', view.update_widgets)
+        view.update_widgets()
+
+        first.update.assert_called_once()
+        second.update.assert_not_called()
+        self.assertEqual(view.dirty_widgets, set())
+
+    def test_rubber_band_selects(self):
+        mpfmon = MagicMock()
+        mpfmon.inspector_window.selected_device_type.return_value = 'light'
+        view = PfView(QGraphicsScene(), mpfmon)
+        view.set_selecting(enabled=True)
+        self.assertEqual(view.dragMode(), QGraphicsView.RubberBandDrag)
+
+        view.rubber_band_changed(QRect(0, 0, 10, 10), QPointF(50, 60), QPointF(10, 20))
+        view.rubber_band_changed(QRect(), QPointF(), QPointF())
+
+        mpfmon.widget_registry.in_rect.assert_called_once_with(QRectF(10, 20, 40, 40), 'light')
+        mpfmon.inspector_window.select_pf_widgets.assert_called_once_with(
+            mpfmon.widget_registry.in_rect.return_value)
+
+        # A release without a band selects nothing
+        view.rubber_band_changed(QRect(), QPointF(), QPointF())
+        mpfmon.inspector_window.select_pf_widgets.assert_called_once()
+
+        view.set_selecting(enabled=False)
+        self.assertEqual(view.dragMode(), QGraphicsView.NoDrag)
+
+
+class TestPfWidgetGeometry(unittest.TestCase):
+
+    def setUp(self):
+        self.mpfmon = MagicMock()
+        self.mpfmon.scene = QGraphicsScene(0, 0, 1000, 1000)
+        self.mpfmon.config = dict()
+        self.mpfmon.pf_device_size = .02
+        self.mpfmon.led_overlay = None
+
+    def create_widget(self, name, shape=Shape.DEFAULT, rotation=0):
+        device = MagicMock()
+        device.set_change_callback.return_value = None
+        return PfWidget(self.mpfmon, device, 'light', name, 100, 100,
+                        rotation=rotation, shape=shape, save=False)
+
+    def test_path_is_shared(self):
+        first = self.create_widget("l_first")
+        second = self.create_widget("l_second", shape=Shape.CIRCLE)
+
+        self.assertIs(first.path(), second.path())
+
+        second.set_shape(Shape.SQUARE)
+        self.assertIsNot(first.path(), second.path())
+        self.assertEqual(second.path().boundingRect(), QRectF(-10, -10, 20, 20))
+
+    def test_bounding_rect_covers_rotated_shape(self):
+        widget = self.create_widget("l_flipper", shape=Shape.FLIPPER)
+        self.assertTrue(widget.boundingRect().contains(widget.path().boundingRect()))
+
+        widget.set_rotation(90)
+        widget.update_pos(save=False)
+
+        rotated = QTransform().rotate(90).mapRect(widget.path().boundingRect())
+        self.assertTrue(widget.boundingRect().contains(rotated))
+
+    def test_shape_is_rotated_outline(self):
+        widget = self.create_widget("l_triangle", shape=Shape.TRIANGLE)
+
+        # The corners of the bounding box are outside the triangle
+        corner = widget.boundingRect().topLeft() + QPointF(1, 1)
+        self.assertFalse(widget.contains(corner))
+        self.assertTrue(widget.contains(QPointF(0, -10)))
+        self.assertTrue(widget.shape().contains(QPointF(0, -10)))
+        self.assertIs(widget.widget_shape, Shape.TRIANGLE)
+
+        widget.set_rotation(180)
+        widget.update_pos(save=False)
+        self.assertFalse(widget.contains(QPointF(0, -10)))
+        self.assertTrue(widget.contains(QPointF(0, 10)))
+
+    def test_registered(self):
+        self.mpfmon.widget_registry = WidgetRegistry(cell_size=50)
+        widget = self.create_widget("l_registered")
+
+        self.assertIs(self.mpfmon.widget_registry.get('light', "l_registered"), widget)
+
+        widget.setPos(400, 400)
+        widget.update_pos(save=False)
+        self.assertEqual(self.mpfmon.widget_registry.in_rect(QRectF(350, 350, 100, 100)), [widget])
+
+        widget.destroy()
+        self.assertIsNone(self.mpfmon.widget_registry.get('light', "l_registered"))
@@ -0,0 +1,107 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+from unittest.mock import MagicMock
+
+from PyQt5.QtWidgets import QApplication, QGraphicsScene
+
+from mpfmonitor.core.pyramid import *
+from mpfmonitor.core.playfield import PfPixmapItem
+
+app = QApplication(sys.argv)
+
+
+class TestImagePyramid(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.image_file = os.path.join(self.path, "playfield.jpg")
+        image = QImage(1100, 2000, QImage.Format_RGB32)
+        image.fill(QColor(0, 128, 0))
+        image.save(self.image_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def load(self):
+        pyramid = ImagePyramid(self.image_file)
+        pyramid.load()
+        pyramid.take()
+        return pyramid
+
+    def test_levels(self):
+        pyramid = self.load()
+
+        self.assertEqual(pyramid.size, QSize(1100, 2000))
+        self.assertTrue(pyramid.is_complete())
+        self.assertEqual([level.size() for level in pyramid.levels],
+                         [QSize(1100, 2000), QSize(550, 1000), QSize(275, 500)])
+        self.assertEqual(len(os.listdir(pyramid.cache_path)), 2)
+
+    def test_level_for_width(self):
+        pyramid = self.load()
+
+        self.assertEqual(pyramid.level(100).width(), 275)
+        self.assertEqual(pyramid.level(276).width(), 550)
+        self.assertEqual(pyramid.level(5000).width(), 1100)
+
+        # Until the rest is loaded, the largest level there is
+        pyramid.levels[0] = pyramid.levels[1] = None
+        self.assertEqual(pyramid.level(5000).width(), 275)
+
+    def test_cached_levels(self):
+        pyramid = self.load()
+        cache_file = pyramid.cache_file(QSize(550, 1000))
+
+        # A red level in the cache shows it is read instead of rebuilt
+        image = QImage(550, 1000, QImage.Format_RGB32)
+        image.fill(QColor(255, 0, 0))
+        image.save(cache_file)
+
+        pyramid = self.load()
+        self.assertGreater(pyramid.levels[1].toImage().pixelColor(10, 10).red(), 200)
+
+    def test_changed_image(self):
+        pyramid = self.load()
+        old_files = set(os.listdir(pyramid.cache_path))
+
+        image = QImage(1100, 2000, QImage.Format_RGB32)
+        image.fill(QColor(0, 0, 255))
+        image.save(self.image_file)
+        os.utime(self.image_file, (0, 12345678))
+
+        pyramid = self.load()
+        self.assertEqual(len(os.listdir(pyramid.cache_path)), 2)
+        self.assertFalse(old_files & set(os.listdir(pyramid.cache_path)))
+        self.assertGreater(pyramid.levels[1].toImage().pixelColor(10, 10).blue(), 200)
+
+    def test_missing_image(self):
+        pyramid = ImagePyramid(os.path.join(self.path, "none.jpg"))
+        pyramid.start()
+
+        self.assertIsNone(pyramid.thread)
+        self.assertEqual(pyramid.levels, [])
+        self.assertIsNone(pyramid.level(100))
+
+    def test_playfield_item(self):
+        pyramid = ImagePyramid(self.image_file)
+        pf = PfPixmapItem(pyramid, MagicMock())
+        scene = QGraphicsScene()
+        scene.addItem(pf)
+
+        # The scene has the size of the image before anything is decoded
+        self.assertEqual(scene.sceneRect(), QRectF(0, 0, 1100, 2000))
+        self.assertTrue(pf.load_timer.isActive())
+
+        pyramid.load()
+        pf.take_levels()
+        self.assertFalse(pf.load_timer.isActive())
+
+        image = QImage(110, 200, QImage.Format_RGB32)
+        image.fill(Qt.black)
+        painter = QPainter(image)
+        scene.render(painter)
+        painter.end()
+        self.assertEqual(image.pixelColor(50, 100).green(), 128)
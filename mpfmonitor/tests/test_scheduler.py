@@ -0,0 +1,117 @@
+import unittest
+import sys
+
+from mpfmonitor.core.scheduler import *
+from PyQt5.QtWidgets import QApplication
+from unittest.mock import MagicMock
+
+
+def mock_window(visible=True, minimized=False, paused=False):
+    window = MagicMock()
+    window.isVisible.return_value = visible
+    window.isMinimized.return_value = minimized
+    window.paused = paused
+    return window
+
+
+class TestFrameScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = FrameScheduler(frame_rate=60)
+
+    def test_frame_rate(self):
+        self.assertEqual(self.scheduler.timer.interval(), 16)
+
+        self.scheduler.set_frame_rate(0)
+        self.assertEqual(self.scheduler.frame_rate, 30)
+
+    def test_flush_coalesces_keys(self):
+        window = mock_window()
+        first = MagicMock()
+        second = MagicMock()
+
+        self.scheduler.mark_dirty(window, 'device', first)
+        self.scheduler.mark_dirty(window, 'device', second)
+        self.assertTrue(self.scheduler.timer.isActive())
+
+        self.scheduler.flush()
+
+        first.assert_not_called()
+        second.assert_called_once()
+        self.assertFalse(self.scheduler.timer.isActive())
+
+    def test_failing_callback(self):
+        window = mock_window()
+        failing = MagicMock(side_effect=ValueError)
+        other = MagicMock()
+
+        self.scheduler.mark_dirty(window, 'broken', failing)
+        self.scheduler.mark_dirty(window, 'device', other)
+
+        with self.assertLogs('Core', level='ERROR'):
+            self.scheduler.flush()
+
+        other.assert_called_once()
+        self.assertEqual(self.scheduler.pending, dict())
+        self.assertFalse(self.scheduler.timer.isActive())
+
+    def test_hidden_window_waits(self):
+        window = mock_window(visible=False)
+        minimized = mock_window(minimized=True)
+        callback = MagicMock()
+
+        self.scheduler.mark_dirty(window, 'device', callback)
+        self.scheduler.mark_dirty(minimized, 'device', callback)
+        self.scheduler.flush()
+
+        callback.assert_not_called()
+        self.assertTrue(self.scheduler.timer.isActive())
+
+        window.isVisible.return_value = True
+        self.scheduler.flush()
+
+        callback.assert_called_once()
+
+    def test_paused_window_waits(self):
+        window = mock_window(paused=True)
+        callback = MagicMock()
+
+        self.scheduler.mark_dirty(window, 'flush_events', callback)
+        self.scheduler.flush()
+        callback.assert_not_called()
+
+        window.paused = False
+        self.scheduler.flush()
+        callback.assert_called_once()
+
+    def test_timings(self):
+        reported = []
+        self.scheduler.timings_updated.connect(lambda ingest, render: reported.append((ingest, render)))
+
+        self.scheduler.add_ingest_time(0.002)
+        self.scheduler.mark_dirty(mock_window(), 'device', MagicMock())
+        self.scheduler.flush()
+        self.scheduler.report_timings()
+
+        ingest, render = reported[0]
+        self.assertAlmostEqual(ingest, 2.0)
+        self.assertGreater(render, 0)
+        self.assertEqual(self.scheduler.ingest_time, 0)
+
+    def test_discard(self):
+        window = mock_window()
+        callback = MagicMock()
+
+        self.scheduler.mark_dirty(window, 'device', callback)
+        self.scheduler.discard(window, 'device')
+        self.scheduler.discard(window, 'missing')
+        self.scheduler.flush()
+
+        callback.assert_not_called()
+
+
+app = QApplication(sys.argv)
+
+
+if __name__ == '__main__':
+    unittest.main()
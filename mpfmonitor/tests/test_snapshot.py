@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+import unittest
+
+from mpfmonitor.core.snapshot import *
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.machine_path = self.tmp_dir.name
+        self.snapshot_file = os.path.join(self.tmp_dir.name, "snapshot.json")
+
+        self.devices = [
+            ("switch", "s_start", {"state": 0, "recycle_jitter_count": 0}),
+            ("light", "l_shoot_again", {"color": [255, 0, 0]}),
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        save_snapshot(self.snapshot_file, self.machine_path, self.devices)
+
+        self.assertEqual(load_snapshot(self.snapshot_file, self.machine_path), self.devices)
+        self.assertFalse(os.path.exists(self.snapshot_file + '.tmp'))
+
+    def test_missing(self):
+        self.assertEqual(load_snapshot(self.snapshot_file, self.machine_path), [])
+
+    def test_other_machine(self):
+        save_snapshot(self.snapshot_file, self.machine_path, self.devices)
+
+        other_machine = os.path.join(self.machine_path, "other")
+        self.assertEqual(load_snapshot(self.snapshot_file, other_machine), [])
+
+    def test_other_version(self):
+        with open(self.snapshot_file, 'w') as f:
+            json.dump({'version': SNAPSHOT_VERSION + 1,
+                       'machine_path': os.path.abspath(self.machine_path),
+                       'devices': self.devices}, f)
+
+        self.assertEqual(load_snapshot(self.snapshot_file, self.machine_path), [])
+
+    def test_corrupt(self):
+        with open(self.snapshot_file, 'w') as f:
+            f.write('{"version": 1, "devi')
+
+        self.assertEqual(load_snapshot(self.snapshot_file, self.machine_path), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import unittest
+import sys
+from unittest.mock import MagicMock
+
+from mpfmonitor.core.stats import *
+from mpfmonitor.core.event_filters import EventFilter, EventFilterRule
+
+
+class TestEventStats(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = EventStats()
+
+    def test_totals_and_rates(self):
+        for i in range(20):
+            self.stats.record("timer_tick", now=100 + i / 2)
+        self.stats.record("s_left_flipper_active", now=109)
+
+        self.assertEqual(self.stats.totals["timer_tick"], 20)
+        self.assertEqual(self.stats.rate("timer_tick", 1), 2)
+        self.assertEqual(self.stats.rate("timer_tick", 10), 2)
+        self.assertEqual(self.stats.rate("s_left_flipper_active", 60), 1 / 60)
+
+    def test_windows_expire(self):
+        self.stats.record("timer_tick", now=100)
+        self.stats.record("timer_tick", now=105)
+
+        self.stats.advance(111)
+        self.assertEqual(self.stats.rate("timer_tick", 1), 0)
+        self.assertEqual(self.stats.rate("timer_tick", 10), 0.1)
+        self.assertEqual(self.stats.rate("timer_tick", 60), 2 / 60)
+
+        self.stats.advance(1000)
+        self.assertEqual(self.stats.rate("timer_tick", 60), 0)
+        self.assertEqual(self.stats.totals["timer_tick"], 2)
+
+    def test_expired_names_are_dropped(self):
+        self.stats.record("ball_started", now=100)
+        self.stats.advance(200)
+        self.stats.record("ball_ended", now=200)
+
+        self.assertNotIn("ball_started", self.stats.sums[60])
+
+    def test_top(self):
+        for name, count in [("a", 3), ("b", 10), ("c", 1)]:
+            for i in range(count):
+                self.stats.record(name, now=100)
+
+        self.assertEqual(self.stats.top(2), ["b", "a"])
+        self.assertEqual(self.stats.top(2, window=10), ["b", "a"])
+        self.assertEqual(self.stats.top(5, names=["a", "c"]), ["a", "c"])
+
+    def test_handler_label(self):
+        self.assertEqual(handler_label(["<bound method BallDevice._source_playfield of "
+                                        "<ball_device.bd_trough>>", 1, {}, None, None, None]),
+                         ("BallDevice._source_playfield", 1))
+        self.assertEqual(handler_label("<function tick at 0x7f>"), ("tick", None))
+
+    def test_dispatch(self):
+        handlers = [["<bound method A.x of <a>>", 1], ["<bound method B.y of <b>>", 2]]
+        for i in range(10):
+            self.stats.record("timer_tick", now=100, handlers=handlers)
+        for i in range(15):
+            self.stats.record("switch_active", now=100, handlers=handlers[:1])
+
+        self.assertEqual(self.stats.handler_count("timer_tick"), 2)
+        self.assertEqual(self.stats.dispatch_rate("timer_tick", 10), 2)
+        self.assertEqual(self.stats.top(2, window=10), ["switch_active", "timer_tick"])
+        self.assertEqual(self.stats.top_dispatch(2, 10), ["timer_tick", "switch_active"])
+        self.assertEqual(self.stats.top_handlers(2, 10),
+                         [(1.5, "A.x", 1, "switch_active"), (1, "A.x", 1, "timer_tick")])
+
+    def test_clear(self):
+        self.stats.record("a", now=100)
+        self.stats.clear()
+
+        self.assertEqual(self.stats.top(5), [])
+        self.assertEqual(self.stats.rate("a", 10), 0)
+
+
+app = QApplication(sys.argv)
+
+
+class TestStatsWindow(unittest.TestCase):
+
+    def setUp(self):
+        mock_mpfmon = MagicMock()
+        mock_mpfmon.local_settings.value.side_effect = [QPoint(500, 850), QSize(400, 300)]
+        mock_mpfmon.config = dict()
+        mock_mpfmon.event_stats = EventStats()
+        mock_mpfmon.event_filter = EventFilter()
+        mock_mpfmon.event_filter.suppressed["timer_tick"] = 7
+
+        self.stats_window = StatsWindow(mock_mpfmon)
+        self.stats_window.show()
+
+        now = time.monotonic()
+        for name, count in [("timer_tick", 5), ("ball_started", 1), ("mode_base_started", 2)]:
+            for i in range(count):
+                mock_mpfmon.event_stats.record(name, now)
+
+    def tearDown(self):
+        self.stats_window.close()
+
+    def names(self):
+        model = self.stats_window.model
+        return [model.item(row, 0).text() for row in range(model.rowCount())]
+
+    def test_refresh(self):
+        self.stats_window.refresh()
+
+        self.assertEqual(self.names(), ["timer_tick", "mode_base_started", "ball_started"])
+        self.assertEqual(self.stats_window.model.item(0, 1).text(), "5")
+        self.assertEqual(self.stats_window.model.item(0, 3).text(), "0.5")
+        self.assertEqual(self.stats_window.model.item(0, 5).text(), "7")
+        self.assertEqual(self.stats_window.windowTitle(), "Event Statistics (7 suppressed)")
+
+    def test_handlers(self):
+        stats = self.stats_window.mpfmon.event_stats
+        stats.record("ball_started", handlers=[["<bound method Game.ball_started of <game>>", 5],
+                                               ["<function light_show at 0x7f>", 1]])
+        self.stats_window.ui.sortComboBox.setCurrentIndex(5)
+
+        self.assertEqual(self.names(), ["ball_started", "timer_tick", "mode_base_started"])
+        self.assertEqual(self.stats_window.model.item(0, 6).text(), "2")
+        self.assertEqual(self.stats_window.model.item(0, 7).text(), "0.4")
+
+        handler_model = self.stats_window.handler_model
+        self.assertEqual(handler_model.rowCount(), 2)
+        self.assertEqual([handler_model.item(0, column).text() for column in range(4)],
+                         ["Game.ball_started", "ball_started", "5", "0.2"])
+
+    def test_filter(self):
+        self.stats_window.ui.filterLineEdit.setText("started")
+
+        self.assertEqual(self.names(), ["mode_base_started", "ball_started"])
+
+    def test_dropped_events(self):
+        event_filter = EventFilter([EventFilterRule("attract_*", 'drop')])
+        for i in range(3):
+            event_filter.allow("attract_tick")
+        self.stats_window.mpfmon.event_filter = event_filter
+        self.stats_window.refresh()
+
+        self.assertEqual(self.names(), ["timer_tick", "mode_base_started", "ball_started",
+                                        "attract_tick"])
+        self.assertEqual([self.stats_window.model.item(3, column).text() for column in (1, 3, 5)],
+                         ["0", "0.0", "3"])
+        self.assertEqual(self.stats_window.windowTitle(), "Event Statistics (3 suppressed)")
+
+        self.stats_window.ui.filterLineEdit.setText("started")
+        self.assertEqual(self.names(), ["mode_base_started", "ball_started"])
+
+    def test_top_count(self):
+        self.stats_window.top_count = 1
+        self.stats_window.refresh()
+
+        self.assertEqual(self.names(), ["timer_tick"])
+
+
+if __name__ == '__main__':
+    unittest.main()
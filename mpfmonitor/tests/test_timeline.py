@@ -0,0 +1,93 @@
+import unittest
+import sys
+
+from mpfmonitor.core.timeline import *
+
+
+class TestModeTimeline(unittest.TestCase):
+
+    def setUp(self):
+        self.timeline = ModeTimeline()
+
+    def test_start_stop(self):
+        self.timeline.update([["base", 100]], 10.0)
+        self.timeline.update([["base", 100], ["skillshot", 1000]], 12.0)
+        self.timeline.update([["base", 100]], 15.0)
+        self.timeline.update([["base", 100], ["skillshot", 1000]], 20.0)
+
+        skillshot = self.timeline.lanes["skillshot"]
+        self.assertEqual(skillshot.activations, 2)
+        self.assertTrue(skillshot.running)
+        self.assertEqual(skillshot.total_time(21.0), 4.0)
+        self.assertEqual(self.timeline.lanes["base"].total_time(21.0), 11.0)
+
+    def test_priority_change(self):
+        self.timeline.update([["base", 100]], 10.0)
+        self.timeline.update([["base", 200]], 12.0)
+
+        base = self.timeline.lanes["base"]
+        self.assertEqual(base.activations, 1)
+        self.assertEqual(len(base), 2)
+        self.assertEqual(base.priority, 200)
+        self.assertEqual(base.total_time(13.0), 3.0)
+
+    def test_segments(self):
+        for i in range(1000):
+            self.timeline.update([["ball_save", 1]], i)
+            self.timeline.update([], i + 0.5)
+
+        lane = self.timeline.lanes["ball_save"]
+
+        # Zoomed in every interval is a bar
+        self.assertEqual(lane.segments(10.2, 12.2, 0.01, 2000.0),
+                         [(10.0, 10.5, 1), (11.0, 11.5, 1), (12.0, 12.5, 1)])
+
+        # Zoomed out they are merged to about one bar per resolution
+        self.assertEqual(lane.segments(0.0, 1000.0, 1.0, 2000.0), [(0.0, 999.5, 1000)])
+        self.assertEqual(len(lane.segments(0.0, 1000.0, 0.4, 2000.0)), 1000)
+
+    def test_running_segment_ends_now(self):
+        self.timeline.update([["base", 100]], 10.0)
+
+        self.assertEqual(self.timeline.lanes["base"].segments(0.0, 50.0, 1.0, 30.0),
+                         [(10.0, 30.0, 1)])
+
+    def test_clear(self):
+        self.timeline.update([["base", 100]], 10.0)
+        self.timeline.clear()
+
+        self.assertEqual(self.timeline.lanes, {})
+        self.assertFalse(self.timeline.is_running())
+
+    def test_format_duration(self):
+        self.assertEqual(format_duration(5.5), "5s")
+        self.assertEqual(format_duration(125), "2m 05s")
+        self.assertEqual(format_duration(7500), "2h 05m")
+
+
+app = QApplication(sys.argv)
+
+
+class TestTimelineWidget(unittest.TestCase):
+
+    def test_paint(self):
+        timeline = ModeTimeline()
+        now = time.perf_counter()
+        timeline.update([["base", 100]], now - 30)
+        timeline.update([["base", 100], ["skillshot", 1000]], now - 20)
+
+        widget = TimelineWidget(timeline)
+        widget.resize(400, 80)
+
+        self.assertEqual(widget.lane_at(0), "base")
+        self.assertEqual(widget.lane_at(widget.lane_height()), "skillshot")
+        self.assertIsNone(widget.lane_at(79))
+
+        first_time, last_time = widget.view_range(now)
+        self.assertEqual((first_time, last_time), (now - 30, now))
+
+        widget.grab()
+
+
+if __name__ == '__main__':
+    unittest.main()
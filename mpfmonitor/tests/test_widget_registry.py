@@ -0,0 +1,72 @@
+import unittest
+
+from PyQt5.QtCore import QPointF, QRectF
+
+from mpfmonitor.core.widget_registry import *
+
+
+class FakeWidget(object):
+
+    def __init__(self, device_type, name, x, y):
+        self.device_type = device_type
+        self.name = name
+        self.position = QPointF(x, y)
+
+    def pos(self):
+        return self.position
+
+
+class TestWidgetRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = WidgetRegistry(cell_size=10)
+        self.left = FakeWidget('switch', "s_left", 5, 5)
+        self.right = FakeWidget('switch', "s_right", 95, 5)
+        self.light = FakeWidget('light', "l_left", 8, 12)
+        for widget in (self.left, self.right, self.light):
+            self.registry.place(widget)
+
+    def test_get(self):
+        self.assertIs(self.registry.get('switch', "s_left"), self.left)
+        self.assertIsNone(self.registry.get('light', "s_left"))
+        self.assertEqual(len(self.registry), 3)
+
+    def test_widgets_by_type(self):
+        self.assertCountEqual(self.registry.widgets('switch'), [self.left, self.right])
+        self.assertEqual(self.registry.widgets('light'), [self.light])
+        self.assertEqual(len(self.registry.widgets()), 3)
+
+    def test_in_rect(self):
+        self.assertCountEqual(self.registry.in_rect(QRectF(0, 0, 20, 20)),
+                              [self.left, self.light])
+        self.assertEqual(self.registry.in_rect(QRectF(0, 0, 20, 20), 'light'), [self.light])
+        self.assertEqual(self.registry.in_rect(QRectF(6, 0, 10, 10)), [])
+
+    def test_move(self):
+        self.left.position = QPointF(90, 90)
+        self.registry.place(self.left)
+
+        self.assertEqual(self.registry.in_rect(QRectF(0, 0, 20, 20)), [self.light])
+        self.assertEqual(self.registry.in_rect(QRectF(80, 80, 20, 20)), [self.left])
+        self.assertEqual(len(self.registry.cells), 3)
+
+    def test_replace_and_remove(self):
+        new_left = FakeWidget('switch', "s_left", 50, 50)
+        self.registry.place(new_left)
+
+        self.assertIs(self.registry.get('switch', "s_left"), new_left)
+        self.assertNotIn(self.left, self.registry)
+
+        # The replaced widget going away leaves the new one alone
+        self.registry.remove(self.left)
+        self.assertIs(self.registry.get('switch', "s_left"), new_left)
+
+        self.registry.remove(new_left)
+        self.assertIsNone(self.registry.get('switch', "s_left"))
+        self.assertEqual(self.registry.in_rect(QRectF(0, 0, 100, 100)).count(new_left), 0)
+
+    def test_clear(self):
+        self.registry.clear()
+
+        self.assertEqual(len(self.registry), 0)
+        self.assertEqual(self.registry.in_rect(QRectF(0, 0, 100, 100)), [])
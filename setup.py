@@ -108,6 +108,9 @@ setup(
 
     install_requires=install_requires,
 
+    # light_renderer: overlay
+    extras_require={'overlay': ['numpy']},
+
     tests_require=[],
 
     entry_points="""